@@ -11,6 +11,9 @@ typedef struct cPrimClex cPrimClex;
 /// For std::ostream*
 typedef struct costream costream;
 
+/// For CASM::QueryArray*
+typedef struct cQueryArray cQueryArray;
+
 
 extern "C" {
 
@@ -45,11 +48,31 @@ extern "C" {
 
   void casm_primclex_set_logging(cPrimClex *primclex, costream *log, costream *debug_log, costream *err_log);
 
+  int casm_primclex_set_selected(cPrimClex *primclex, char *confignames, bool *selected, unsigned long size, costream *err_log);
+
   void casm_command_list(costream *ostringstream_log);
 
   int casm_capi(char *args, cPrimClex *primclex, char *root, costream *log, costream *debug_log, costream *err_log);
 
   int casm_capi_call(char *args, cPrimClex *primclex);
+
+  int casm_capi_batch(char *args, cPrimClex *primclex, bool stop_on_error, costream *info_log, costream *err_log);
+
+
+  cQueryArray *casm_query_array_new(cPrimClex *primclex,
+                                    char *columns,
+                                    char *selection,
+                                    bool all,
+                                    costream *info_log,
+                                    costream *err_log);
+
+  void casm_query_array_delete(cQueryArray *ptr);
+
+  unsigned long casm_query_array_rows(cQueryArray *ptr);
+
+  unsigned long casm_query_array_cols(cQueryArray *ptr);
+
+  double *casm_query_array_copy(cQueryArray *ptr, double *dest);
 }
 
 /** @} */
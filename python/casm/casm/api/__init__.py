@@ -1,8 +1,12 @@
 """Access libcasm via Python"""
 from casm.api.api import API, command_list, casm_command, casm_capture
+from casm.api.session import SessionServer, session_call, session_stop
 __all__ = [
   'API',
   'command_list',
   'casm_command',
-  'casm_capture'
+  'casm_capture',
+  'SessionServer',
+  'session_call',
+  'session_stop'
  ]
@@ -5,13 +5,17 @@ import ctypes
 import glob
 import json
 import os
+import numpy as np
 import six
+import sys
 from distutils.spawn import find_executable
 from os.path import dirname, join
 from sys import platform
 
 import sh
 
+from casm.api.session import session_call
+
 class API(object):
   """
   Class to provide access to the libccasm C API.
@@ -128,6 +132,9 @@ class API(object):
       self.lib_ccasm.casm_primclex_set_logging.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p]
       self.lib_ccasm.casm_primclex_set_logging.restype = None
 
+      self.lib_ccasm.casm_primclex_set_selected.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.POINTER(ctypes.c_bool), ctypes.c_ulong, ctypes.c_void_p]
+      self.lib_ccasm.casm_primclex_set_selected.restype = ctypes.c_int
+
       self.lib_ccasm.casm_command_list.argtypes = [ctypes.c_void_p]
       self.lib_ccasm.casm_command_list.restype = None
 
@@ -137,6 +144,25 @@ class API(object):
       self.lib_ccasm.casm_capi_call.argtypes = [ctypes.c_char_p, ctypes.c_void_p]
       self.lib_ccasm.casm_capi_call.restype = ctypes.c_int
 
+      self.lib_ccasm.casm_capi_batch.argtypes = [ctypes.c_char_p, ctypes.c_void_p, ctypes.c_bool, ctypes.c_void_p, ctypes.c_void_p]
+      self.lib_ccasm.casm_capi_batch.restype = ctypes.c_int
+
+
+      self.lib_ccasm.casm_query_array_new.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_bool, ctypes.c_void_p, ctypes.c_void_p]
+      self.lib_ccasm.casm_query_array_new.restype = ctypes.c_void_p
+
+      self.lib_ccasm.casm_query_array_delete.argtypes = [ctypes.c_void_p]
+      self.lib_ccasm.casm_query_array_delete.restype = None
+
+      self.lib_ccasm.casm_query_array_rows.argtypes = [ctypes.c_void_p]
+      self.lib_ccasm.casm_query_array_rows.restype = ctypes.c_ulong
+
+      self.lib_ccasm.casm_query_array_cols.argtypes = [ctypes.c_void_p]
+      self.lib_ccasm.casm_query_array_cols.restype = ctypes.c_ulong
+
+      self.lib_ccasm.casm_query_array_copy.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_double)]
+      self.lib_ccasm.casm_query_array_copy.restype = ctypes.POINTER(ctypes.c_double)
+
   __api = None
 
   def __init__(self):
@@ -320,6 +346,50 @@ class API(object):
     """
     API.__api.lib_ccasm.casm_primclex_set_logging(primclex, log, debug_log, err_log)
 
+  def primclex_set_selected(self, primclex, confignames, selected):
+    """
+    Change the MASTER selection
+
+    The 'selected' flags of the named configurations are changed and all
+    others are kept. The flags are set in the in-memory PrimClex, and the
+    MASTER config_list.json is re-read and only the named entries are
+    modified, so configurations and properties written by other processes are
+    kept. If no flag changes, config_list.json is not written.
+
+    Arguments
+    ---------
+
+      primclex: CASM::PrimClex pointer
+        A pointer to a CASM::PrimClex, as obtained from API.primclex_new()
+
+      confignames: List[str]
+        Names of the configurations to change
+
+      selected: List[bool]
+        The new 'selected' flag of each configuration in 'confignames'
+
+    Returns
+    -------
+      (returncode, err): (int, str)
+        'returncode' is 0 on success, or 1 if the selection could not be set,
+        in which case 'err' contains an explanation
+
+    """
+    if len(confignames) != len(selected):
+      raise Exception("Error in primclex_set_selected: confignames and selected sizes differ")
+    flags = (ctypes.c_bool * len(selected))(*[bool(x) for x in selected])
+    err = self.ostringstream_new()
+    try:
+      returncode = API.__api.lib_ccasm.casm_primclex_set_selected(
+        primclex,
+        six.b("\n".join(confignames)),
+        flags,
+        len(confignames),
+        err)
+      return (returncode, self.ostringstream_to_str(err).decode('utf-8'))
+    finally:
+      self.ostringstream_delete(err)
+
   def command_list(self):
     """
     Get list of recognized casm commands implemented at the libcasm level
@@ -453,6 +523,164 @@ class API(object):
     """
     return API.__api.lib_ccasm.casm_capi_call(six.b(args), primclex)
 
+  def capi_batch(self, args_list, primclex, stop_on_error=False):
+    """
+    Make a list of API calls with one call to libccasm, using existing PrimClex's
+    path, and capture the output of each separately
+
+    Arguments
+    ---------
+
+      args_list: List[str]
+        Strings containing the arguments for each casm command to be executed.
+
+      primclex: CASM::PrimClex pointer
+        A pointer to a CASM::PrimClex, as obtained from API.primclex_new()
+
+      stop_on_error: bool (optional, default=False)
+        If True, commands after the first that returns a non-zero return code
+        are not executed
+
+    Returns
+    -------
+      results: List[(stdout, stderr, returncode)]
+        The result of each command executed, in order. 'stdout' and 'stderr'
+        are in text type ('unicode'/'str').
+
+    """
+    info = self.ostringstream_new()
+    err = self.ostringstream_new()
+    try:
+      returncode = API.__api.lib_ccasm.casm_capi_batch(
+        six.b(json.dumps(list(args_list))), primclex, stop_on_error, info, err)
+      if returncode:
+        raise Exception(self.ostringstream_to_str(err).decode('utf-8'))
+      results = json.loads(self.ostringstream_to_str(info).decode('utf-8'))
+      return [(r["stdout"], r["stderr"], r["returncode"]) for r in results]
+    finally:
+      self.ostringstream_delete(info)
+      self.ostringstream_delete(err)
+
+  def capi_capture(self, args, primclex, root, combine_output=False):
+    """
+    Make an API call and capture its output, using per-call log streams
+
+    If 'primclex' is not null, its logging is set to the per-call log streams
+    during the call, so that output written via the PrimClex log is also
+    captured, and then restored. The caller must hold the lock guarding the
+    PrimClex (casm.project.Project.lock). Calls made concurrently from other
+    threads, using other PrimClex, are not affected. The GIL is released while
+    libccasm executes the command.
+
+    Arguments
+    ---------
+
+      args: str
+        A string containing the arguments for the casm command to be executed.
+
+      primclex: CASM::PrimClex pointer
+        A pointer to a CASM::PrimClex, as obtained from API.primclex_new(), or
+        API.primclex_null() to construct a temporary PrimClex if necessary
+
+      root: str
+        A string giving the path to a root directory of a CASM project, typically
+        casm.project.Project.path
+
+      combine_output: bool (optional, default=False)
+        If True, capture stdout and stderr to the same str
+
+    Returns
+    -------
+      (stdout, stderr, returncode): The result of running the command via the
+          command line iterface. 'stdout' and 'stderr' are in text type ('unicode'/'str'). If
+          'combine_output' is True, then returns (combined_output, returncode).
+
+    """
+    # construct stringstream objects to capture stdout, stderr; debug output
+    # is only captured if combine_output
+    ss = self.ostringstream_new()
+    if combine_output:
+        ss_debug = ss
+        ss_err = ss
+    else:
+        ss_debug = self.nullstream()
+        ss_err = self.ostringstream_new()
+
+    returncode = self.capi(args, primclex, root, ss, ss_debug, ss_err)
+
+    # copy strings and delete stringstreams
+    stdout = self.ostringstream_to_str(ss)
+    self.ostringstream_delete(ss)
+
+    if combine_output:
+        return (stdout.decode('utf-8'), returncode)
+
+    stderr = self.ostringstream_to_str(ss_err)
+    self.ostringstream_delete(ss_err)
+    return (stdout.decode('utf-8'), stderr.decode('utf-8'), returncode)
+
+  def query_array(self, primclex, columns, selection="MASTER", all=False):
+    """
+    Evaluate numeric 'casm query' properties without formatting them as text
+
+    Arguments
+    ---------
+
+      primclex: CASM::PrimClex pointer
+        A pointer to a CASM::PrimClex, as obtained from API.primclex_new()
+
+      columns: List[str]
+        The properties to query, as for 'casm query -k'. All must evaluate to
+        numbers (double, long, or bool), so 'configname' should not be included.
+
+      selection: str, optional, default="MASTER"
+        Path to a selection file, or one of "MASTER", "ALL", "CALCULATED"
+
+      all: bool, optional, default=False
+        If True, include all configurations in the selection, else only the
+        selected configurations
+
+
+    Returns
+    -------
+      (configname, header, types, values), or None
+
+      configname: List[str] of length n_rows
+        The name of the configuration in each row
+
+      header: List[str] of length n_cols
+        The name of each column, as would be printed by 'casm query'
+
+      types: str of length n_cols
+        The type of each column, 'd' (double), 'l' (long), or 'b' (bool)
+
+      values: np.ndarray of shape (n_rows, n_cols)
+        The queried values. Values that could not be evaluated are NaN.
+
+      None is returned if the query could not be evaluated as an array of
+      numbers, for instance if any property is a string.
+
+    """
+    info = self.ostringstream_new()
+    err = self.ostringstream_new()
+    ptr = API.__api.lib_ccasm.casm_query_array_new(
+      primclex, six.b(json.dumps(list(columns))), six.b(selection), all, info, err)
+    try:
+      if ptr is None:
+        return None
+      d = json.loads(self.ostringstream_to_str(info).decode('utf-8'))
+      n_rows = API.__api.lib_ccasm.casm_query_array_rows(ptr)
+      n_cols = API.__api.lib_ccasm.casm_query_array_cols(ptr)
+      values = np.empty((n_rows, n_cols), dtype=np.float64)
+      if values.size:
+        API.__api.lib_ccasm.casm_query_array_copy(ptr, values.ctypes.data_as(ctypes.POINTER(ctypes.c_double)))
+      return (d["configname"], d["header"], d["types"], values)
+    finally:
+      if ptr is not None:
+        API.__api.lib_ccasm.casm_query_array_delete(ptr)
+      self.ostringstream_delete(info)
+      self.ostringstream_delete(err)
+
 
 def command_list():
     """
@@ -488,18 +716,35 @@ def casm_command(args, root=None, combine_output=False):
       combine_output: bool (optional, default=False)
         If True, print stdout and stderr to same str and only ret
 
+    Notes
+    -------
+      If the 'CASM_SESSION_SOCKET' environment variable is set and a
+      casm.api.SessionServer is listening on it, the command is executed by the
+      session server, which keeps the CASM project loaded between commands, and
+      its output is written to stdout/stderr when it completes.
+
     Returns
     -------
       returncode: The result of running the command via the
           command line iterface. 'stdout' and 'stderr' are in text type ('unicode'/'str'). If
           'combine_output' is True, then returns (combined_output, returncode).
     """
-    _api = API()
-
     # set default root
-    if root is None:
+    if not root:
         root = os.getcwd()
 
+    res = session_call(args, root)
+    if res is not None:
+        stdout, stderr, returncode = res
+        sys.stdout.write(stdout)
+        if combine_output:
+            sys.stdout.write(stderr)
+        else:
+            sys.stderr.write(stderr)
+        return returncode
+
+    _api = API()
+
     # construct stringstream objects to capture stdout, debug, stderr
     ss = _api.stdout()
     ss_debug = ss
@@ -541,6 +786,10 @@ def casm_capture(args, root=None, combine_output=False):
       then update the Project instance's ProjectSettings and DirectoryStructure to reflect any
       changes that have occurred.
 
+      If the 'CASM_SESSION_SOCKET' environment variable is set and a
+      casm.api.SessionServer is listening on it, the command is executed by the
+      session server, which keeps the CASM project loaded between commands.
+
     Returns
     -------
       (stdout, stderr, returncode): The result of running the command via the
@@ -548,35 +797,16 @@ def casm_capture(args, root=None, combine_output=False):
           'combine_output' is True, then returns (combined_output, returncode).
 
     """
-    _api = API()
-
     # set default root
-    if root is None:
+    if not root:
         root = os.getcwd()
 
-    # construct stringstream objects to capture stdout, debug, stderr
-    ss = _api.ostringstream_new()
-    if combine_output:
-        ss_debug = ss
-        ss_err = ss
-    else:
-        ss_debug = ss
-        ss_err = _api.ostringstream_new()
-
-    print("_api.capi begin")
-    returncode = _api.capi(args, _api.primclex_null(), root, ss, ss_debug, ss_err)
-    print("_api.capi done")
+    res = session_call(args, root)
+    if res is not None:
+        stdout, stderr, returncode = res
+        if combine_output:
+            return (stdout + stderr, returncode)
+        return res
 
-    # copy strings and delete stringstreams
-    stdout = _api.ostringstream_to_str(ss)
-    _api.ostringstream_delete(ss)
-
-    if combine_output:
-        res = (stdout.decode('utf-8'), returncode)
-    else:
-        stderr = self._api.ostringstream_to_str(ss_err)
-        _api.ostringstream_delete(ss_err)
-
-        res = (stdout.decode('utf-8'), stderr.decode('utf-8'), returncode)
-
-    return res
+    _api = API()
+    return _api.capi_capture(args, _api.primclex_null(), root, combine_output)
@@ -0,0 +1,275 @@
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+from builtins import *
+
+import json
+import os
+import socket
+import threading
+
+import six
+from six.moves import socketserver
+
+def session_socket():
+    """
+    Returns the path to the session server socket, as given by the
+    'CASM_SESSION_SOCKET' environment variable, or None if it is not set
+    """
+    return os.environ.get('CASM_SESSION_SOCKET', None) or None
+
+
+def session_call(args, root=None, socket_path=None):
+    """
+    Execute a command via a running SessionServer
+
+    Arguments
+    ---------
+
+      args: str
+        A string containing the arguments for the casm command to be executed.
+
+      root: str (optional, default=os.getcwd())
+        A string giving the path to a root directory of a CASM project
+
+      socket_path: str (optional, default=session_socket())
+        Path to the session server socket
+
+    Returns
+    -------
+      (stdout, stderr, returncode), or None
+
+      None is returned, without executing the command, if no socket path is
+      given or no SessionServer is listening on it.
+    """
+    if socket_path is None:
+      socket_path = session_socket()
+    if socket_path is None:
+      return None
+    if not root:
+      root = os.getcwd()
+
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+      s.connect(socket_path)
+    except socket.error:
+      s.close()
+      return None
+
+    try:
+      req = {"args": args, "root": os.path.abspath(root), "cwd": os.getcwd()}
+      s.sendall(six.u(json.dumps(req) + "\n").encode('utf-8'))
+      f = s.makefile('rb')
+      line = f.readline()
+      f.close()
+    finally:
+      s.close()
+
+    if not line:
+      raise Exception("Error in casm session: no response from " + socket_path)
+    res = json.loads(line.decode('utf-8'))
+    return (res["stdout"], res["stderr"], res["returncode"])
+
+
+def session_stop(socket_path=None):
+    """
+    Stop a running SessionServer
+
+    Returns
+    -------
+      stopped: bool
+        True if a SessionServer was listening on the socket and was stopped
+    """
+    if socket_path is None:
+      socket_path = session_socket()
+    if socket_path is None:
+      return False
+
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+      s.connect(socket_path)
+    except socket.error:
+      s.close()
+      return False
+
+    try:
+      s.sendall(six.u(json.dumps({"stop": True}) + "\n").encode('utf-8'))
+      f = s.makefile('rb')
+      f.readline()
+      f.close()
+    finally:
+      s.close()
+    return True
+
+
+class SessionServer(socketserver.UnixStreamServer):
+    """
+    A local server that keeps CASM projects loaded between commands
+
+    Requests are read one at a time from a Unix socket, so commands for a
+    project are executed in order using one casm.project.Project (and its
+    CASM::PrimClex) per project root directory. A project is refreshed before
+    a command if any of its settings, configuration list, composition,
+    reference, basis set, or ECI files have been changed by another process.
+
+    Each request and response is one line of JSON:
+
+      request: {"args": "query -k comp -o STDOUT", "root": "/path/to/project",
+                "cwd": "/path/to/client/working/directory"}
+      response: {"stdout": "...", "stderr": "...", "returncode": 0}
+
+    Commands are executed in the client's working directory, "cwd", so that
+    relative paths in "args" are interpreted as by the client.
+
+    A request {"stop": true} stops the server after it responds.
+
+    Attributes
+    ----------
+
+      projects: dict(str:(casm.project.Project, list))
+        The loaded projects, and the state of their files after the last command,
+        by project root directory
+
+      verbose: bool
+        If True, print each command executed
+
+      cwd_lock: threading.Lock
+        Held while a command is executed with the working directory changed to
+        the client's working directory
+
+    """
+    def __init__(self, socket_path, verbose=False):
+        """
+        Construct a SessionServer
+
+        Arguments
+        ---------
+
+          socket_path: str
+            Path to the Unix socket to listen on. A stale socket file, with no
+            server listening, is removed.
+
+          verbose: bool, optional, default=False
+            If True, print each command executed
+
+        """
+        if os.path.exists(socket_path):
+          s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+          try:
+            s.connect(socket_path)
+            s.close()
+            raise Exception("Error: a casm session is already listening on " + socket_path)
+          except socket.error:
+            s.close()
+            os.remove(socket_path)
+
+        socketserver.UnixStreamServer.__init__(self, socket_path, _SessionHandler)
+
+        # commands executed by the server must not be routed back to it
+        os.environ.pop('CASM_SESSION_SOCKET', None)
+
+        self.projects = dict()
+        self.verbose = verbose
+        self.stopped = False
+        self.cwd_lock = threading.Lock()
+
+
+    def run(self):
+        """
+        Handle requests until stopped, then remove the socket file
+        """
+        try:
+          while not self.stopped:
+            self.handle_request()
+        finally:
+          self.server_close()
+          if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+    def call(self, args, root, cwd=None):
+        """
+        Execute a command, re-using the loaded project containing 'root'
+
+        Arguments
+        ---------
+
+          args: str
+            A string containing the arguments for the casm command to be executed.
+
+          root: str
+            A string giving the path to a root directory of a CASM project
+
+          cwd: str, optional, default=root
+            The working directory the command is executed in, against which
+            relative paths in 'args' are resolved
+
+        Returns
+        -------
+          (stdout, stderr, returncode)
+        """
+        # import here to avoid a circular import
+        from casm.api.api import casm_capture
+        from casm.project import Project, project_path
+
+        if self.verbose:
+          print("casm " + args + "  (" + root + ")")
+
+        if cwd is None:
+          cwd = root
+
+        # relative paths in 'args' are relative to the client's working directory
+        with self.cwd_lock:
+          server_cwd = os.getcwd()
+          os.chdir(cwd)
+          try:
+            path = project_path(root)
+            if path is None:
+              # i.e. 'casm init': no project to keep loaded
+              return casm_capture(args, root=root)
+
+            if path in self.projects:
+              proj, state = self.projects[path]
+              if _project_state(proj) != state:
+                proj.refresh(read_settings=True, read_composition=True, read_chem_ref=True,
+                             read_configs=True, clear_clex=True)
+            else:
+              proj = Project(path, verbose=False)
+
+            res = proj.capture(args)
+            self.projects[path] = (proj, _project_state(proj))
+            return res
+          finally:
+            os.chdir(server_cwd)
+
+
+class _SessionHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+          return
+        req = json.loads(line.decode('utf-8'))
+
+        if req.get("stop", False):
+          self.server.stopped = True
+          res = {"stdout": "", "stderr": "", "returncode": 0}
+        else:
+          try:
+            stdout, stderr, returncode = self.server.call(req["args"], req["root"], req.get("cwd"))
+            res = {"stdout": stdout, "stderr": stderr, "returncode": returncode}
+          except Exception as e:
+            # 2: ERR_UNKNOWN
+            res = {"stdout": "", "stderr": "Error in casm session: " + str(e) + "\n", "returncode": 2}
+
+        self.wfile.write(six.u(json.dumps(res) + "\n").encode('utf-8'))
+
+
+def _project_state(proj):
+    """Returns [path, mtime] for each project file a loaded PrimClex depends on"""
+    dir = proj.dir
+    files = [dir.project_settings(), dir.scel_list(None), dir.config_list(), dir.composition_axes()]
+    for clex in proj.settings.cluster_expansions:
+      files += [dir.chemical_reference(clex), dir.basis(clex), dir.eci(clex)]
+    state = []
+    for f in files:
+      state.append([f, os.path.getmtime(f) if os.path.exists(f) else None])
+    return state
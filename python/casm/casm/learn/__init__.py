@@ -75,11 +75,12 @@ from casm.learn.fit import example_input_Lasso, example_input_LassoCV, example_i
  open_input, set_input_defaults, \
  FittingData, TrainingData, \
  print_input_help, print_individual, print_population, print_halloffame, print_eci, \
- to_json, open_halloffame, save_halloffame, \
+ to_json, open_halloffame, save_halloffame, open_fitting_data, save_fitting_data, \
  checkspecs, checkhull
 
 from casm.learn.feature_selection import fit_and_select
 from casm.learn.direct_selection import direct_fit
+from casm.learn.predict import Predictor, save_correlations, open_predictor
 
 __all__ = __all__ = [
   'create_halloffame',
@@ -104,8 +105,13 @@ __all__ = __all__ = [
   'to_json', 
   'open_halloffame', 
   'save_halloffame',
+  'open_fitting_data',
+  'save_fitting_data',
   'checkspecs', 
   'checkhull', 
   'fit_and_select', 
-  'direct_fit'
+  'direct_fit',
+  'Predictor',
+  'save_correlations',
+  'open_predictor'
 ]
@@ -1,7 +1,9 @@
 from __future__ import (absolute_import, division, print_function, unicode_literals)
 from builtins import *
 
+from collections import OrderedDict
 import copy
+import hashlib
 from operator import attrgetter
 import os
 import pickle
@@ -18,6 +20,9 @@ from sklearn.base import BaseEstimator
 from sklearn.feature_selection.base import SelectorMixin
 
 import casm.learn
+import casm.learn.parallel
+import casm.learn.store
+import casm.learn.tools
 
 def initNRandomOn(container, n_features, n_features_init):
   """ 
@@ -95,19 +100,16 @@ class Constraints(object):
     self.fix_off = np.array(fix_off, dtype=int)
   
   def check(self, indiv):
+    bits = casm.learn.tools.to_array(indiv)
+    
     # first ensure fix_on and fix_off
-    for i in self.fix_on:
-      if not indiv[i]:
-        return False
+    if not bits[self.fix_on].all() or bits[self.fix_off].any():
+      return False
     
-    for i in self.fix_off:
-      if indiv[i]:
-        return False
-        
-    Non = sum(indiv)
+    Non = np.count_nonzero(bits)
     if Non < self.n_features_min:
       return False
-    if Non > self.n_features_max:
+    if self.n_features_max != "all" and Non > self.n_features_max:
       return False
     
     return True
@@ -169,40 +171,33 @@ def enforce_constraints(constraints):
     def wrapper(*args, **kargs):
       offspring = func(*args, **kargs)
       for child in offspring:
+        bits = casm.learn.tools.to_array(child)
         
         # first ensure fix_on and fix_off
-        for i in constraints.fix_on:
-          child[i] = True
-        for i in constraints.fix_off:
-          child[i] = False
+        bits[constraints.fix_on] = True
+        bits[constraints.fix_off] = False
         
         # now make sure enough are 'on'
-        Non = sum(child)
+        Non = np.count_nonzero(bits)
         if Non < constraints.n_features_min:
-          # get all 'off'
-          off = np.where(np.asarray(child) == False)[0]
-          
-          # remove those that are fix_off
-          candidate = set(off).difference(set(constraints.fix_off))
+          # get all 'off', except those that are fix_off
+          candidate = np.setdiff1d(np.flatnonzero(~bits), constraints.fix_off)
           
           # select enough of the candidates to reach the minimum
-          turn_on = random.sample(candidate, constraints.n_features_min-Non)
-          for i in turn_on:
-            child[i] = True
+          turn_on = random.sample(candidate.tolist(), constraints.n_features_min-Non)
+          bits[turn_on] = True
         
         # now make sure enough are 'off'
         if constraints.n_features_max != "all":
           if Non > constraints.n_features_max:
-            # get all 'on'
-            on = np.where(np.asarray(child) == True)[0]
-            
-            # remove those that are fix_on
-            candidate = set(on).difference(set(constraints.fix_on))
+            # get all 'on', except those that are fix_on
+            candidate = np.setdiff1d(np.flatnonzero(bits), constraints.fix_on)
             
             # select enough of the candidates to reach the maximum
-            turn_off = random.sample(candidate, Non-constraints.n_features_max)
-            for i in turn_off:
-              child[i] = False
+            turn_off = random.sample(candidate.tolist(), Non-constraints.n_features_max)
+            bits[turn_off] = False
+        
+        child[:] = bits.tolist()
         
       return offspring
     return wrapper
@@ -213,7 +208,8 @@ def initialize_population(n_population, toolbox, filename=None, verbose=True):
   """
   if filename is not None and os.path.exists(filename):
     load initial population
-    # may be List[Individual] or HallOfFame, which is converted to List[Individual]
+    # may be List[Individual] or HallOfFame, which is converted to List[Individual],
+    # or a HallOfFame array store
   else:
     create random initial population of size n_population via toolbox.population
   """
@@ -222,8 +218,11 @@ def initialize_population(n_population, toolbox, filename=None, verbose=True):
   if filename is not None and os.path.exists(filename):
     if verbose:
       print("Loading initial population:", filename)
-    with open(filename, 'rb') as f:
-      pop = pickle.load(f)
+    if casm.learn.store.is_store(filename):
+      pop = casm.learn.store.read_halloffame(filename)
+    else:
+      with open(filename, 'rb') as f:
+        pop = pickle.load(f)
     if isinstance(pop, HallOfFame):
       # convert to List
       pop = [indiv for indiv in pop]
@@ -293,6 +292,336 @@ def evaluate_all(pop, toolbox):
   for ind, fit in zip(invalid_ind, fitnesses):
     ind.fitness.values = fit
   return len(invalid_ind)
+
+
+def evaluate_children(parent, offspring, toolbox):
+  """
+  Evaluate and set fitness of all offspring with invalid fitness.
+  
+  If the toolbox contains 'evaluate_flips', children that differ from the 
+  parent by a single feature are evaluated in a batch using it, and the rest 
+  are evaluated using 'evaluate'.
+  
+  Arguments
+  ---------
+    
+    parent: individual
+      The parent of the offspring
+    
+    offspring: iterable of individual
+      Population to be evaluated
+    
+    toolbox: deap.base.Toolbox
+      Contains methods used by deap during evolution. Expected to contain:
+        
+        toolbox.evaluate(indiv): To evaluate an individual's fitness
+        
+        toolbox.map(func, List[individual]): To map function executions
+      
+      Optionally contains:
+        
+        toolbox.evaluate_flips(parent, flips): Returns the fitness value of 
+          each child obtained by flipping one feature of parent, or NaN for
+          children that must be evaluated using 'evaluate'. See 
+          casm.learn.model_selection.IncrementalLOOCV.flip_scores.
+  
+  Returns
+  -------
+    
+    nevals: int
+      Number of evaluations performed
+  
+  """
+  if not hasattr(toolbox, "evaluate_flips"):
+    return evaluate_all(offspring, toolbox)
+  
+  invalid_ind = [ind for ind in offspring if not ind.fitness.valid]
+  
+  flip_ind = []
+  flips = []
+  other_ind = []
+  if len(invalid_ind):
+    diff = casm.learn.tools.population_array(invalid_ind) != casm.learn.tools.to_array(parent)
+    n_diff = np.count_nonzero(diff, axis=1)
+    for ind, d, n in zip(invalid_ind, diff, n_diff):
+      if n == 1:
+        flip_ind.append(ind)
+        flips.append(np.flatnonzero(d)[0])
+      else:
+        other_ind.append(ind)
+  
+  if len(flip_ind):
+    values = toolbox.evaluate_flips(parent, flips)
+    for ind, value in zip(flip_ind, values):
+      if np.isnan(value):
+        other_ind.append(ind)
+      else:
+        ind.fitness.values = (float(value),)
+  
+  fitnesses = toolbox.map(toolbox.evaluate, other_ind)
+  for ind, fit in zip(other_ind, fitnesses):
+    ind.fitness.values = fit
+  return len(invalid_ind)
+
+
+class FitnessCache(object):
+  """
+  A bounded cache of individual fitness values.
+  
+  Individuals are keyed by their packed bitstring, so equal individuals share 
+  a cache entry. When full, the least recently used entries are discarded. The
+  cache may be saved to and loaded from a file, in which case entries are only
+  loaded if the cache 'fingerprint' matches, i.e. the fitness values were 
+  calculated with the same estimator, training data, and cross-validation 
+  parameters.
+  
+  Attributes
+  ----------
+    
+    fingerprint: str
+      Identifies the method used to calculate fitness values. 
+      See 'fitness_fingerprint'.
+    
+    maxsize: int
+      Maximum number of entries.
+    
+    hits: int
+      Number of fitness values obtained from the cache.
+    
+    misses: int
+      Number of fitness values not found in the cache.
+  
+  """
+  
+  def __init__(self, fingerprint, maxsize=100000):
+    """
+    Arguments
+    ---------
+      
+      fingerprint: str
+        Identifies the method used to calculate fitness values. 
+        See 'fitness_fingerprint'.
+      
+      maxsize: int, optional, default=100000
+        Maximum number of entries.
+    
+    """
+    self.fingerprint = fingerprint
+    self.maxsize = maxsize
+    self.hits = 0
+    self.misses = 0
+    self._data = OrderedDict()
+  
+  
+  def __len__(self):
+    return len(self._data)
+  
+  
+  @staticmethod
+  def key(indiv):
+    """Returns the key for an individual: (n_features, packed bitstring)"""
+    return (len(indiv), np.packbits(np.asarray(indiv, dtype=bool)).tobytes())
+  
+  
+  def get(self, indiv):
+    """Returns the cached fitness values of an individual, or None"""
+    k = FitnessCache.key(indiv)
+    value = self._data.pop(k, None)
+    if value is None:
+      self.misses += 1
+      return None
+    self._data[k] = value
+    self.hits += 1
+    return value
+  
+  
+  def set(self, indiv, values):
+    """Store the fitness values of an individual"""
+    k = FitnessCache.key(indiv)
+    self._data.pop(k, None)
+    self._data[k] = tuple(values)
+    while len(self._data) > self.maxsize:
+      self._data.popitem(last=False)
+  
+  
+  def map_func(self, map, evaluate):
+    """
+    Returns a function with the signature of 'map' that, when mapping 
+    'evaluate', only evaluates individuals whose fitness is not cached.
+    
+    Arguments
+    ---------
+      
+      map: func
+        A function with signature 'map(func, iterable)', such as toolbox.map.
+      
+      evaluate: func
+        The function used to evaluate fitness, such as toolbox.evaluate.
+    
+    """
+    def cached_map(func, iterable):
+      if func is not evaluate:
+        return map(func, iterable)
+      individuals = list(iterable)
+      values = [self.get(indiv) for indiv in individuals]
+      
+      # evaluate each distinct missing individual once
+      missing = OrderedDict()
+      for i, v in enumerate(values):
+        if v is None:
+          missing.setdefault(FitnessCache.key(individuals[i]), []).append(i)
+      first = [index[0] for index in missing.values()]
+      for index, v in zip(missing.values(), map(func, [individuals[i] for i in first])):
+        self.set(individuals[index[0]], v)
+        for i in index:
+          values[i] = v
+      return values
+    return cached_map
+  
+  
+  def load(self, filename, verbose=False):
+    """
+    Load entries from a file, if it exists and its fingerprint matches.
+    """
+    if not os.path.exists(filename):
+      return
+    with open(filename, 'rb') as f:
+      d = pickle.load(f)
+    if d["fingerprint"] != self.fingerprint:
+      if verbose:
+        print("Not loading fitness cache, it was calculated differently:", filename)
+      return
+    if verbose:
+      print("Loading fitness cache:", filename)
+    for k, v in d["data"]:
+      self._data[k] = v
+    while len(self._data) > self.maxsize:
+      self._data.popitem(last=False)
+  
+  
+  def save(self, filename, verbose=False):
+    """
+    Save entries to a file.
+    """
+    if verbose:
+      print("\nPickling fitness cache to:", filename)
+    backup = filename + ".tmp"
+    with open(backup, 'wb') as f:
+      pickle.dump({"fingerprint": self.fingerprint, "data": list(self._data.items())}, f, protocol=2)
+    os.rename(backup, filename)
+
+
+def fitness_fingerprint(estimator, X, y, scoring=None, cv=None, penalty=0.0):
+  """
+  Returns a str hash identifying the estimator, training data, and cross-
+  validation parameters used to calculate fitness.
+  """
+  h = hashlib.sha1()
+  def add(obj):
+    h.update(six.u(repr(obj)).encode('utf-8'))
+  add(type(estimator).__name__)
+  add(sorted(estimator.get_params().items()) if hasattr(estimator, "get_params") else estimator)
+  for a in [X, y]:
+    a = np.ascontiguousarray(a, dtype=float)
+    add(a.shape)
+    h.update(a.tobytes())
+  add(scoring)
+  if isinstance(cv, list):
+    for train, test in cv:
+      add((list(train), list(test)))
+  else:
+    add(cv)
+  add(penalty)
+  return h.hexdigest()
+
+
+class Checkpoint(object):
+  """
+  Periodically saves the state of an evolutionary algorithm, so that an 
+  interrupted run can be resumed exactly where it stopped.
+  
+  The state is saved after a generation if at least 'n_generation' generations
+  or 'seconds' seconds have passed since it was last saved. The checkpoint file
+  is replaced atomically, so an interrupted save leaves the previous checkpoint
+  intact.
+  
+  Attributes
+  ----------
+    
+    filename: string
+      Filename where the checkpoint is saved.
+    
+    n_generation: int or None
+      Number of generations between saving checkpoints, or None.
+    
+    seconds: float or None
+      Number of seconds between saving checkpoints, or None.
+  
+  """
+  
+  def __init__(self, filename, n_generation=None, seconds=None):
+    self.filename = filename
+    self.n_generation = n_generation
+    self.seconds = seconds
+    self._last_gen = 0
+    self._last_time = time.time()
+  
+  
+  def due(self, gen):
+    """
+    Returns True if a checkpoint should be saved after generation 'gen'.
+    """
+    if self.n_generation is not None and gen - self._last_gen >= self.n_generation:
+      return True
+    if self.seconds is not None and time.time() - self._last_time >= self.seconds:
+      return True
+    return False
+  
+  
+  def save(self, state, gen, verbose=False):
+    """
+    Save the algorithm state dict, along with the 'random' and 'numpy.random'
+    generator states.
+    """
+    if verbose:
+      print("\nPickling checkpoint to:", self.filename)
+    state = dict(state)
+    state["random_state"] = random.getstate()
+    state["np_random_state"] = np.random.get_state()
+    backup = self.filename + ".tmp"
+    with open(backup, 'wb') as f:
+      pickle.dump(state, f, protocol=2)
+    os.rename(backup, self.filename)
+    self._last_gen = gen
+    self._last_time = time.time()
+  
+  
+  def remove(self):
+    """
+    Remove the checkpoint file, if it exists.
+    """
+    if os.path.exists(self.filename):
+      os.remove(self.filename)
+  
+  
+  @staticmethod
+  def load(filename, verbose=False):
+    """
+    Returns the algorithm state dict saved in a checkpoint file, or None if it
+    does not exist. The 'random' and 'numpy.random' generator states are 
+    restored.
+    """
+    if not os.path.exists(filename):
+      if verbose:
+        print("No checkpoint to resume from:", filename)
+      return None
+    if verbose:
+      print("Resuming from checkpoint:", filename)
+    with open(filename, 'rb') as f:
+      state = pickle.load(f)
+    random.setstate(state["random_state"])
+    np.random.set_state(state["np_random_state"])
+    return state
   
 
 class EvolutionaryParams(object):
@@ -326,6 +655,22 @@ class EvolutionaryParams(object):
     
     n_halloffame: int
       Number of individuals to save in the hall of fame
+    
+    n_fitness_cache: int
+      Maximum number of individual fitness values to cache. If 0, fitness 
+      values are not cached.
+    
+    fitness_cache_filename: string or None
+      Filename where the fitness cache is saved, if not None.
+    
+    checkpoint_filename: string
+      Filename where checkpoints are saved, and resumed from.
+    
+    checkpoint_n_generation: int or None
+      Number of generations between saving checkpoints, or None.
+    
+    checkpoint_seconds: float or None
+      Number of seconds between saving checkpoints, or None.
   """
   
   def __init__(self, n_population=100, n_generation=10, n_repetition=100, n_features_init=1, 
@@ -333,7 +678,12 @@ class EvolutionaryParams(object):
                pop_end_filename = "population_end.pkl",
                halloffame_filename = "evolve_halloffame.pkl",
                filename_prefix = "",
-               n_halloffame = 25):
+               n_halloffame = 25,
+               n_fitness_cache = 100000,
+               fitness_cache_filename = None,
+               checkpoint_filename = "checkpoint.pkl",
+               checkpoint_n_generation = None,
+               checkpoint_seconds = 600.0):
     """
     Arguments
     ---------
@@ -366,6 +716,26 @@ class EvolutionaryParams(object):
     
       n_halloffame: int, optional, default=25
         Number of individuals to save in the hall of fame
+      
+      n_fitness_cache: int, optional, default=100000
+        Maximum number of individual fitness values to cache. If 0, fitness 
+        values are not cached.
+      
+      fitness_cache_filename: string, optional, default=None
+        Filename where the fitness cache is saved, and read from if it exists.
+        If None, the fitness cache is not saved.
+      
+      checkpoint_filename: string, optional, default="checkpoint.pkl"
+        Filename where checkpoints are saved, and resumed from.
+      
+      checkpoint_n_generation: int, optional, default=None
+        If not None, a checkpoint is saved after this many generations.
+      
+      checkpoint_seconds: float, optional, default=600.0
+        If not None, a checkpoint is saved after the first generation that ends 
+        this many seconds after the last checkpoint. If both 
+        checkpoint_n_generation and checkpoint_seconds are None, checkpoints 
+        are not saved.
   
     """
     self.n_population = n_population
@@ -382,6 +752,15 @@ class EvolutionaryParams(object):
     
     self.halloffame_filename = filename_prefix + halloffame_filename
     self.n_halloffame = n_halloffame
+    
+    self.n_fitness_cache = n_fitness_cache
+    self.fitness_cache_filename = None
+    if fitness_cache_filename is not None:
+      self.fitness_cache_filename = filename_prefix + fitness_cache_filename
+    
+    self.checkpoint_filename = filename_prefix + checkpoint_filename
+    self.checkpoint_n_generation = checkpoint_n_generation
+    self.checkpoint_seconds = checkpoint_seconds
 
 
 def default_stats(funcs=None):
@@ -429,17 +808,32 @@ class Log(object):
     
   """
   
-  def __init__(self, stats=default_stats()):
+  def __init__(self, stats=default_stats(), logbook=None):
     """
     Arguments
     ---------
       
       stats: deap.tools.Statistics, optional, default=default_stats()
         The statistics to be logged.
+      
+      logbook: deap.tools.Logbook, optional, default=None
+        An existing logbook to continue recording in. If None, a new logbook
+        is constructed.
     """
     self.stats = stats
-    self.logbook = deap.tools.Logbook()
-    self.logbook.header = ['gen', 'nevals'] + (self.stats.fields if self.stats else [])
+    if logbook is None:
+      logbook = deap.tools.Logbook()
+      logbook.header = ['gen', 'nevals'] + (self.stats.fields if self.stats else [])
+    self.logbook = logbook
+  
+  @property
+  def gen(self):
+    """
+    The last generation recorded, or None if no generation has been recorded.
+    """
+    if len(self.logbook) == 0:
+      return None
+    return self.logbook[-1]["gen"]
   
   def record(self, pop, gen, nevals, verbose=False):
     """
@@ -485,15 +879,68 @@ def single_flip_children(parent):
       Population to be evaluated
    
   """
+  bits = casm.learn.tools.to_array(parent)
   offspring = []
-  for index in range(len(parent)):
-    child = copy.deepcopy(parent)
-    del child.fitness.values
-    child[index] = not child[index]
-    offspring.append(child)
+  for index in range(len(bits)):
+    bits[index] = not bits[index]
+    offspring.append(type(parent)(bits.tolist()))
+    bits[index] = not bits[index]
   return offspring
 
 
+def mutFlipBit(individual, indpb):
+  """
+  Flip each feature of an individual with probability indpb.
+  
+  Equivalent to deap.tools.mutFlipBit, but vectorized using numpy.random.
+  
+  Arguments
+  ---------
+    
+    individual: List[bool] of length n_features
+      The individual to be mutated, in place.
+    
+    indpb: float
+      Independent probability for each feature to be flipped.
+  
+  Returns
+  -------
+    
+    (individual,)
+  """
+  bits = casm.learn.tools.to_array(individual)
+  individual[:] = (bits ^ (np.random.random(bits.size) < indpb)).tolist()
+  return individual,
+
+
+def cxUniform(ind1, ind2, indpb):
+  """
+  Swap features between two individuals, each with probability indpb.
+  
+  Equivalent to deap.tools.cxUniform, but vectorized using numpy.random.
+  
+  Arguments
+  ---------
+    
+    ind1, ind2: List[bool] of length n_features
+      The individuals to be mated, in place.
+    
+    indpb: float
+      Independent probability for each feature to be swapped.
+  
+  Returns
+  -------
+    
+    (ind1, ind2)
+  """
+  a = casm.learn.tools.to_array(ind1)
+  b = casm.learn.tools.to_array(ind2)
+  swap = np.random.random(min(a.size, b.size)) < indpb
+  n = swap.size
+  ind1[:n], ind2[:n] = np.where(swap, b[:n], a[:n]).tolist(), np.where(swap, a[:n], b[:n]).tolist()
+  return ind1, ind2
+
+
 def best_child(indiv, toolbox):
   """
   Return best child of a particular individual.
@@ -513,6 +960,8 @@ def best_child(indiv, toolbox):
         toolbox.evaluate(indiv): To evaluate an individual's fitness
         
         toolbox.map(func, List[individual]): To map function executions
+      
+      Optionally contains 'evaluate_flips', see 'evaluate_children'.
   
   Returns
   -------
@@ -527,11 +976,112 @@ def best_child(indiv, toolbox):
   """
   # generate children
   offspring = toolbox.children(indiv)
-  nevals = evaluate_all(offspring, toolbox)
+  nevals = evaluate_children(indiv, offspring, toolbox)
   return max(offspring, key=lambda child: child.fitness), nevals
 
 
-def eaIndividualBestFirst(pop, toolbox, n_generation=10, halloffame=None, stats=default_stats(), verbose=False):
+def eaSimple(pop, toolbox, cxpb, mutpb, n_generation, halloffame=None, stats=default_stats(), verbose=False,
+             checkpoint=None, logbook=None):
+  """
+  The simple genetic algorithm of deap.algorithms.eaSimple, which can save 
+  checkpoints and resume from them.
+  
+  Arguments
+  ---------
+    
+    pop: List[individual]
+      Initial population
+    
+    toolbox: deap.base.Toolbox
+      Contains methods used during evolution. Expected to contain:
+        
+        toolbox.select(pop, k): To select k individuals
+        
+        toolbox.mate(ind1, ind2): To mate individuals
+        
+        toolbox.mutate(indiv): To mutate an individual
+        
+        toolbox.evaluate(indiv): To evaluate an individual's fitness
+        
+        toolbox.map(func, List[individual]): To map function executions
+    
+    cxpb: float
+      Probability of mating two individuals.
+    
+    mutpb: float
+      Probability of mutating an individual.
+    
+    n_generation: int
+      Number of generations to run.
+    
+    halloffame: deap.tools.HallOfFame, optional, default=None
+      A Hall Of Fame containing the optimal solutions, as judged by CV score.
+    
+    stats: deap.tools.Statistics, optional, default=default_stats()
+      The statistics to be logged.
+    
+    verbose: boolean
+      Print information to stdout.
+    
+    checkpoint: func, optional, default=None
+      If not None, called as 'checkpoint(pop, logbook)' after each generation.
+    
+    logbook: deap.tools.Logbook, optional, default=None
+      If not None, resume from a checkpoint: 'pop' is the population saved by
+      'checkpoint' and evolution continues from the last generation recorded 
+      in 'logbook'.
+    
+  
+  Returns
+  -------
+    
+    (pop, logbook)
+    
+    pop: List[individual]
+      The final population
+    
+    logbook: deap.tools.Logbook 
+      Logbook with the statistics of the evolution
+  """
+  log = Log(stats, logbook=logbook)
+  
+  if logbook is None:
+    gen = 0
+    
+    # Evaluate & record in logbook
+    nevals = evaluate_all(pop, toolbox)
+    
+    if halloffame is not None:
+      halloffame.update(pop)
+    
+    log.record(pop, gen=gen, nevals=nevals, verbose=verbose)
+  else:
+    gen = log.gen
+  
+  while gen < n_generation:
+    
+    # select and vary the next generation
+    offspring = toolbox.select(pop, len(pop))
+    offspring = deap.algorithms.varAnd(offspring, toolbox, cxpb, mutpb)
+    nevals = evaluate_all(offspring, toolbox)
+    
+    if halloffame is not None:
+      halloffame.update(offspring)
+    
+    pop[:] = offspring
+    gen += 1
+    
+    # record in logbook
+    log.record(pop, gen=gen, nevals=nevals, verbose=verbose)
+    
+    if checkpoint is not None:
+      checkpoint(pop, log.logbook)
+  
+  return (pop, log.logbook)
+
+
+def eaIndividualBestFirst(pop, toolbox, n_generation=10, halloffame=None, stats=default_stats(), verbose=False,
+                          checkpoint=None, logbook=None):
   """
   Evolutionary algorithm that minimizes each individual in isolation by proposing
   children and replacing with the most fit child.
@@ -563,6 +1113,14 @@ def eaIndividualBestFirst(pop, toolbox, n_generation=10, halloffame=None, stats=
     verbose: boolean
       Print information to stdout.
     
+    checkpoint: func, optional, default=None
+      If not None, called as 'checkpoint(pop, logbook)' after each generation.
+    
+    logbook: deap.tools.Logbook, optional, default=None
+      If not None, resume from a checkpoint: 'pop' is the population saved by
+      'checkpoint' and evolution continues from the last generation recorded 
+      in 'logbook'.
+    
   
   Returns
   -------
@@ -575,28 +1133,32 @@ def eaIndividualBestFirst(pop, toolbox, n_generation=10, halloffame=None, stats=
     logbook: deap.tools.Logbook 
       Logbook with the statistics of the evolution
   """
-  remaining = len(pop)
-  gen = 0
-  
-  # Evaluate & record in logbook
-  nevals = evaluate_all(pop, toolbox)
-  for indiv in pop:
-    indiv.minimized = False
-  
-  log = Log(stats)
-  log.record(pop, gen=gen, nevals=nevals, verbose=verbose)
+  log = Log(stats, logbook=logbook)
   
-  # initial halloffame update
-  if halloffame is not None:
-    halloffame.update(pop)
+  if logbook is None:
+    gen = 0
+    
+    # Evaluate & record in logbook
+    nevals = evaluate_all(pop, toolbox)
+    for indiv in pop:
+      indiv.minimized = False
+    
+    log.record(pop, gen=gen, nevals=nevals, verbose=verbose)
+    
+    # initial halloffame update
+    if halloffame is not None:
+      halloffame.update(pop)
+  else:
+    gen = log.gen
   
+  remaining = len([indiv for indiv in pop if not indiv.minimized])
   
   while gen < n_generation:
     
     if remaining == 0:
       pop = initialize_population(len(pop), toolbox, verbose=verbose)
       remaining = len(pop)
-      nevals = evaluate_all(pop, toolbox)
+      nevals_sum = evaluate_all(pop, toolbox)
       for indiv in pop:
         indiv.minimized = False
       
@@ -625,12 +1187,14 @@ def eaIndividualBestFirst(pop, toolbox, n_generation=10, halloffame=None, stats=
     # record in logbook
     log.record(pop, gen=gen, nevals=nevals_sum, verbose=verbose)
     
-    
+    if checkpoint is not None:
+      checkpoint(pop, log.logbook)
   
   return (pop, log.logbook)
 
 
-def eaPopulationBestFirst(pop, toolbox, n_generation=10, halloffame=None, stats=default_stats(), verbose=False):
+def eaPopulationBestFirst(pop, toolbox, n_generation=10, halloffame=None, stats=default_stats(), verbose=False,
+                          checkpoint=None, logbook=None):
   """
   Evolutionary algorithm that minimizes a population by selecting the most fit
   non-parent, generating children, and updating the population with the most
@@ -665,6 +1229,14 @@ def eaPopulationBestFirst(pop, toolbox, n_generation=10, halloffame=None, stats=
     verbose: boolean
       Print information to stdout.
     
+    checkpoint: func, optional, default=None
+      If not None, called as 'checkpoint(pop, logbook)' after each generation.
+    
+    logbook: deap.tools.Logbook, optional, default=None
+      If not None, resume from a checkpoint: 'pop' is the population saved by
+      'checkpoint' and evolution continues from the last generation recorded 
+      in 'logbook'.
+    
   
   Returns
   -------
@@ -678,24 +1250,30 @@ def eaPopulationBestFirst(pop, toolbox, n_generation=10, halloffame=None, stats=
       Logbook with the statistics of the evolution
   """
   
-  gen = 0
-  in_pop = pop
-  
-  # Evaluate & record in logbook
-  nevals = evaluate_all(in_pop, toolbox)
-  
-  # use a HallOfFame for the population
-  pop = casm.learn.create_halloffame(len(in_pop))
-  pop.update(in_pop)
+  log = Log(stats, logbook=logbook)
   
-  # set as non-parents, if not specified
-  for indiv in pop:
-    if not hasattr(indiv, "parent"):
-      indiv.parent = False
-  
-  # record initial population stats
-  log = Log(stats)
-  log.record(pop, gen=gen, nevals=nevals, verbose=verbose)
+  if logbook is None:
+    gen = 0
+    in_pop = pop
+    
+    # Evaluate & record in logbook
+    nevals = evaluate_all(in_pop, toolbox)
+    
+    # use a HallOfFame for the population
+    pop = casm.learn.create_halloffame(len(in_pop))
+    pop.update(in_pop)
+    
+    # set as non-parents, if not specified
+    for indiv in pop:
+      if not hasattr(indiv, "parent"):
+        indiv.parent = False
+    
+    # record initial population stats
+    log.record(pop, gen=gen, nevals=nevals, verbose=verbose)
+  else:
+    # the checkpointed population is used as is, to keep the order of equally
+    # fit individuals
+    gen = log.gen
   
   while gen < n_generation:
     
@@ -717,7 +1295,7 @@ def eaPopulationBestFirst(pop, toolbox, n_generation=10, halloffame=None, stats=
     
     # generate children
     offspring = toolbox.children(next_parent)
-    nevals = evaluate_all(offspring, toolbox)
+    nevals = evaluate_children(next_parent, offspring, toolbox)
     
     # set offspring as non-parents
     for indiv in offspring:
@@ -735,6 +1313,9 @@ def eaPopulationBestFirst(pop, toolbox, n_generation=10, halloffame=None, stats=
     
     # record in logbook
     log.record(pop, gen=gen, nevals=nevals, verbose=verbose)
+    
+    if checkpoint is not None:
+      checkpoint(pop, log.logbook)
   
   return (pop, log.logbook)
 
@@ -752,7 +1333,11 @@ class EvolutionaryFeatureSelection(BaseEstimator, SelectorMixin):
                alg_args=list(),
                alg_kwargs=dict(),
                stats=default_stats(),
-               verbose=True):
+               verbose=True,
+               n_jobs=1,
+               backend="process",
+               random_state=None,
+               resume=False):
     
     self.algorithm = algorithm
     self.alg_args = alg_args
@@ -768,17 +1353,39 @@ class EvolutionaryFeatureSelection(BaseEstimator, SelectorMixin):
     self.penalty = penalty
     self.verbose = verbose
     
+    self.n_jobs = n_jobs
+    self.backend = backend
+    self.random_state = random_state
+    self.resume = resume
+    
     self.toolbox = deap.base.Toolbox()
     self.stats = stats
     
   
-  def _run(self):
+  def _run(self, X, y):
     """
     Run the specified evolutionary algorithm.
     
+    If self.random_state is not None, it is used to seed the 'random' and
+    'numpy.random' generators first. If self.n_jobs != 1, individuals are 
+    evaluated in parallel using a casm.learn.parallel.ParallelEvaluator. If
+    self.evolve_params.n_fitness_cache > 0, fitness values are cached in 
+    self.fitness_cache, a FitnessCache. 
+    
+    If self.resume is True and a checkpoint file written for the same problem
+    exists, the algorithm continues from the checkpoint. Checkpoints are saved
+    as specified by self.evolve_params, and removed when the algorithm 
+    completes.
+    
     Arguments
     ---------
       
+      X: array-like of shape (n_samples, n_features)
+        The input data
+      
+      y: array-like of shape (n_samples, 1)
+        The values
+      
       algorithm: func,
         The evolutionary algorithm to perform
       
@@ -816,20 +1423,76 @@ class EvolutionaryFeatureSelection(BaseEstimator, SelectorMixin):
     
       self: returns an instance of self.
     """
-    ## read or construct hall of fame
-    self.halloffame = initialize_halloffame(
-      filename=self.evolve_params.halloffame_filename,
-      n_halloffame=self.evolve_params.n_halloffame)
-    
-    
-    ## read or construct initial population
+    if self.random_state is not None:
+      random.seed(self.random_state)
+      np.random.seed(self.random_state)
+    
+    serial_evaluate = self.toolbox.evaluate
+    evaluator = None
+    if self.n_jobs != 1:
+      evaluator = casm.learn.parallel.ParallelEvaluator(self.estimator, X, y,
+        scoring=self.scoring, cv=self.cv, penalty=self.penalty,
+        n_jobs=self.n_jobs, backend=self.backend)
+      self.toolbox.register("evaluate", evaluator.evaluate)
+      self.toolbox.register("map", evaluator.map)
+    
+    self.fingerprint = fitness_fingerprint(self.estimator, X, y, 
+      scoring=self.scoring, cv=self.cv, penalty=self.penalty)
+    
+    self.fitness_cache = None
+    params = self.evolve_params
+    if params.n_fitness_cache > 0:
+      self.fitness_cache = FitnessCache(self.fingerprint, maxsize=params.n_fitness_cache)
+      if params.fitness_cache_filename is not None:
+        self.fitness_cache.load(params.fitness_cache_filename, verbose=self.verbose)
+      self.toolbox.register("map", self.fitness_cache.map_func(self.toolbox.map, self.toolbox.evaluate))
+    
+    try:
+      return self._run_algorithm()
+    finally:
+      if evaluator is not None:
+        evaluator.close()
+      self.toolbox.register("evaluate", serial_evaluate)
+      self.toolbox.register("map", map)
+  
+  
+  def _run_algorithm(self):
+    params = self.evolve_params
     self.toolbox.decorate("population", enforce_constraints(self.constraints))
-    self.pop = initialize_population(self.evolve_params.n_population, self.toolbox, 
-      filename=self.evolve_params.pop_begin_filename, verbose=self.verbose)
-    self.pop_begin = copy.deepcopy(self.pop)
+    
+    state = None
+    if self.resume:
+      state = Checkpoint.load(params.checkpoint_filename, verbose=self.verbose)
+      if state is not None and state["fingerprint"] != self.fingerprint:
+        raise Exception("Error resuming from checkpoint: " + params.checkpoint_filename + 
+          " was saved for a different problem, estimator, or cv")
+    
+    if state is not None:
+      self.halloffame = state["halloffame"]
+      self.pop = state["pop"]
+      self.pop_begin = state["pop_begin"]
+      begin_rep = state["rep"]
+      logbook = state["logbook"]
+    else:
+      ## read or construct hall of fame
+      self.halloffame = initialize_halloffame(
+        filename=params.halloffame_filename,
+        n_halloffame=params.n_halloffame)
+      
+      ## read or construct initial population
+      self.pop = initialize_population(params.n_population, self.toolbox, 
+        filename=params.pop_begin_filename, verbose=self.verbose)
+      self.pop_begin = copy.deepcopy(self.pop)
+      begin_rep = 0
+      logbook = None
+    
+    checkpoint = None
+    if params.checkpoint_n_generation is not None or params.checkpoint_seconds is not None:
+      checkpoint = Checkpoint(params.checkpoint_filename, 
+        n_generation=params.checkpoint_n_generation, seconds=params.checkpoint_seconds)
     
     ## Run algorithm
-    for rep in range(self.evolve_params.n_repetition):
+    for rep in range(begin_rep, self.evolve_params.n_repetition):
       
       if self.verbose:
         print("Begin", rep+1, "of", self.evolve_params.n_repetition, "repetitions")
@@ -842,12 +1505,19 @@ class EvolutionaryFeatureSelection(BaseEstimator, SelectorMixin):
       in_kwargs = dict()
       for key, f in six.iteritems(self.alg_kwargs):
         in_kwargs[key] = f(self)
+      if checkpoint is not None:
+        in_kwargs["checkpoint"] = self._checkpoint_func(checkpoint, rep)
+      if logbook is not None:
+        in_kwargs["logbook"] = logbook
+        logbook = None
       
       self.pop, self.logbook = self.algorithm(*in_args, **in_kwargs)
       self.pop_end = copy.deepcopy(self.pop)
       
       if self.verbose:
         print("Runtime:", time.clock() - t, "(s)\n")
+        if self.fitness_cache is not None:
+          print("Fitness cache hits:", self.fitness_cache.hits, "misses:", self.fitness_cache.misses, "\n")
       
       ## Print end population
       if self.verbose:
@@ -863,9 +1533,48 @@ class EvolutionaryFeatureSelection(BaseEstimator, SelectorMixin):
 
       save_halloffame(self.halloffame, filename=self.evolve_params.halloffame_filename, verbose=self.verbose)
       
+      if self.fitness_cache is not None and self.evolve_params.fitness_cache_filename is not None:
+        self.fitness_cache.save(self.evolve_params.fitness_cache_filename, verbose=self.verbose)
+    
+    if checkpoint is not None:
+      checkpoint.remove()
+    
     return self
   
   
+  def _checkpoint_func(self, checkpoint, rep):
+    """
+    Returns a function, 'f(pop, logbook)', for the algorithm to call after each
+    generation of repetition 'rep' that saves a checkpoint when it is due.
+    """
+    def f(pop, logbook):
+      gen = rep*self.evolve_params.n_generation + logbook[-1]["gen"]
+      if not checkpoint.due(gen):
+        return
+      state = {
+        "fingerprint": self.fingerprint,
+        "rep": rep,
+        "pop": pop,
+        "pop_begin": self.pop_begin,
+        "logbook": logbook,
+        "halloffame": self.halloffame}
+      checkpoint.save(state, gen, verbose=self.verbose)
+    return f
+  
+  
+  def _register_evaluate_flips(self, X, y):
+    """
+    Register 'evaluate_flips' in the toolbox if single feature flip children 
+    can be evaluated incrementally. See 'evaluate_children'.
+    """
+    engine = casm.learn.model_selection.incremental_loocv(
+      self.estimator, X, y, scoring=self.scoring, cv=self.cv, penalty=self.penalty)
+    if engine is not None:
+      self.toolbox.register("evaluate_flips", engine.flip_scores)
+    elif hasattr(self.toolbox, "evaluate_flips"):
+      self.toolbox.unregister("evaluate_flips")
+  
+  
   def _get_support_mask(self):
     """
     Return most fit inidividual found.
@@ -899,8 +1608,10 @@ class GeneticAlgorithm(EvolutionaryFeatureSelection):
   """
   Genetic algorithm for regression by optimizing a CV score.
   
-  Implements deap.algorithms.eaSimple, using selTournament, for selection, 
-  cxUniform for mating, and mutFlipBit for mutation. The probability of mating 
+  Implements deap.algorithms.eaSimple (see casm.learn.evolve.eaSimple), using
+  selTournament, for selection, 
+  cxUniform for mating, and mutFlipBit for mutation (vectorized versions of the
+  deap.tools operators). The probability of mating 
   and mutating is set to 1.0. 
   
   The population of solutions is saved
@@ -969,7 +1680,7 @@ class GeneticAlgorithm(EvolutionaryFeatureSelection):
   def __init__(self, estimator, scoring=None, cv=None, penalty=0.0,
                evolve_params_kwargs=dict(), constraints_kwargs=dict(),
                selTournamentSize=3, cxUniformProb=0.5, mutFlipBitProb=0.01,
-               verbose=True):
+               verbose=True, n_jobs=1, backend="process", random_state=None, resume=False):
     """
     Arguments
     ---------
@@ -1011,10 +1722,23 @@ class GeneticAlgorithm(EvolutionaryFeatureSelection):
       
       verbose: boolean, optional, default=True
         Print information to stdout.
+      
+      n_jobs: int, optional, default=1
+        Number of worker processes or threads used to evaluate individuals. If
+        negative, (number of CPUs + 1 + n_jobs) are used, so -1 uses all CPUs.
+      
+      backend: str, optional, default="process"
+        One of "process" or "thread", the type of workers used if n_jobs != 1.
+      
+      random_state: int or None, optional, default=None
+        If not None, used to seed the 'random' and 'numpy.random' generators.
+      
+      resume: boolean, optional, default=False
+        If True, resume from the checkpoint file, if it exists.
     
     """
     super(GeneticAlgorithm, self).__init__(
-      deap.algorithms.eaSimple,
+      eaSimple,
       estimator,
       scoring=scoring, 
       cv=cv, 
@@ -1022,6 +1746,10 @@ class GeneticAlgorithm(EvolutionaryFeatureSelection):
       evolve_params_kwargs=evolve_params_kwargs, 
       constraints_kwargs=constraints_kwargs, 
       verbose=verbose,
+      n_jobs=n_jobs,
+      backend=backend,
+      random_state=random_state,
+      resume=resume,
       alg_args=[
         attrgetter("pop"), 
         attrgetter("toolbox"), 
@@ -1046,11 +1774,11 @@ class GeneticAlgorithm(EvolutionaryFeatureSelection):
     self.toolbox.register("select", deap.tools.selTournament, tournsize=self.selTournamentSize)
     
     ## Crossover 
-    self.toolbox.register("mate", deap.tools.cxUniform, indpb=self.cxUniformProb)
+    self.toolbox.register("mate", cxUniform, indpb=self.cxUniformProb)
     self.toolbox.decorate("mate", enforce_constraints(self.constraints))
       
     ## Mutation
-    self.toolbox.register("mutate", deap.tools.mutFlipBit, indpb=self.mutFlipBitProb)
+    self.toolbox.register("mutate", mutFlipBit, indpb=self.mutFlipBitProb)
     self.toolbox.decorate("mutate", enforce_constraints(self.constraints))
     
     
@@ -1084,7 +1812,7 @@ class GeneticAlgorithm(EvolutionaryFeatureSelection):
     self.toolbox.register("evaluate", casm.learn.model_selection.cross_val_score, 
       self.estimator, X, y=y, scoring=self.scoring, cv=self.cv, penalty=self.penalty)
     
-    return self._run() 
+    return self._run(X, y)
       
 
 
@@ -1100,6 +1828,10 @@ class IndividualBestFirst(EvolutionaryFeatureSelection):
   from the parent by +/- 1 selected feature. But any generating function may be
   given that generates offspring from a single parent individual.
   
+  If the estimator is LinearRegression and cv is LeaveOneOut, children that
+  differ from the parent by one feature are scored incrementally from the 
+  parent's fit. See casm.learn.model_selection.IncrementalLOOCV.
+  
   
   Attributes
   ---------
@@ -1146,7 +1878,7 @@ class IndividualBestFirst(EvolutionaryFeatureSelection):
   def __init__(self, estimator, scoring=None, cv=None, penalty=0.0,
                evolve_params_kwargs=dict(), constraints_kwargs=dict(),
                children=single_flip_children,
-               verbose=True):
+               verbose=True, n_jobs=1, backend="process", random_state=None, resume=False):
     """
     Arguments
     ---------
@@ -1180,6 +1912,19 @@ class IndividualBestFirst(EvolutionaryFeatureSelection):
     
       verbose: boolean, optional, default=True
         Print information to stdout.
+      
+      n_jobs: int, optional, default=1
+        Number of worker processes or threads used to evaluate individuals. If
+        negative, (number of CPUs + 1 + n_jobs) are used, so -1 uses all CPUs.
+      
+      backend: str, optional, default="process"
+        One of "process" or "thread", the type of workers used if n_jobs != 1.
+      
+      random_state: int or None, optional, default=None
+        If not None, used to seed the 'random' and 'numpy.random' generators.
+      
+      resume: boolean, optional, default=False
+        If True, resume from the checkpoint file, if it exists.
     
     """
     
@@ -1198,6 +1943,10 @@ class IndividualBestFirst(EvolutionaryFeatureSelection):
       evolve_params_kwargs=evolve_params_kwargs, 
       constraints_kwargs=constraints_kwargs, 
       verbose=verbose,
+      n_jobs=n_jobs,
+      backend=backend,
+      random_state=random_state,
+      resume=resume,
       alg_args=[
         attrgetter("pop"), 
         attrgetter("toolbox"), 
@@ -1242,8 +1991,9 @@ class IndividualBestFirst(EvolutionaryFeatureSelection):
     self.toolbox.register("population", deap.tools.initRepeat, list, self.toolbox.individual)
     self.toolbox.register("evaluate", casm.learn.model_selection.cross_val_score, 
       self.estimator, X, y=y, scoring=self.scoring, cv=self.cv, penalty=self.penalty)
+    self._register_evaluate_flips(X, y)
     
-    return self._run()
+    return self._run(X, y)
 
 
 
@@ -1262,6 +2012,10 @@ class PopulationBestFirst(EvolutionaryFeatureSelection):
   from the parent by +/- 1 selected feature. But any generating function may be
   given that generates offspring from a single parent individual.
   
+  If the estimator is LinearRegression and cv is LeaveOneOut, children that
+  differ from the parent by one feature are scored incrementally from the 
+  parent's fit. See casm.learn.model_selection.IncrementalLOOCV.
+  
   
   Attributes
   ----------
@@ -1308,7 +2062,7 @@ class PopulationBestFirst(EvolutionaryFeatureSelection):
   def __init__(self, estimator, scoring=None, cv=None, penalty=0.0,
                evolve_params_kwargs=dict(), constraints_kwargs=dict(),
                children=single_flip_children,
-               verbose=True):
+               verbose=True, n_jobs=1, backend="process", random_state=None, resume=False):
     """
     Arguments
     ---------
@@ -1342,6 +2096,19 @@ class PopulationBestFirst(EvolutionaryFeatureSelection):
     
       verbose: boolean, optional, default=True
         Print information to stdout.
+      
+      n_jobs: int, optional, default=1
+        Number of worker processes or threads used to evaluate individuals. If
+        negative, (number of CPUs + 1 + n_jobs) are used, so -1 uses all CPUs.
+      
+      backend: str, optional, default="process"
+        One of "process" or "thread", the type of workers used if n_jobs != 1.
+      
+      random_state: int or None, optional, default=None
+        If not None, used to seed the 'random' and 'numpy.random' generators.
+      
+      resume: boolean, optional, default=False
+        If True, resume from the checkpoint file, if it exists.
     
     """
     # add a count of the number of individuals fully optimized
@@ -1359,6 +2126,10 @@ class PopulationBestFirst(EvolutionaryFeatureSelection):
       evolve_params_kwargs=evolve_params_kwargs, 
       constraints_kwargs=constraints_kwargs, 
       verbose=verbose,
+      n_jobs=n_jobs,
+      backend=backend,
+      random_state=random_state,
+      resume=resume,
       alg_args=[
         attrgetter("pop"), 
         attrgetter("toolbox"), 
@@ -1403,8 +2174,9 @@ class PopulationBestFirst(EvolutionaryFeatureSelection):
     self.toolbox.register("population", deap.tools.initRepeat, list, self.toolbox.individual)
     self.toolbox.register("evaluate", casm.learn.model_selection.cross_val_score, 
       self.estimator, X, y=y, scoring=self.scoring, cv=self.cv, penalty=self.penalty)
+    self._register_evaluate_flips(X, y)
     
-    return self._run()
+    return self._run(X, y)
 
 
 
@@ -7,7 +7,7 @@ from casm.learn.fit import make_fitting_data, make_estimator, make_selector, \
 import casm.learn.model_selection
 from casm.learn.evolve import GeneticAlgorithm, IndividualBestFirst, PopulationBestFirst
 
-def fit_and_select(input, save=True, verbose=True, read_existing=True, hall=None):
+def fit_and_select(input, save=True, verbose=True, read_existing=True, hall=None, resume=False):
   """
   Arguments
   ---------
@@ -30,6 +30,10 @@ def fit_and_select(input, save=True, verbose=True, read_existing=True, hall=None
     hall: deap.tools.HallOfFame, optional, default=None
       A Hall Of Fame to add resulting individuals to
     
+    resume: boolean, optional, default=False
+      If True, and the feature selection method supports it, resume from its 
+      last checkpoint.
+    
       
   Returns
   -------
@@ -56,7 +60,8 @@ def fit_and_select(input, save=True, verbose=True, read_existing=True, hall=None
   
   # feature selection
   selector = make_selector(input, estimator, 
-    scoring=fdata.scoring, cv=fdata.cv, penalty=fdata.penalty, verbose=verbose)
+    scoring=fdata.scoring, cv=fdata.cv, penalty=fdata.penalty, verbose=verbose,
+    resume=resume)
   
   if not hasattr(selector, "get_halloffame") and not hasattr(selector, "get_support"):
     raise Exception("Selector has neither 'get_halloffame' nor 'get_support'")
@@ -26,8 +26,11 @@ from os.path import splitext, basename, join
 import casm.learn.linear_model
 import casm.learn.tools
 import casm.learn.selection_wrapper
+import casm.learn.store
+import casm.learn.hull
+import casm.learn.predict
 from casm.misc import noindent
-from casm.project import Project, Selection, query, write_eci
+from casm.project import Project, Selection, query, iter_query, write_eci
 
 def _find_method(mods, attrname):
   for m in mods:
@@ -459,6 +462,9 @@ def print_input_help():
   #        will be used.
   #     "csv": path to a CSV file
   #     "json": path to a JSON file
+  #     "arrays": path to an array store directory, written by
+  #        casm.learn.store.write_training_data. X is memory mapped rather than
+  #        read into memory.
   #
   # X: string, optional, default="corr"
   #   The name of sample data. Expected to take the form "X(0)", "X(1)", etc...
@@ -466,6 +472,18 @@ def print_input_help():
   # y: string, optional, default="formation_energy"
   #   The name of the target value to train with.
   #
+  # dtype: string, optional, default="float64"
+  #   The dtype of the sample data. Use "float32" to halve the memory used to
+  #   hold X.
+  #
+  # chunksize: int or null, optional, default=null
+  #   If not null, read "csv" and "json" files, or query "selection" data, in
+  #   chunks of at most 'chunksize' rows. The "X(i)" columns of each chunk are
+  #   copied directly into X, and are not included in the data written by
+  #   --checkspecs. Of the other columns in "csv" and "json" files, only "y",
+  #   "configname", "selected", "is_calculated", "hull_dist", "weight", and
+  #   "weight(i)" are read. For "json", requires kwargs {"lines": true}.
+  #
   # kwargs: dict or null, optional, default=dict()
   #   Additional parameters to be used to get training data.
   #
@@ -480,6 +498,10 @@ def print_input_help():
   #
   #   Options for 'filetype' "json":
   #     Any options to pass to pandas.read_json
+  #
+  #   Options for 'filetype' "arrays":
+  #     "mmap_mode": The numpy.load 'mmap_mode' used to read X. Default "r".
+  #       Use null to read X into memory.
 
       "data" : {
         "filename": "train",
@@ -502,11 +524,11 @@ def print_input_help():
   #   Weighted least squares minimizes
   #     (y-X*b).transpose() * W * (y-X*b)
   #
-  #   Using the SVD, and given that W is Hermitian:
-  #     U * S * U.transpose() == W
+  #   Given that W is Hermitian, positive-definite, define L such that:
+  #     L.transpose() * L == W
   #
-  #   Define L such that:
-  #     L.transpose() = U * sqrt(S)
+  #   If W is diagonal, L = diag(sqrt(w)), otherwise L is obtained from the
+  #   Cholesky decomposition of W.
   #
   #   Then we can write the weighted least squares problem using:
   #     (y-X*b).transpose() * L.transpose() * L * (y-X*b)
@@ -594,10 +616,10 @@ def print_input_help():
   #       'casm-learn --checkspecs' by using the required kwarg 'filename'.
   #
   #     Note: The 'LinearRegression' estimator is implemented using
-  #     casm.learn.linear_model.LinearRegressionForLOOCV', which solves X*b=y using:
-  #       S = np.linalg.pinv(X.transpose().dot(X)).dot(X.transpose())
-  #       b = np.dot(S, y)
-  #       H = np.dot(X, S)
+  #     casm.learn.linear_model.LinearRegressionForLOOCV', which solves X*b=y using
+  #     the thin SVD, X = U*s*V.transpose():
+  #       b = V * np.diag(1/s) * U.transpose() * y
+  #       H = U * U.transpose()
   #       y_pred = np.dot(H, y)
   #
   #     Note: When the estimator is 'LinearRegression', the 'LeaveOneOut'
@@ -605,6 +627,15 @@ def print_input_help():
   #
   #       LOOCV = np.mean(((y - y_pred)/(1.0 - np.diag(H)))**2)
   #
+  #     where np.diag(H) = np.sum(U*U, axis=1), so H is never constructed.
+  #
+  #     Note: When the estimator is 'LinearRegression' or 'Ridge' (with
+  #     "fit_intercept": false), and the train/test sets are the same each
+  #     time they are generated (i.e. 'KFold' without shuffling, or with
+  #     "random_state" set), the CV score is calculated using X.transpose()*X
+  #     and X.transpose()*y calculated once, without refitting for each
+  #     train/test set. See casm.learn.model_selection.GramCV.
+  #
   # kwargs: dict or null, optional, default=dict()
   #   Additional parameters to be used to construct the cross-validation method
   #   constructor.
@@ -625,9 +656,16 @@ def print_input_help():
   #
   # Optional. Name to use for file storing the training data and CV train/test
   # sets. The default is determined from the input filename, for example,
-  # 'my_input_specs.pkl' is used if the input file is named 'my_input.json'.
+  # 'my_input_specs.arrays' is used if the input file is named 'my_input.json'.
+  #
+  # Files ending in '.arrays' are array store directories, holding the
+  # training data as arrays that are memory mapped when read. Files ending in
+  # '.pkl' use the pickle format of earlier versions of casm-learn. If the
+  # default '.arrays' file does not exist, but the corresponding '.pkl' file
+  # does, the '.pkl' file is used. Use 'casm-learn -s my_input.json --convert'
+  # to convert existing '.pkl' files.
 
-      "specs_filename": "problem_specs.pkl"
+      "specs_filename": "problem_specs.arrays"
 
     },
 
@@ -643,18 +681,20 @@ def print_input_help():
   #     See: http://scikit-learn.org/stable/modules/linear_model.html
   #
   #   Note: The 'LinearRegression' estimator is implemented using
-  #   casm.learn.linear_model.LinearRegressionForLOOCV', which solves X*b=y using:
+  #   casm.learn.linear_model.LinearRegressionForLOOCV', which solves X*b=y using
+  #   the thin SVD, X = U*s*V.transpose(), equivalent to:
   #     b = np.dot(S, y)
   #     S = np.linalg.pinv(X.transpose().dot(X)).dot(X.transpose())
   #     y_pred = np.dot(H, y)
-  #     H = np.dot(X, S)
+  #     H = np.dot(X, S) = U * U.transpose()
   #
   # kwargs: dict or null, optional, default=dict()
   #   Additional parameters to be used to construct the estimator
   #
   #   Options for "LinearRegression":
   #     "pinv": bool, optional, default=True
-  #       If True, use the pseudo-inverse via np.linalg.pinv; else use np.linalg.inv.
+  #       If True, use the pseudo-inverse via the SVD; else use the QR decomposition,
+  #       which requires X to have full column rank.
   #
   #   Options for other methods:
   #     Any options to pass to the estimator construtor.
@@ -841,7 +881,8 @@ def print_input_help():
   #        The population file may contain either a  list of individual,
   #        as written to the "population_end.pkl" file, or a HallOfFame
   #        instance, as written to either an "evolve_halloffame.pkl" file or
-  #        overall casm-learn "halloffame.pkl" file.
+  #        overall casm-learn "halloffame.pkl" file. It may also be an overall
+  #        casm-learn "halloffame.arrays" hall of fame array store.
   #
   #     "pop_end_filename": string, optional, default="population_end.pkl"
   #        Filename where the final population is saved. For example, if
@@ -860,6 +901,52 @@ def print_input_help():
   #        extension. For example, if input file is named "Ef_kfold10.json", then
   #        "Ef_kfold10_population_begin.pkl", "Ef_kfold10_population_end.pkl", and
   #        "Ef_kfold10_evolve_halloffame.pkl" are used.
+  #
+  #     "n_fitness_cache": int, optional, default=100000
+  #        Maximum number of individual fitness values remembered, so that
+  #        individuals generated repeatedly are only evaluated once. If 0,
+  #        fitness values are not remembered.
+  #
+  #     "fitness_cache_filename": string, optional, default=null
+  #        If not null, filename suffix where remembered fitness values are
+  #        saved, and read from if it exists, so that they are also re-used when
+  #        restarting. Saved values are only re-used if the training data,
+  #        estimator, and cv settings are unchanged. For example,
+  #        "fitness_cache.pkl".
+  #
+  #     "checkpoint_filename": string, optional, default="checkpoint.pkl"
+  #        Filename suffix where checkpoints are saved. A checkpoint holds the
+  #        current population, hall of fame, logbook, and random number
+  #        generator state, so that 'casm-learn --resume' can continue an
+  #        interrupted run exactly where the checkpoint was saved. The file is
+  #        replaced atomically, and removed when the run completes.
+  #
+  #     "checkpoint_n_generation": int, optional, default=null
+  #        If not null, save a checkpoint after this many generations.
+  #
+  #     "checkpoint_seconds": number, optional, default=600.0
+  #        If not null, save a checkpoint after the first generation that ends
+  #        this many seconds after the last checkpoint. If both
+  #        "checkpoint_n_generation" and "checkpoint_seconds" are null,
+  #        checkpoints are not saved.
+  #
+  #
+  #   The evolutionary algorithms also accept the following optional "kwargs",
+  #   which control how individuals are evaluated:
+  #
+  #     "n_jobs": int, optional, default=1
+  #        Number of worker processes or threads used to evaluate the CV score
+  #        of individuals in parallel. If negative, (number of CPUs + 1 + n_jobs)
+  #        are used, so -1 uses all CPUs. With n_jobs != 1, the "cv" train/test
+  #        sets are generated once and used for every evaluation.
+  #
+  #     "backend": string, optional, default="process"
+  #        One of "process" or "thread". With "process", the training data is
+  #        shared with the worker processes via shared memory.
+  #
+  #     "random_state": int or null, optional, default=null
+  #        If not null, seeds the random number generators used to create and
+  #        evolve individuals, so that results are reproducible.
 
     "feature_selection" : {
       "method": "GeneticAlgorithm",
@@ -884,12 +971,14 @@ def print_input_help():
 
   # The "halloffame_filename" option:
   #
-  # Optional. Default = "halloffame.pkl"
+  # Optional. Default = "halloffame.arrays"
   # Name to use for file storing the best results obtained to date, as determined
   # by the CV score. This enables comparison of the results of various estimator
-  # or feature selection methods.
+  # or feature selection methods. As for "specs_filename", names ending in
+  # '.pkl' use the pickle format, and the default is determined from the input
+  # filename, i.e. 'my_input_halloffame.arrays'.
 
-      "halloffame_filename": "halloffame.pkl"
+      "halloffame_filename": "halloffame.arrays"
 
     },
 
@@ -982,8 +1071,10 @@ def print_input_help():
   #   provides all the ranges for which the RMSE is requested.
   #
   # composition: str, optional, default="atom_frac"
-  #   Composition argument use for 'casm query' properties 'hull_dist' and
-  #   'clex_hull_dist'. For thermodynamic ground states, use "atom_frac".
+  #   Composition used to construct the convex hulls, as for the 'casm query'
+  #   properties 'hull_dist' and 'clex_hull_dist'. For "atom_frac", formation
+  #   energy per atom is used, and for "comp", formation energy per unit cell.
+  #   For thermodynamic ground states, use "atom_frac".
   #
   # hull_tol: number, optional, default=proj.settings.data["lin_alg_tol"]
   #   Tolerance used for identify hull states
@@ -993,6 +1084,11 @@ def print_input_help():
   #
   # bottom_tol: number, optional, default=1e-8
   #   Tolerance for detecting which facets form the convex hull bottom
+  #
+  # n_jobs: int, optional, default=1
+  #   Number of worker processes used to construct the predicted convex hulls
+  #   of individuals in parallel. If negative, (number of CPUs + 1 + n_jobs)
+  #   are used, so -1 uses all CPUs.
 
     "checkhull" : {
       "selection": "ALL",
@@ -1003,7 +1099,8 @@ def print_input_help():
       "composition": "atom_frac",
       "hull_tol": 1e-8,
       "dim_tol": 1e-8,
-      "bottom_tol": 1e-8
+      "bottom_tol": 1e-8,
+      "n_jobs": 1
     }
 
   }
@@ -1048,6 +1145,42 @@ def default_filename(prefix, default, suffix):
     return default
 
 
+def default_store_filename(prefix, default, suffix):
+  """
+  Make a default array store filename from the input file filename.
+
+  As default_filename, except that if the array store does not exist, but a
+  file with the same name and the legacy '.pkl' extension does exist, the
+  '.pkl' filename is returned.
+
+  Arguments
+  ---------
+
+    prefix: str or None
+      The prefix used in determining the default filename.
+
+    default: str
+      Filename if input_filename is None
+
+    suffix: str
+      If input_filename is not None, append this suffix to the input_filename
+      (excluding extension) to make the filename.
+
+
+  Returns
+  --------
+
+    filename: str
+      The generated default filename
+
+  """
+  filename = default_filename(prefix, default, suffix)
+  legacy_filename = splitext(filename)[0] + ".pkl"
+  if not os.path.exists(filename) and os.path.exists(legacy_filename):
+    return legacy_filename
+  return filename
+
+
 def set_input_defaults(input, input_filename=None):
   """
   Set common input defaults. Currently, includes everything except "checkspecs"
@@ -1083,7 +1216,7 @@ def set_input_defaults(input, input_filename=None):
       specs["problem_specs_prefix"] = splitext(basename(input_filename))[0]
 
   if "specs_filename" not in specs:
-    specs["specs_filename"] = default_filename(specs["problem_specs_prefix"], "problem_specs.pkl", "_specs.pkl")
+    specs["specs_filename"] = default_store_filename(specs["problem_specs_prefix"], "problem_specs.arrays", "_specs.arrays")
 
   # set data defaults if not provided
   if "data" not in specs:
@@ -1148,7 +1281,7 @@ def set_input_defaults(input, input_filename=None):
 
   # hall of fame
   if "halloffame_filename" not in input:
-    input["halloffame_filename"] = default_filename(specs["problem_specs_prefix"], "halloffame.pkl", "_halloffame.pkl")
+    input["halloffame_filename"] = default_store_filename(specs["problem_specs_prefix"], "halloffame.arrays", "_halloffame.arrays")
   if "n_halloffame" not in input:
     input["n_halloffame"] = 25
 
@@ -1187,7 +1320,7 @@ class FittingData(object):
 
     L*X * b = L*y
 
-  a weighted linear model where the weights are given by W = L * L.transpose().
+  a weighted linear model where the weights are given by W = L.transpose() * L.
 
   Attributes
   ----------
@@ -1207,11 +1340,17 @@ class FittingData(object):
     n_features: int
       The number of features (number of columns in X)
 
+    weight_factor: array-like of shape: (n_samples,) or (n_samples, n_samples)
+      The compact form of L: the 1d array of square roots of the normalized
+      weights if W is diagonal, else the full matrix L. See
+      casm.learn.tools.sample_weight_factor.
+
     W: array-like of shape: (n_samples, n_samples)
-      Contains sample weights.
+      Contains sample weights. Constructed from weight_factor when accessed.
 
     L: array-like of shape: (n_samples, n_samples)
-      Used to generate weighted_X and weighted_y, W = L * L.transpose().
+      Used to generate weighted_X and weighted_y, W = L.transpose() * L.
+      Constructed from weight_factor when accessed.
 
     weighted_X: array-like of shape: (n_samples, n_features)
       Weighted training input data, weighted_X = L*x.
@@ -1230,7 +1369,8 @@ class FittingData(object):
     data: pandas.DataFrame, optional, default=None
         Optionally, store TrainingData.data with weighted_X and weighted_y data
         added. No checks are made for consistency of tdata.X, tdata.y and X and
-        y or other parameters.
+        y or other parameters. The weighted_X and weighted_y columns are only
+        added, in a single concatenation, when 'data' is first accessed.
 
   """
 
@@ -1279,8 +1419,9 @@ class FittingData(object):
 
     # weight
     self.sample_weight = sample_weight
-    self.weighted_y, self.weighted_X, self.W, self.L = casm.learn.tools.set_sample_weight(
-      sample_weight, X=self.X, y=self.y)
+    self.weight_factor = casm.learn.tools.sample_weight_factor(sample_weight, self.n_samples)
+    self.weighted_X = casm.learn.tools.apply_sample_weight(self.weight_factor, self.X)
+    self.weighted_y = casm.learn.tools.apply_sample_weight(self.weight_factor, self.y)
 
     # cv sets
     self.cv = cv
@@ -1291,13 +1432,69 @@ class FittingData(object):
     # penalty
     self.penalty = penalty
 
-    # data
+    # data, without the weighted_X and weighted_y columns, which are added when
+    # 'data' is first accessed
+    self._data = None
+    self._weighted_names = None
     if tdata is not None:
-      self.data = tdata.data.copy()
-      for i in range(self.n_features):
-        self.data.loc[:,"weighted_" + tdata.X_name + "(" + str(i) + ")"] = self.weighted_X[:,i]
-      for i in range(self.n_features):
-        self.data.loc[:,"weighted_" + tdata.y_name] = self.weighted_y
+      self._data = tdata.data.copy()
+      self._weighted_names = ("weighted_" + tdata.X_name, "weighted_" + tdata.y_name)
+
+  def __getstate__(self):
+    state = dict(self.__dict__)
+    if callable(state["_data"]):
+      state["_data"] = state["_data"]()
+    return state
+
+  def __setstate__(self, state):
+    # fit_data files written before 'weight_factor' store the full W and L
+    if "weight_factor" not in state:
+      state.pop("W", None)
+      state["weight_factor"] = state.pop("L")
+    # fit_data files written before '_data' store 'data' with the weighted columns
+    if "_data" not in state:
+      state["_data"] = state.pop("data", None)
+    if "_weighted_names" not in state:
+      state["_weighted_names"] = None
+    self.__dict__.update(state)
+
+  @property
+  def data(self):
+    """
+    The training data pandas.DataFrame, with weighted_X and weighted_y columns.
+
+    It is read from file, if necessary, and the weighted columns are added when
+    it is first accessed.
+    """
+    if self._data is None:
+      raise AttributeError("'FittingData' object has no attribute 'data'")
+    if callable(self._data):
+      self._data = self._data()
+    if self._weighted_names is not None:
+      X_name, y_name = self._weighted_names
+      columns = [X_name + "(" + str(i) + ")" for i in range(self.n_features)] + [y_name]
+      weighted = pandas.DataFrame(
+        np.column_stack([self.weighted_X, self.weighted_y]),
+        columns=columns, index=self._data.index)
+      data = self._data.drop([x for x in columns if x in self._data.columns], axis=1)
+      self._data = pandas.concat([data, weighted], axis=1)
+      self._weighted_names = None
+    return self._data
+
+  @data.setter
+  def data(self, value):
+    self._data = value
+    self._weighted_names = None
+
+  @property
+  def W(self):
+    """The (n_samples, n_samples) weight matrix, constructed on access"""
+    return casm.learn.tools.weight_matrices(self.weight_factor)[0]
+
+  @property
+  def L(self):
+    """The (n_samples, n_samples) matrix L, W = L.transpose() * L, constructed on access"""
+    return casm.learn.tools.weight_matrices(self.weight_factor)[1]
 
 
 class TrainingData(object):
@@ -1312,7 +1509,7 @@ class TrainingData(object):
     filename: str
       The name of the training data file
 
-    filetype: str, one of ["selection", "csv", "json"]
+    filetype: str, one of ["selection", "csv", "json", "arrays"]
       The data format of the training data file
 
     X_name: str
@@ -1337,7 +1534,8 @@ class TrainingData(object):
       The selection specifying the training data
 
     data: pandas.DataFrame
-      Contains the X and y data
+      Contains the X and y data. If the data is read in chunks or from an
+      array store, the X columns are only included in X.
 
     hull_dist_name: str, (exists if weight method=="wHullDist")
       The name of the hull_dist column in the training data file
@@ -1367,10 +1565,23 @@ class TrainingData(object):
     self.y_name = specs["data"]["y"]
     hull_dist_name = "hull_dist"
 
+    # optional out-of-core loading settings, read with 'get' so that existing
+    # problem specs files still match the input settings
+    dtype = np.dtype(specs["data"].get("dtype", "float64"))
+    if dtype not in [np.dtype("float64"), np.dtype("float32")]:
+      raise Exception("Error reading training data: 'dtype' must be 'float64' or 'float32'")
+    chunksize = specs["data"].get("chunksize", None)
+    kwargs = specs["data"]["kwargs"]
+
+    # when reading files in chunks, only the columns that are used are kept
+    usecols = _usecols(self.X_name,
+      [self.y_name, hull_dist_name, "configname", "selected", "is_calculated", "weight"])
+
+    X = None
     if self.filetype == "selection":
 
       # read training set
-      proj = Project(specs["data"]["kwargs"]["project_path"], verbose=verbose)
+      proj = Project(kwargs["project_path"], verbose=verbose)
 
       sel = Selection(proj, self.filename, all=False)
 
@@ -1379,7 +1590,7 @@ class TrainingData(object):
 
       ## if necessary, query data
       columns = [x for x in [self.y_name, "is_calculated"] if x not in sel.data.columns]
-      if len([x for x in sel.data.columns if re.match(self.X_name + "\([0-9]*\)", x)]) == 0:
+      if len(casm.learn.tools.X_columns(sel.data.columns, self.X_name)) == 0:
         columns.append(self.X_name)
       if specs["weight"]["method"] == "wHullDist":
         hull_selection = specs["weight"]["kwargs"]["hull_selection"]
@@ -1389,23 +1600,60 @@ class TrainingData(object):
         columns.append(hull_dist_name)
 
       # perform query
-      if len(columns):
-        sel.query(columns, verbose=verbose)
-
-      data = sel.data
+      if chunksize is not None and len(columns):
+        if verbose:
+          print("# Querying:", columns, "in chunks of", chunksize, "configurations")
+        X, queried = _read_chunks(iter_query(proj, columns, sel, chunksize=chunksize), self.X_name, dtype,
+          n_samples=sel.data.shape[0])
+        if queried.shape[0] != sel.data.shape[0]:
+          raise Exception("Error reading training data: querying different numbers of records")
+        for col in queried.columns:
+          sel.data.loc[:,col] = queried.loc[:,col].values
+        data = sel.data
+        if X.shape[1] == 0:
+          X = None
+      else:
+        if len(columns):
+          sel.query(columns, verbose=verbose)
+        data = sel.data
       self.sel = sel
 
     elif self.filetype.lower() == "csv":
       # populate from csv file
-      data = pandas.read_csv(self.filename, **specs["data"]["kwargs"])
+      if chunksize is not None:
+        read_kwargs = dict(kwargs)
+        read_kwargs.setdefault("usecols", usecols)
+        X, data = _read_chunks(
+          pandas.read_csv(self.filename, chunksize=chunksize, **read_kwargs), self.X_name, dtype,
+          usecols=usecols)
+      else:
+        data = pandas.read_csv(self.filename, **kwargs)
 
     elif self.filetype.lower() == "json":
       # populate from json file
-      data = pandas.read_json(self.filename, **specs["data"]["kwargs"])
+      if chunksize is not None:
+        if not kwargs.get("lines", False):
+          raise Exception("Error reading training data: 'chunksize' requires 'kwargs': {'lines': true} for filetype 'json'")
+        X, data = _read_chunks(
+          pandas.read_json(self.filename, chunksize=chunksize, **kwargs), self.X_name, dtype,
+          usecols=usecols)
+      else:
+        data = pandas.read_json(self.filename, **kwargs)
+
+    elif self.filetype.lower() == "arrays":
+      # populate from an array store, with X memory mapped
+      X, data = casm.learn.store.read_training_data(
+        self.filename, y_name=self.y_name, mmap_mode=kwargs.get("mmap_mode", "r"))
+      if X.dtype != dtype:
+        X = X.astype(dtype)
+
+    else:
+      raise Exception("Error reading training data: unknown filetype '" + specs["data"]["filetype"] + "'")
 
 
     # columns of interest, as numpy arrays
-    X = data.loc[:,[x for x in data.columns if re.match(self.X_name + "\([0-9]*\)", x)]].values
+    if X is None:
+      X = np.asarray(data.iloc[:,casm.learn.tools.X_columns(data.columns, self.X_name)].values, dtype=dtype)
     y = data.loc[:,self.y_name].values
     if specs["weight"]["method"] == "wHullDist":
       self.hull_dist_name = hull_dist_name
@@ -1419,6 +1667,75 @@ class TrainingData(object):
     self.n_features = X.shape[1]
 
 
+def _usecols(X_name, names):
+  """
+  Returns a function that is True for the column names used from training data:
+  the 'X_name(i)' columns, the columns in 'names', and the 'weight(i)' columns
+  """
+  X_pattern = re.compile(X_name + "\([0-9]*\)")
+  weight_pattern = re.compile("weight\([0-9]*\)")
+  names = set(names)
+  def usecols(col):
+    return col in names or bool(X_pattern.match(col)) or bool(weight_pattern.match(col))
+  return usecols
+
+
+def _read_chunks(chunks, X_name, dtype, n_samples=None, usecols=None):
+  """
+  Read DataFrame chunks, copying the 'X_name(i)' columns of each chunk
+  directly into an array, so they are never held as a complete DataFrame
+
+  X is allocated once if n_samples is known, and otherwise its capacity is
+  doubled as needed and trimmed once all chunks are read.
+
+  Arguments
+  ---------
+
+    chunks: iterable of pandas.DataFrame
+      Chunks of rows, all with the same columns
+
+    X_name: str
+      The name of the X columns
+
+    dtype: numpy.dtype
+      The dtype of X
+
+    n_samples: int, optional, default=None
+      The total number of rows, if known
+
+    usecols: function, optional, default=None
+      If given, only the columns for which 'usecols(name)' is True are kept
+
+  Returns
+  -------
+
+    (X, data): (numpy.ndarray of shape (n_samples, n_features), pandas.DataFrame)
+      The X columns, and a DataFrame with the other columns
+
+  """
+  X, data = None, []
+  X_index, other = None, None
+  n = 0
+  for chunk in chunks:
+    if X_index is None:
+      X_index = casm.learn.tools.X_columns(chunk.columns, X_name)
+      X_set = set(X_index)
+      other = [i for i, col in enumerate(chunk.columns)
+               if i not in X_set and (usecols is None or usecols(col))]
+      capacity = n_samples if n_samples is not None else chunk.shape[0]
+      X = np.empty((capacity, len(X_index)), dtype=dtype)
+    if n + chunk.shape[0] > X.shape[0]:
+      X.resize((max(2*X.shape[0], n + chunk.shape[0]), X.shape[1]), refcheck=False)
+    X[n:n + chunk.shape[0], :] = chunk.iloc[:,X_index].values
+    n += chunk.shape[0]
+    data.append(chunk.iloc[:,other])
+  if X_index is None:
+    raise Exception("Error reading training data: no data")
+  if n != X.shape[0]:
+    X.resize((n, X.shape[1]), refcheck=False)
+  return (X, pandas.concat(data, ignore_index=True))
+
+
 def read_sample_weight(input, tdata, verbose=True):
   """
   Read input file and read or calculate sample weights
@@ -1490,8 +1807,8 @@ def read_sample_weight(input, tdata, verbose=True):
 
 def make_fitting_data(input, save=True, verbose=True, read_existing=True):
   """
-  Construct a FittingData instance, either by reading existing 'fit_data.pkl',
-  or from an input settings.
+  Construct a FittingData instance, either by reading the existing problem
+  specs file, or from an input settings.
 
   Arguments
   ---------
@@ -1500,17 +1817,17 @@ def make_fitting_data(input, save=True, verbose=True, read_existing=True):
       The input settings as a dict
 
     save: boolean, optional, default=True
-      Save a pickle file containing the training data and scoring metric. The file
+      Save a file containing the training data and scoring metric. The file
       name is specified by input["problem_specs"]["specs_filename"].  See/use
-      set_input_defaults for default values.
+      set_input_defaults for default values, and save_fitting_data for the
+      file formats.
 
     verbose: boolean, optional, default=True
       Print information to stdout.
 
     read_existing: boolean, optional, default=True
-      If it exists, read the pickle file containing the training data and scoring
-      metric. The file name, which can be specified by input["fit_data_filename"],
-      defaults to "fit_data.pkl".
+      If it exists, read the file containing the training data and scoring
+      metric. The file name is specified by input["problem_specs"]["specs_filename"].
 
 
   Returns
@@ -1532,7 +1849,7 @@ def make_fitting_data(input, save=True, verbose=True, read_existing=True):
   if read_existing and os.path.exists(fit_data_filename):
     if verbose:
       print("# Reading existing problem specs from:", fit_data_filename)
-    fdata = pickle.load(open(fit_data_filename, 'rb'))
+    fdata = open_fitting_data(fit_data_filename)
     if verbose:
       print("#   DONE\n")
 
@@ -1577,7 +1894,7 @@ def make_fitting_data(input, save=True, verbose=True, read_existing=True):
       print(json.dumps(specs["cv"], indent=2), "\n")
 
     ## scoring
-    scoring = sklearn.metrics.make_scorer(sklearn.metrics.mean_squared_error, greater_is_better=True)
+    scoring = casm.learn.model_selection.MeanSquaredErrorScorer()
 
     ## penalty
     penalty = specs["cv"]["penalty"]
@@ -1589,8 +1906,7 @@ def make_fitting_data(input, save=True, verbose=True, read_existing=True):
     fdata.input["problem_specs"] = specs
 
     if save == True:
-      with open(fit_data_filename, 'wb') as f:
-          pickle.dump(fdata, f, protocol=2)
+      save_fitting_data(fdata, fit_data_filename)
 
     if verbose:
       print("# Writing problem specs to:", fit_data_filename)
@@ -1649,7 +1965,7 @@ def make_estimator(input, verbose = True):
   return estimator
 
 
-def make_selector(input, estimator, scoring=None, cv=None, penalty=0.0, verbose=True):
+def make_selector(input, estimator, scoring=None, cv=None, penalty=0.0, verbose=True, resume=False):
   """
   Construct selector object from input settings
 
@@ -1673,6 +1989,9 @@ def make_selector(input, estimator, scoring=None, cv=None, penalty=0.0, verbose=
     verbose: boolean, optional, default=True
       Print information to stdout.
 
+    resume: boolean, optional, default=False
+      If True, and the selector supports it, resume from its last checkpoint.
+
 
   Returns
   -------
@@ -1725,6 +2044,8 @@ def make_selector(input, estimator, scoring=None, cv=None, penalty=0.0, verbose=
     kwargs["penalty"] = penalty
   if "verbose" in sig.parameters:
     kwargs["verbose"] = verbose
+  if "resume" in sig.parameters:
+    kwargs["resume"] = resume
 
   selector = selector_method(estimator, **kwargs)
 
@@ -1738,9 +2059,9 @@ def add_individual_detail(indiv, estimator, fdata, input, selector=None):
 
   Adds the attributes:
 
-    eci: List[(int, float)]
-      A list of tuple containing the basis function index and coefficient value
-      for basis functions with non-zero coefficients: [(index, coef), ...]
+    eci: casm.learn.tools.SparseECI
+      The basis function indices and coefficient values for basis functions
+      with non-zero coefficients. Iterating yields (index, coef) tuples.
 
     rms: float
       The root mean square prediction error of the unweighted problem
@@ -1900,8 +2221,10 @@ def checkhull(input, hall, indices=None, verbose=True):
           provides all the ranges for which the RMSE is requested.
 
         composition: str, optional, default="atom_frac"
-          Composition argument use for 'casm query' properties 'hull_dist' and
-          'clex_hull_dist'. For thermodynamic ground states, use "atom_frac".
+          Composition used to construct the convex hulls, as for the 'casm query'
+          properties 'hull_dist' and 'clex_hull_dist'. For "atom_frac", formation
+          energy per atom is used, and for "comp", formation energy per unit cell.
+          For thermodynamic ground states, use "atom_frac".
 
         hull_tol: number, optional, default=proj.settings.data["lin_alg_tol"]
           Tolerance used for identify hull states
@@ -1912,6 +2235,11 @@ def checkhull(input, hall, indices=None, verbose=True):
         bottom_tol: number, optional, default=1e-8
           Tolerance for detecting which facets form the convex hull bottom
 
+        n_jobs: int, optional, default=1
+          Number of worker processes used to construct the predicted convex hulls
+          of individuals in parallel. If negative, (number of CPUs + 1 + n_jobs)
+          are used, so -1 uses all CPUs.
+
 
         Example:
 
@@ -1925,6 +2253,7 @@ def checkhull(input, hall, indices=None, verbose=True):
             "hull_tol": 1e-8,
             "dim_tol": 1e-8,
             "bottom_tol": 1e-8,
+            "n_jobs": 1
           }
 
 
@@ -1945,6 +2274,16 @@ def checkhull(input, hall, indices=None, verbose=True):
       Print information to stdout.
 
 
+  Note
+  ----
+    The correlations of the selected configurations are queried once, and the
+    predicted formation energies of all checked individuals are evaluated in one
+    matrix product. The convex hulls are constructed in-process by
+    casm.learn.hull, so no eci.json or temporary selection files are written.
+    With n_jobs != 1, the hulls of individuals are constructed by a pool of
+    worker processes, and the results are then collected for each individual in
+    order, so printed output and result selection files do not depend on n_jobs.
+
   """
 
   # set checkhull default settings
@@ -1960,6 +2299,7 @@ def checkhull(input, hall, indices=None, verbose=True):
     "composition":"atom_frac",
     "dim_tol":1e-8,
     "bottom_tol":1e-8,
+    "n_jobs":1,
     "ranged_rms":[0.001, 0.005, 0.01, 0.05, 0.1, 0.5]
   }
 
@@ -1983,13 +2323,10 @@ def checkhull(input, hall, indices=None, verbose=True):
   dim_tol = d["dim_tol"]
   bottom_tol = d["bottom_tol"]
   primitive_only = d["primitive_only"]
-
-  # save current default clex
-  orig_clex = proj.settings.default_clex
-  clex = copy.deepcopy(orig_clex)
-  all_eci = proj.dir.all_eci(clex.property, clex.calctype, clex.ref, clex.bset)
+  n_jobs = d["n_jobs"]
 
   # not sure of all the edge cases, enforcing these seems simpler for now...
+  clex = proj.settings.default_clex
   if clex.name != "formation_energy":
     print("default clex:", clex.name)
     print("use 'casm settings --set-default-clex formation_energy' to change the default clex")
@@ -1999,93 +2336,107 @@ def checkhull(input, hall, indices=None, verbose=True):
     print("property:", input["problem_specs"]["data"]["y"])
     raise Exception("Error using checkhull: property must be 'formation_energy'")
 
+  if composition not in ["atom_frac", "comp"]:
+    print("composition:", composition)
+    raise Exception("Error using checkhull: composition must be 'atom_frac' or 'comp'")
+
   # load hull selection
   sel = Selection(proj, selection, all=False)
 
-  # create a temporary file containing the subset of the selection that is calculated
-  tmp_dir = join(proj.dir.casm_dir(), "tmp")
-  if not os.path.exists(tmp_dir):
-    os.mkdir(tmp_dir)
-  dft_selection = join(tmp_dir, selection + "_dft")
-  dft_hull_selection = join(tmp_dir, selection + "_dft_hull")
-  proj.capture("select -c " + selection + " --set-off 'not(is_calculated)' -f -o " + dft_selection)
-
   # properties to query
   selected = "selected"
   is_primitive = "is_primitive"
   is_calculated = "is_calculated"
   configname = "configname"
-  dft_hull_dist_long = "hull_dist(" + dft_selection + "," + composition + ")"
   dft_hull_dist = "dft_hull_dist"
-  clex_hull_dist_long = "clex_hull_dist(" + selection + "," + composition + ")"
   clex_hull_dist = "clex_hull_dist"
-  clex_dft_hull_dist_long = "clex_hull_dist(" + dft_hull_selection + "," + composition + ")"
   clex_dft_hull_dist = "clex_dft_hull_dist"
   comp = "comp"
   dft_Eform = "formation_energy"
   clex_Eform = "clex(formation_energy)"
+  X_name = input["problem_specs"]["data"]["X"]
 
-  query_cols = [comp, is_calculated, configname, dft_hull_dist_long, dft_Eform]
+  # the correlations are queried once, and the hull is constructed in-process,
+  # so checking individuals does not require writing eci.json or re-querying
+  query_cols = [comp, is_calculated, configname, dft_Eform, X_name]
   if primitive_only:
     query_cols.append(is_primitive)
+  if composition == "atom_frac":
+    query_cols += ["atom_frac", "comp_n"]
   sel.query(query_cols)
 
+  def columns(name):
+    return [col for col in sel.data.columns if re.match(re.escape(name) + "\(.*\)$", col)]
 
-  compcol = []
-  for col in sel.data.columns:
-    if len(col) >= 5 and col[:5] == "comp(":
-      compcol.append(col)
-  compcol.sort()
+  compcol = sorted(columns(comp))
+  X_col = casm.learn.tools.X_columns(sel.data.columns, X_name)
 
-  if indices is None:
-    indices = range(len(hall))
+  # hull composition and energy normalization
+  if composition == "atom_frac":
+    hull_comp = sel.data.loc[:, columns("atom_frac")].values.astype(float)
+    comp_n_col = columns("comp_n")
+    species = [col[len("comp_n("):-1] for col in comp_n_col]
+    n_atoms = casm.learn.hull.atoms_per_unitcell(sel.data.loc[:, comp_n_col].values, species)
+  else:
+    hull_comp = sel.data.loc[:, compcol].values.astype(float)
+    n_atoms = np.ones(sel.data.shape[0])
 
-  # write eci.json
-  eci = "__tmp"
-  clex.eci = eci
-  if eci not in all_eci:
-    proj.capture("settings --new-eci " + eci)
+  calculated = (sel.data.loc[:, is_calculated] == 1).values
+  if not calculated.any():
+    raise Exception("Error using checkhull: no calculated configurations in selection '" + selection + "'")
+  if primitive_only:
+    considered = (sel.data.loc[:, is_primitive] == 1).values
   else:
-    proj.capture("settings --set-eci " + eci)
+    considered = np.ones(sel.data.shape[0], dtype=bool)
+
+  # DFT hull, constructed from calculated configurations in the selection
+  dft_E = pandas.to_numeric(sel.data.loc[:, dft_Eform], errors='coerce').values
+  dft_hull = casm.learn.hull.Hull(
+    hull_comp[calculated], dft_E[calculated] / n_atoms[calculated], dim_tol, bottom_tol)
+  dft_dist = np.full(sel.data.shape[0], np.nan)
+  dft_dist[calculated] = dft_hull.dist_to_hull(
+    hull_comp[calculated], dft_E[calculated] / n_atoms[calculated])
+  dft_gs_mask = calculated & considered & (dft_dist < hull_tol)
+
+  if indices is None:
+    indices = range(len(hall))
+  indices = list(indices)
+
+  # predicted formation energies, for all individuals in one matrix product
+  predictor = casm.learn.predict.Predictor(sel.data.iloc[:, X_col].values)
+  clex_E = predictor.predict([hall[indiv_i].eci for indiv_i in indices])
+  clex_E_norm = clex_E / n_atoms[:, np.newaxis]
+
+  # for each individual, the clex hull, constructed from all configurations in
+  # the selection, and the clex prediction of the DFT hull, constructed from the
+  # DFT ground states
+  clex_dist, clex_dft_dist = casm.learn.hull.hull_dists(
+    hull_comp, clex_E_norm, [None, dft_gs_mask], dim_tol=dim_tol, bottom_tol=bottom_tol,
+    n_jobs=n_jobs)
+
+  # results data, with columns as output by 'casm query'
+  base = sel.data.loc[:, [configname, selected] + compcol + [is_calculated]].copy()
+  base.loc[:, dft_hull_dist] = dft_dist
+  base.loc[:, dft_Eform] = dft_E
+  if primitive_only:
+    base.loc[:, is_primitive] = sel.data.loc[:, is_primitive].values
 
   # for each individual specified...
-  for indiv_i in indices:
+  for j, indiv_i in enumerate(indices):
 
     if verbose:
       print("-- Check: individual", indiv_i, " --")
       print_individual(hall, [indiv_i])
       print("")
 
-    # write ECI to use
     indiv = hall[indiv_i]
-    write_eci(proj, indiv.eci, fit_details=casm.learn.to_json(indiv_i, indiv), clex=clex, verbose=verbose)
 
-    if primitive_only:
-      df = sel.data[sel.data.loc[:,is_primitive] == 1].sort_values(compcol)
-    else:
-      df = sel.data.sort_values(compcol)
-    df_calc = df[df.loc[:,is_calculated] == 1].apply(pandas.to_numeric, errors='ignore')
-    dft_gs = df_calc[df_calc.loc[:,dft_hull_dist_long] < hull_tol]
-
-    # create dft hull selection
-    dft_hull_sel = Selection(proj, dft_hull_selection)
-    dft_hull_sel.save(data=dft_gs, force=True)
-
-    # query:
-    sel.query([clex_hull_dist_long, clex_Eform, clex_dft_hull_dist_long], force=True)
-
-    if primitive_only:
-      df = sel.data[sel.data.loc[:,is_primitive] == 1].sort_values(compcol)
-    else:
-      df = sel.data.sort_values(compcol)
-    df.rename(
-      inplace=True,
-      columns={
-        dft_hull_dist_long : dft_hull_dist,
-        clex_hull_dist_long : clex_hull_dist,
-        clex_dft_hull_dist_long : clex_dft_hull_dist
-      })
-    df_calc = df[df.loc[:,is_calculated] == 1].apply(pandas.to_numeric, errors='ignore')
+    df = base.copy()
+    df.loc[:, clex_hull_dist] = clex_dist[:, j]
+    df.loc[:, clex_Eform] = clex_E[:, j]
+    df.loc[:, clex_dft_hull_dist] = clex_dft_dist[:, j]
+    df = df[considered].sort_values(compcol)
+    df_calc = df[df.loc[:,is_calculated] == 1]
 
     clex_gs = df[df.loc[:,clex_hull_dist] < hull_tol]
     dft_gs = df_calc[df_calc.loc[:,dft_hull_dist] < hull_tol]
@@ -2134,10 +2485,8 @@ def checkhull(input, hall, indices=None, verbose=True):
 
     # calculated ranged rms
     def calc_ranged_rms(r):
-      ranged_df = df_calc[df_calc.loc[:,dft_hull_dist] < r + hull_tol].copy()
+      ranged_df = df_calc[df_calc.loc[:,dft_hull_dist] < r + hull_tol]
       n = ranged_df.shape[0]
-      ranged_df.loc[:,"diff"] = ranged_df.loc[:,dft_Eform] - ranged_df.loc[:,clex_Eform]
-      ranged_df.loc[:,"diff_sqr"] = ranged_df.loc[:,"diff"]*ranged_df.loc[:,"diff"]
       rms = sqrt(sklearn.metrics.mean_squared_error(ranged_df.loc[:,dft_Eform], ranged_df.loc[:,clex_Eform]))
       return (n, rms)
 
@@ -2153,22 +2502,12 @@ def checkhull(input, hall, indices=None, verbose=True):
         print(d["range"], "eV/unitcell of the DFT hull:", d["rms"])
       print("")
 
-    sel.data.drop([clex_dft_hull_dist_long], axis=1, inplace=True)
-
     indiv.ranged_rms = ranged_rms
     indiv.checkhull_settings = input["checkhull"]
 
     if verbose:
       print("\n")
 
-  # reset eci setting
-  proj.capture("settings --set-eci " + orig_clex.eci)
-
-  # remove __tmp eci and tmp selections
-  shutil.rmtree(proj.dir.eci_dir(clex))
-  os.remove(dft_selection)
-  os.remove(dft_hull_selection)
-
 
 def checkspecs(input, verbose=True):
   """
@@ -2271,12 +2610,8 @@ def checkspecs(input, verbose=True):
 def bitstr(indiv, n_bits_max=None):
   if n_bits_max is None:
     n_bits_max = len(indiv)
-  bitstr = ""
-  for j in range(min(len(indiv),n_bits_max)):
-    if indiv[j]:
-      bitstr += '1'
-    else:
-      bitstr += '0'
+  bits = casm.learn.tools.to_array(indiv[:n_bits_max])
+  bitstr = (bits.astype(np.uint8) + ord('0')).tobytes().decode('ascii')
   if len(indiv) > n_bits_max:
     bitstr += "..."
   return bitstr
@@ -2616,9 +2951,9 @@ def print_eci(eci):
   Arguments
   ---------
 
-    eci: List[(int, float)]
-      A list of tuple containing the basis function index and coefficient value
-      for basis functions with non-zero coefficients: [(index, coef), ...]
+    eci: casm.learn.tools.SparseECI or List[(int, float)]
+      The basis function index and coefficient value for basis functions with
+      non-zero coefficients: [(index, coef), ...]
 
   """
   for bfunc in eci:
@@ -2627,13 +2962,13 @@ def print_eci(eci):
 
 def open_halloffame(halloffame_filename, verbose=False):
   """
-  Open hall of fame from .pkl file.
+  Open hall of fame from an array store or .pkl file.
 
   Arguments
   ---------
 
     halloffame_filename: string
-      Name of .pkl file containing the hall of fame
+      Name of the array store directory or .pkl file containing the hall of fame
 
     verbose: boolean, optional, default=True
       Print information to stdout.
@@ -2648,20 +2983,26 @@ def open_halloffame(halloffame_filename, verbose=False):
   if verbose:
     print("Loading Hall of Fame:", halloffame_filename)
 
-  with open(halloffame_filename, 'rb') as f:
-    hall = pickle.load(f)
+  if casm.learn.store.is_store(halloffame_filename):
+    hall = casm.learn.store.read_halloffame(halloffame_filename)
+  else:
+    with open(halloffame_filename, 'rb') as f:
+      hall = pickle.load(f)
 
-  # for backwards compatibility, add id if not existing
+  # for backwards compatibility, add id if not existing and use SparseECI
   for indiv in hall:
     if not hasattr(indiv, "id"):
       indiv.id = uuid.uuid4()
+    if hasattr(indiv, "eci"):
+      indiv.eci = casm.learn.tools.SparseECI.from_pairs(indiv.eci)
 
   return hall
 
 
 def save_halloffame(hall, halloffame_filename, verbose=False):
   """
-  Save hall of fame as .pkl file.
+  Save hall of fame as an array store, or as .pkl file if halloffame_filename
+  ends in '.pkl'.
 
   Arguments
   ---------
@@ -2670,13 +3011,66 @@ def save_halloffame(hall, halloffame_filename, verbose=False):
       A Hall Of Fame of ECI sets
 
     halloffame_filename: string
-      Name of .pkl file to write the hall of fame
+      Name of the array store directory or .pkl file to write the hall of fame
 
     verbose: boolean, optional, default=True
       Print information to stdout.
 
   """
-  if verbose:
-    print("\nPickling Hall of Fame to:", halloffame_filename)
-  with open(halloffame_filename, 'wb') as f:
-      pickle.dump(hall, f, protocol=2)
+  if casm.learn.store.is_pickle_filename(halloffame_filename):
+    if verbose:
+      print("\nPickling Hall of Fame to:", halloffame_filename)
+    with open(halloffame_filename, 'wb') as f:
+        pickle.dump(hall, f, protocol=2)
+  else:
+    if verbose:
+      print("\nSaving Hall of Fame to:", halloffame_filename)
+    casm.learn.store.write_halloffame(hall, halloffame_filename)
+
+
+def open_fitting_data(fit_data_filename):
+  """
+  Open FittingData from an array store or .pkl file.
+
+  Arrays read from an array store are memory mapped, and FittingData.data is
+  read when first accessed.
+
+  Arguments
+  ---------
+
+    fit_data_filename: string
+      Name of the array store directory or .pkl file containing the FittingData
+
+  Returns
+  -------
+
+    fdata: casm.learn.FittingData
+      The problem data
+
+  """
+  if casm.learn.store.is_store(fit_data_filename):
+    return casm.learn.store.read_fitting_data(fit_data_filename)
+  with open(fit_data_filename, 'rb') as f:
+    return pickle.load(f)
+
+
+def save_fitting_data(fdata, fit_data_filename):
+  """
+  Save FittingData as an array store, or as .pkl file if fit_data_filename
+  ends in '.pkl'.
+
+  Arguments
+  ---------
+
+    fdata: casm.learn.FittingData
+      The problem data
+
+    fit_data_filename: string
+      Name of the array store directory or .pkl file to write
+
+  """
+  if casm.learn.store.is_pickle_filename(fit_data_filename):
+    with open(fit_data_filename, 'wb') as f:
+      pickle.dump(fdata, f, protocol=2)
+  else:
+    casm.learn.store.write_fitting_data(fdata, fit_data_filename)
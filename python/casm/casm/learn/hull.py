@@ -0,0 +1,340 @@
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+from builtins import *
+
+import multiprocessing
+
+import numpy as np
+import scipy.spatial
+
+import casm.learn.parallel
+
+# The convex hull is constructed as in libcasm's 'Hull' (used by the 'casm query'
+# properties 'hull_dist' and 'clex_hull_dist'):
+#   - a principal component analysis of the compositions removes composition
+#     dimensions that are not spanned by the points (singular values <= dim_tol)
+#   - the convex hull of the dimension-reduced composition/energy points is
+#     constructed with qhull
+#   - 'bottom' facets are those whose outward unit normal has a component along
+#     the 'down' energy direction > bottom_tol
+#   - the distance to the hull is measured along the energy axis, and values
+#     with magnitude < DIST_TO_HULL_TOL are set to 0.0
+
+DIST_TO_HULL_TOL = 1e-14
+
+# species names treated as vacancies when counting atoms per unit cell
+VACANCY_NAMES = ["Va", "VA", "va"]
+
+
+def composition_reduce(comp, dim_tol=1e-8):
+  """
+  Orthogonal transformation from full composition space onto the subspace
+  spanned by a set of compositions
+
+  Arguments
+  ---------
+
+    comp: array-like of shape (n_points, n_comp)
+      The compositions
+
+    dim_tol: number, optional, default=1e-8
+      Tolerance for detecting composition dimensionality
+
+  Returns
+  -------
+
+    reduce: numpy.ndarray of shape (rank, n_comp)
+      Reduced compositions are comp.dot(reduce.T)
+
+  """
+  comp = np.asarray(comp, dtype=float)
+  mean_zero = (comp - comp.mean(axis=0)).T
+  U, s, V = np.linalg.svd(mean_zero, full_matrices=True)
+  rank = np.count_nonzero(np.abs(s) > dim_tol)
+  return U[:, :rank].T
+
+
+class Hull(object):
+  """
+  Lower convex hull in composition/energy space
+
+  Attributes
+  ----------
+
+    reduce: numpy.ndarray of shape (rank, n_comp)
+      Orthogonal transformation from full composition space onto the subspace
+      spanned by the hull points
+
+    equations: numpy.ndarray of shape (n_bottom_facets, rank + 2)
+      The bottom facets, as [outward unit normal, offset], with the hyperplane
+      defined by normal.dot(point) + offset = 0 in the reduced
+      composition/energy space
+
+    vertices: numpy.ndarray of int
+      Indices of the points that are vertices of the bottom facets
+
+  """
+
+  def __init__(self, comp, energy, dim_tol=1e-8, bottom_tol=1e-8):
+    """
+    Arguments
+    ---------
+
+      comp: array-like of shape (n_points, n_comp)
+        The compositions of the points used to construct the hull
+
+      energy: array-like of shape (n_points,)
+        The energies of the points used to construct the hull
+
+      dim_tol: number, optional, default=1e-8
+        Tolerance for detecting composition dimensionality
+
+      bottom_tol: number, optional, default=1e-8
+        Tolerance for detecting which facets form the convex hull bottom
+
+    """
+    comp = np.asarray(comp, dtype=float)
+    energy = np.asarray(energy, dtype=float)
+    if energy.shape[0] == 0:
+      raise Exception("Error constructing Hull: no points")
+
+    self.reduce = composition_reduce(comp, dim_tol)
+    rank = self.reduce.shape[0]
+
+    if rank == 0:
+      # all points have the same composition: the hull bottom is the minimum energy
+      self.equations = np.array([[-1.0, energy.min()]])
+      self.vertices = np.array([energy.argmin()])
+      return
+
+    points = np.column_stack([comp.dot(self.reduce.T), energy])
+
+    # qhull requires full dimensional input: add one point far above the
+    # centroid, which does not change the bottom of the hull
+    top = points.mean(axis=0)
+    top[-1] = energy.max() + (energy.max() - energy.min()) + 1.0
+    hull = scipy.spatial.ConvexHull(np.vstack([points, top]))
+
+    bottom = -hull.equations[:, -2] > bottom_tol
+    self.equations = hull.equations[bottom]
+    self.vertices = np.unique(hull.simplices[bottom])
+
+  def hull_energy(self, comp):
+    """
+    Energy of the hull bottom at the given compositions
+
+    Arguments
+    ---------
+
+      comp: array-like of shape (n_points, n_comp)
+        The compositions at which to evaluate the hull energy
+
+    Returns
+    -------
+
+      energy: numpy.ndarray of shape (n_points,)
+        The hull energy
+
+    """
+    reduced = np.asarray(comp, dtype=float).dot(self.reduce.T)
+    normal = self.equations[:, :-2]
+    normal_energy = self.equations[:, -2]
+    offset = self.equations[:, -1]
+
+    # energy of each facet hyperplane at each composition: shape (n_points, n_facets)
+    facet_energy = -(reduced.dot(normal.T) + offset) / normal_energy
+    return facet_energy.max(axis=1)
+
+  def dist_to_hull(self, comp, energy):
+    """
+    Distance of points above the hull bottom, along the energy axis
+
+    Arguments
+    ---------
+
+      comp: array-like of shape (n_points, n_comp)
+        The compositions of the points
+
+      energy: array-like of shape (n_points,) or (n_points, n_models)
+        The energies of the points. If 2d, the distance is calculated for each
+        column.
+
+    Returns
+    -------
+
+      dist: numpy.ndarray of the same shape as energy
+        The distance to the hull
+
+    """
+    energy = np.asarray(energy, dtype=float)
+    hull_energy = self.hull_energy(comp)
+    if energy.ndim == 2:
+      hull_energy = hull_energy[:, np.newaxis]
+    dist = energy - hull_energy
+    dist[np.abs(dist) < DIST_TO_HULL_TOL] = 0.0
+    return dist
+
+
+def hull_dist(comp, energy, hull_points=None, dim_tol=1e-8, bottom_tol=1e-8, n_jobs=1):
+  """
+  Distance of points above the convex hull of a subset of the points
+
+  Arguments
+  ---------
+
+    comp: array-like of shape (n_points, n_comp)
+      The compositions of the points
+
+    energy: array-like of shape (n_points,) or (n_points, n_models)
+      The energies of the points. If 2d, a separate hull is constructed for
+      each column.
+
+    hull_points: array-like of bool of shape (n_points,), optional, default=None
+      The points used to construct the hull. Default uses all points.
+
+    dim_tol: number, optional, default=1e-8
+      Tolerance for detecting composition dimensionality
+
+    bottom_tol: number, optional, default=1e-8
+      Tolerance for detecting which facets form the convex hull bottom
+
+    n_jobs: int, optional, default=1
+      Number of worker processes used if energy is 2d. See 'hull_dists'.
+
+  Returns
+  -------
+
+    dist: numpy.ndarray of the same shape as energy
+      The distance to the hull
+
+  """
+  energy = np.asarray(energy, dtype=float)
+  if energy.ndim == 1:
+    return hull_dists(comp, energy[:, np.newaxis], [hull_points], dim_tol, bottom_tol)[0][:, 0]
+  return hull_dists(comp, energy, [hull_points], dim_tol, bottom_tol, n_jobs)[0]
+
+
+# data shared with a worker process, set by _init_worker
+_worker = None
+
+def _init_worker(comp_raw, comp_shape, hull_points, dim_tol, bottom_tol):
+  """Set the data used by _hull_dists_worker, viewing comp in shared memory"""
+  global _worker
+  _worker = {
+    "comp": np.frombuffer(comp_raw, dtype=float)[:int(np.prod(comp_shape))].reshape(comp_shape),
+    "hull_points": hull_points,
+    "dim_tol": dim_tol,
+    "bottom_tol": bottom_tol}
+
+
+def _hull_dists_worker(energy):
+  """Calculate the distance to each hull for one column of energy in a worker process"""
+  w = _worker
+  return _hull_dists(w["comp"], energy, w["hull_points"], w["dim_tol"], w["bottom_tol"])
+
+
+def _hull_dists(comp, energy, hull_points, dim_tol, bottom_tol):
+  """Returns the distance to each hull for one column of energy"""
+  result = []
+  for points in hull_points:
+    hull = Hull(comp[points], energy[points], dim_tol, bottom_tol)
+    result.append(hull.dist_to_hull(comp, energy))
+  return result
+
+
+def hull_dists(comp, energy, hull_points, dim_tol=1e-8, bottom_tol=1e-8, n_jobs=1):
+  """
+  Distance of points above several convex hulls, constructed separately for
+  each column of energy
+
+  With n_jobs != 1, the columns of energy are evaluated in parallel by a pool
+  of worker processes which share comp via shared memory. The results are
+  merged in order and do not depend on the number of workers. Worker processes
+  are started as described by 'casm.learn.parallel.pool_context'.
+
+  Arguments
+  ---------
+
+    comp: array-like of shape (n_points, n_comp)
+      The compositions of the points
+
+    energy: array-like of shape (n_points, n_models)
+      The energies of the points, with one column per model (i.e. individual)
+
+    hull_points: List[array-like of bool of shape (n_points,) or None]
+      For each hull, the points used to construct it. None uses all points.
+
+    dim_tol: number, optional, default=1e-8
+      Tolerance for detecting composition dimensionality
+
+    bottom_tol: number, optional, default=1e-8
+      Tolerance for detecting which facets form the convex hull bottom
+
+    n_jobs: int, optional, default=1
+      Number of worker processes. If negative, (number of CPUs + 1 + n_jobs)
+      are used, so -1 uses all CPUs.
+
+  Returns
+  -------
+
+    dist: List[numpy.ndarray of shape (n_points, n_models)]
+      The distance to each hull, in the order of hull_points
+
+  """
+  if n_jobs is None or n_jobs == 0:
+    raise Exception("Error in hull_dists: n_jobs must be a non-zero integer")
+  if n_jobs < 0:
+    n_jobs = max(multiprocessing.cpu_count() + 1 + n_jobs, 1)
+
+  # contiguous copies, as used by the worker processes, so that results do not
+  # depend on n_jobs
+  comp = np.ascontiguousarray(comp, dtype=float)
+  energy = np.asarray(energy, dtype=float)
+  n_models = energy.shape[1]
+  hull_points = [np.ones(comp.shape[0], dtype=bool) if x is None else np.asarray(x, dtype=bool)
+                 for x in hull_points]
+  columns = [np.ascontiguousarray(energy[:, j]) for j in range(n_models)]
+
+  n_jobs = min(n_jobs, n_models)
+  if n_jobs > 1:
+    comp_raw, comp_shape = casm.learn.parallel.shared_array(comp)
+    pool = casm.learn.parallel.pool_context().Pool(n_jobs, initializer=_init_worker,
+      initargs=(comp_raw, comp_shape, hull_points, dim_tol, bottom_tol))
+    try:
+      results = pool.map(_hull_dists_worker, columns)
+    finally:
+      pool.close()
+      pool.join()
+  else:
+    results = [_hull_dists(comp, x, hull_points, dim_tol, bottom_tol) for x in columns]
+
+  dist = []
+  for i in range(len(hull_points)):
+    dist.append(np.empty(energy.shape))
+    for j in range(n_models):
+      dist[i][:, j] = results[j][i]
+  return dist
+
+
+def atoms_per_unitcell(comp_n, species):
+  """
+  Number of atoms per unit cell, excluding vacancies
+
+  Arguments
+  ---------
+
+    comp_n: array-like of shape (n_points, n_species)
+      Number of each species per unit cell, including vacancies, as from the
+      'casm query' property 'comp_n'
+
+    species: List[str] of length n_species
+      The species names
+
+  Returns
+  -------
+
+    n: numpy.ndarray of shape (n_points,)
+      The number of atoms per unit cell
+
+  """
+  atoms = [i for i, name in enumerate(species) if name not in VACANCY_NAMES]
+  return np.asarray(comp_n, dtype=float)[:, atoms].sum(axis=1)
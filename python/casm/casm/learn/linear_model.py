@@ -6,8 +6,13 @@ import sklearn
 
 class LinearRegressionForLOOCV(sklearn.base.BaseEstimator):
   """ 
-  LinearRegression estimator that fits by constructing hat matrix for faster
-  LOOCV score calculations.
+  LinearRegression estimator that fits using a thin decomposition of X for 
+  faster LOOCV score calculations.
+  
+  The hat matrix, H = X*(X.transpose()*X).inverse()*X.transpose(), is equal 
+  to Q*Q.transpose(), where the columns of Q are an orthonormal basis for the 
+  column space of X. Only Q, of shape (n_samples, rank), and the leverages,
+  np.diag(H), are stored.
   
   Attributes
   ----------
@@ -15,11 +20,17 @@ class LinearRegressionForLOOCV(sklearn.base.BaseEstimator):
     pinv: boolean, optional, default=True
       If true, use the psuedo-inverse in solving the least squares problem.
     
-    coef_: array-like of shape (n_samples, 1)
+    coef_: array-like of shape (n_features, 1)
       Estimated coefficients for the linear regression problem.
-        
-    H_: array-like of shape (n_samples, n_features)
-      H = X*(X.transpose()*X).inverse()*X.transpose()
+    
+    Q_: array-like of shape (n_samples, rank)
+      Orthonormal basis for the column space of X, H = Q*Q.transpose()
+    
+    leverage_: array-like of shape (n_samples,)
+      The diagonal of the hat matrix, np.diag(H)
+    
+    H_: array-like of shape (n_samples, n_samples)
+      H = X*(X.transpose()*X).inverse()*X.transpose(). Constructed on access.
   """
   
   def __init__(self, pinv=True, **kwargs):
@@ -68,19 +79,35 @@ class LinearRegressionForLOOCV(sklearn.base.BaseEstimator):
       where
         H = X * S
       
-      Calculates attributes: coef_, H_
+      If pinv, the thin SVD X = U*s*V.t is used, keeping singular values that
+      np.linalg.pinv(X.t*X) would keep, so that:
+        b = V * s.inv * U.t * y,  H = U * U.t
+      
+      Else, the thin QR decomposition X = Q*R is used:
+        b = R.inv * Q.t * y,  H = Q * Q.t
+      
+      Calculates attributes: coef_, Q_, leverage_
     """
     if self.pinv == False:
-      S = np.linalg.inv(X.transpose().dot(X)).dot(X.transpose())
+      Q, R = np.linalg.qr(X)
+      self.coef_ = np.linalg.solve(R, np.dot(Q.transpose(), y))
     else:
-      S = np.linalg.pinv(X.transpose().dot(X)).dot(X.transpose())
-    
-    # coef
-    self.coef_ = np.dot(S, y)
+      U, s, Vt = np.linalg.svd(X, full_matrices=False)
+      # np.linalg.pinv(X.t*X) discards eigenvalues s**2 <= rcond*max(s**2)
+      keep = s**2 > 1e-15*np.max(s**2, initial=0.0)
+      Q = U[:,keep]
+      self.coef_ = np.dot(Vt[keep,:].transpose(), np.dot(Q.transpose(), y)/_column(s[keep], y))
     
     # stores results for LOOCV formula
-    self.H_ = np.dot(X, S)
-    
+    self.Q_ = Q
+    self.leverage_ = np.sum(Q*Q, axis=1)
+  
+  
+  @property
+  def H_(self):
+    """The (n_samples, n_samples) hat matrix, H = Q*Q.transpose()"""
+    return np.dot(self.Q_, self.Q_.transpose())
+  
   
   def predict(self, X):
     """
@@ -129,5 +156,10 @@ class LinearRegressionForLOOCV(sklearn.base.BaseEstimator):
       Must already be fit. 'X' parameter is ignored.
       
     """
-    y_pred = np.dot(self.H_, y)
-    return np.mean(((y - y_pred)/(1.0 - np.diag(self.H_)))**2)
+    y_pred = np.dot(self.Q_, np.dot(self.Q_.transpose(), y))
+    return np.mean(((y - y_pred)/_column(1.0 - self.leverage_, y))**2)
+
+
+def _column(v, y):
+  """Returns 1d array v, shaped to broadcast against the rows of y"""
+  return v if len(np.shape(y)) < 2 else v[:,np.newaxis]
@@ -1,9 +1,13 @@
 from __future__ import (absolute_import, division, print_function, unicode_literals)
 from builtins import *
 
+import sklearn.linear_model
+import sklearn.metrics
 import sklearn.model_selection
 import numpy as np
+import numbers
 import pickle
+import threading
 from math import sqrt
 from casm.learn.linear_model import LinearRegressionForLOOCV
 from casm.learn.tools import indices
@@ -95,13 +99,427 @@ def cross_val_score(estimator, X, individual, y=None, scoring=None, cv=None, pen
       cv=cv,
       fit_params=fit_params)
     return sqrt(np.mean(scores)) + penalty*sum(individual),
+  
+  If possible, the scores are calculated using a GramCV engine, without 
+  refitting for each individual and train/test set. See 'gram_cv'.
   """
-  scores = sklearn.model_selection.cross_val_score(
-    estimator,
-    X[:,indices(individual)],
-    y=y,
-    scoring=scoring,
-    cv=cv,
-    fit_params=fit_params)
+  engine = gram_cv(estimator, X, y=y, scoring=scoring, cv=cv, fit_params=fit_params)
+  if engine is not None:
+    scores = engine.scores(estimator, indices(individual))
+  else:
+    scores = sklearn.model_selection.cross_val_score(
+      estimator,
+      X[:,indices(individual)],
+      y=y,
+      scoring=scoring,
+      cv=cv,
+      fit_params=fit_params)
   return sqrt(np.mean(scores)) + penalty*sum(individual),
+
+
+class MeanSquaredErrorScorer(object):
+  """
+  The scorer used by casm-learn: the mean squared error of the estimator's 
+  predictions, with greater_is_better=True.
+  
+  Equivalent to:
+    
+    sklearn.metrics.make_scorer(sklearn.metrics.mean_squared_error, greater_is_better=True)
+  
+  Using this scorer opts in to calculating cross validation scores with a 
+  GramCV engine. See 'gram_cv'.
+  """
+  
+  def __call__(self, estimator, X, y, sample_weight=None):
+    return sklearn.metrics.mean_squared_error(
+      y, estimator.predict(X), sample_weight=sample_weight)
+  
+  def __repr__(self):
+    return "MeanSquaredErrorScorer()"
+
+
+# the most recently used GramCV engine
+_gram_cv = {"engine": None, "lock": threading.Lock()}
+
+def gram_cv(estimator, X, y=None, scoring=None, cv=None, fit_params=None):
+  """
+  Returns a GramCV engine for X, y, and cv, if it gives the same scores as 
+  sklearn.model_selection.cross_val_score, else None.
+  
+  A GramCV engine can be used if:
+    
+    - 'estimator' is LinearRegressionForLOOCV (the casm-learn "LinearRegression"),
+      or sklearn.linear_model.Ridge with fit_intercept=False,
+    - 'scoring' is a MeanSquaredErrorScorer, the scorer used by casm-learn,
+    - 'cv' generates the same train/test sets each time, i.e. a list of
+      train/test sets, or a cross-validation generator that does not shuffle 
+      or has an integer 'random_state', and
+    - no 'fit_params' are given.
+  
+  The most recently used engine is kept and returned again for the same X, y, 
+  and cv, so that X.transpose()*X is only calculated once.
+  """
+  if y is None or fit_params or _gram_cv_method(estimator) is None:
+    return None
+  if not _is_mse_scorer(scoring):
+    return None
+  
+  with _gram_cv["lock"]:
+    engine = _gram_cv["engine"]
+    if engine is not None and engine.X is X and engine.y is y and engine.cv_in is cv:
+      return engine
+    
+    splits = _fixed_splits(cv, X, y)
+    if splits is None:
+      return None
+    engine = GramCV(X, y, splits)
+    engine.cv_in = cv
+    _gram_cv["engine"] = engine
+    return engine
+
+
+def _gram_cv_method(estimator):
+  """Returns (pinv, alpha) describing how GramCV fits for estimator, or None"""
+  if isinstance(estimator, LinearRegressionForLOOCV):
+    return (bool(estimator.pinv), 0.0)
+  if type(estimator) is sklearn.linear_model.Ridge:
+    params = estimator.get_params()
+    if params.get("fit_intercept", True) or params.get("positive", False):
+      return None
+    if not isinstance(params["alpha"], numbers.Number):
+      return None
+    return (False, float(params["alpha"]))
+  return None
+
+
+def _is_mse_scorer(scoring):
+  """True if scoring is a MeanSquaredErrorScorer"""
+  return isinstance(scoring, MeanSquaredErrorScorer)
+
+
+def _fixed_splits(cv, X, y):
+  """Returns cv as a list of (train, test) index arrays, or None if it is random"""
+  if not isinstance(cv, list):
+    if hasattr(cv, "random_state") and getattr(cv, "shuffle", True) \
+        and not isinstance(cv.random_state, numbers.Integral):
+      return None
+    cv = sklearn.model_selection.check_cv(cv).split(X, y)
+  splits = []
+  for train, test in cv:
+    train = np.asarray(train, dtype=int)
+    if np.unique(train).size != train.size:
+      return None
+    splits.append((train, np.asarray(test, dtype=int)))
+  return splits
+
+
+class GramCV(object):
+  """
+  Calculates cross-validation scores for linear least squares estimators 
+  using the Gram matrix, X.transpose()*X, calculated once.
+  
+  For each train/test set, the training set normal equations are obtained by 
+  subtracting the contribution of the samples not in the training set:
+    
+    G_train = X.transpose()*X - X_out.transpose()*X_out
+    b_train = X.transpose()*y - X_out.transpose()*y_out
+  
+  Then, for the selected features S, the coefficients are:
+    
+    LinearRegressionForLOOCV: b = np.linalg.pinv(G_train[S,S]) * b_train[S]
+                              (or np.linalg.solve, if not pinv)
+    Ridge:                    b = np.linalg.solve(G_train[S,S] + alpha*I, b_train[S])
+  
+  and the score is the mean squared error on the test set.
+  
+  If memory allows, G_train and b_train are stored for each train/test set, 
+  so that scoring an individual does not depend on n_samples except to 
+  evaluate the test set error.
+  
+  Attributes
+  ----------
+    
+    X: array-like of shape (n_samples, n_features)
+      The training input samples (correlations).
+    
+    y: array-like of shape: (n_samples,)
+      The target values (property values).
+    
+    cv: List[(train, test)]
+      The train/test sets, as arrays of indices
+    
+    G: array-like of shape (n_features, n_features)
+      X.transpose()*X
+    
+    b: array-like of shape (n_features,)
+      X.transpose()*y
+  
+  """
+  
+  def __init__(self, X, y, cv, max_bytes=2**30):
+    """
+    Arguments
+    ---------
+      
+      X: array-like of shape (n_samples, n_features)
+        The training input samples (correlations).
+      
+      y: array-like of shape: (n_samples,)
+        The target values (property values).
+      
+      cv: List[(train, test)]
+        The train/test sets, as arrays of indices
+      
+      max_bytes: int, optional, default=2**30
+        Store G_train for each train/test set if it takes less than this
+        amount of memory, else calculate each time it is needed.
+    
+    """
+    self.X = X
+    self.y = y
+    self.cv = cv
+    self.G = X.transpose().dot(X)
+    self.b = X.transpose().dot(y)
+    
+    n_samples, n_features = X.shape
+    store = len(cv)*n_features**2*8 <= max_bytes
+    
+    self._folds = []
+    for train, test in cv:
+      out = np.ones(n_samples, dtype=bool)
+      out[train] = False
+      out = np.where(out)[0]
+      if store:
+        G_train = self.G - X[out,:].transpose().dot(X[out,:])
+        b_train = self.b - X[out,:].transpose().dot(y[out])
+        self._folds.append((out, test, G_train, b_train))
+      else:
+        self._folds.append((out, test, None, None))
+  
+  
+  def scores(self, estimator, selected):
+    """
+    Returns the mean squared error on each test set
+    
+    Arguments
+    ---------
+      
+      estimator: LinearRegressionForLOOCV or sklearn.linear_model.Ridge
+        The estimator. See 'gram_cv'.
+      
+      selected: List[int]
+        The indices of the selected features
+    
+    Returns
+    -------
+      
+      scores: np.array of shape (n_splits,)
+        The mean squared error on each test set
+    """
+    pinv, alpha = _gram_cv_method(estimator)
+    S = np.asarray(selected, dtype=int)
+    scores = np.zeros(len(self._folds))
+    for i, (out, test, G_train, b_train) in enumerate(self._folds):
+      if G_train is not None:
+        A = G_train[np.ix_(S,S)]
+        rhs = b_train[S]
+      else:
+        X_out = self.X[np.ix_(out,S)]
+        A = self.G[np.ix_(S,S)] - X_out.transpose().dot(X_out)
+        rhs = self.b[S] - X_out.transpose().dot(self.y[out])
+      
+      if pinv:
+        coef = np.linalg.pinv(A).dot(rhs)
+      else:
+        coef = np.linalg.solve(A + alpha*np.identity(S.size), rhs)
+      
+      err = self.y[test] - self.X[np.ix_(test,S)].dot(coef)
+      scores[i] = np.mean(err**2)
+    return scores
+  
+
+
+def _is_loo_for_lls(cv, n_samples):
+  """Returns True if cv is equivalent to LeaveOneOutForLLS(n_samples)"""
+  if not isinstance(cv, list) or len(cv) != 1:
+    return False
+  train, test = cv[0]
+  return list(train) == list(range(n_samples)) and list(test) == list(range(n_samples))
+
+
+def incremental_loocv(estimator, X, y, scoring=None, cv=None, penalty=0.0):
+  """
+  Returns an IncrementalLOOCV engine, if it gives the same fitness as 
+  'cross_val_score' for the given parameters, else None.
+  
+  The engine can be used when 'estimator' is a LinearRegressionForLOOCV, 
+  'scoring' is None, and 'cv' is LeaveOneOutForLLS.
+  """
+  if not isinstance(estimator, LinearRegressionForLOOCV):
+    return None
+  if scoring is not None or not _is_loo_for_lls(cv, X.shape[0]):
+    return None
+  return IncrementalLOOCV(X, y, penalty=penalty)
+
+
+class IncrementalLOOCV(object):
+  """
+  Calculates the LOOCV fitness of all children of a parent individual that
+  differ from it by a single feature, without refitting each child.
+  
+  The LOOCV score, as calculated by LinearRegressionForLOOCV, depends on X only
+  through the projection onto its column space, H = Q*Q.transpose(). Given the 
+  thin QR decomposition of the parent, X[:,S] = Q*R, a child with feature j 
+  added or removed has:
+    
+    H_child = H +/- u*u.transpose()
+  
+  where u is a unit vector: for an added feature, the component of X[:,j]
+  orthogonal to Q; for a removed feature, the direction in the column space 
+  of the parent orthogonal to all other selected features, Q*R.inv().transpose()[:,j].
+  So each child's leverages and residuals are obtained in O(n_samples) from 
+  the parent's, after an O(n_samples*n_selected*n_features) update.
+  
+  The parent's factorization is cached, so successive calls for the same
+  parent do not repeat it.
+  
+  Children for which this is not accurate, because the parent or child is
+  (nearly) rank deficient, are given fitness NaN and should be evaluated by 
+  refitting.
+  
+  Attributes
+  ----------
+    
+    X: array-like of shape (n_samples, n_features)
+      The training input samples (correlations).
+    
+    y: array-like of shape: (n_samples,)
+      The target values (property values).
+    
+    penalty: float
+      The CV score is increased by 'penalty*(number of selected basis function)'
+    
+    chunksize: int
+      Maximum number of children scored at once, to limit memory use to about
+      chunksize*n_samples values.
+  
+  """
+  
+  def __init__(self, X, y, penalty=0.0, chunksize=64):
+    """
+    Arguments
+    ---------
+      
+      X: array-like of shape (n_samples, n_features)
+        The training input samples (correlations).
+      
+      y: array-like of shape: (n_samples,)
+        The target values (property values).
+      
+      penalty: float, optional, default=0.0
+        The CV score is increased by 'penalty*(number of selected basis function)'
+      
+      chunksize: int, optional, default=64
+        Maximum number of children scored at once.
+    
+    """
+    self.X = np.asarray(X, dtype=float)
+    self.y = np.ravel(np.asarray(y, dtype=float))
+    self.penalty = penalty
+    self.chunksize = chunksize
+    self._parent = None
+  
+  
+  def _factor(self, individual):
+    """
+    Returns (selected, Q, U, e, h) for the parent, or None if rank deficient.
+      
+      selected: 1d array of int, the indices of selected features
+      Q: the orthonormal basis of X[:,selected]
+      U: unit vectors removed from Q's span by removing each selected feature
+      e: residuals, y - H*y
+      h: leverages, np.diag(H)
+    """
+    selected = np.array(indices(individual), dtype=int)
+    if self._parent is not None and np.array_equal(self._parent[0], selected):
+      return self._parent[1]
+    
+    n_samples = self.X.shape[0]
+    if selected.size == 0:
+      Q = np.zeros((n_samples, 0))
+      f = (selected, Q, Q, self.y, np.zeros(n_samples))
+    else:
+      Q, R = np.linalg.qr(self.X[:,selected])
+      s = np.linalg.svd(R, compute_uv=False)
+      if s.min()**2 <= 1e-10*s.max()**2:
+        f = None
+      else:
+        U = Q.dot(np.linalg.inv(R).transpose())
+        U /= np.sqrt(np.sum(U*U, axis=0))
+        e = self.y - Q.dot(Q.transpose().dot(self.y))
+        h = np.sum(Q*Q, axis=1)
+        f = (selected, Q, U, e, h)
+    
+    self._parent = (selected, f)
+    return f
+  
+  
+  def flip_scores(self, individual, flips):
+    """
+    Calculate the fitness of the children of 'individual' obtained by flipping 
+    one feature on or off.
+    
+    Arguments
+    ---------
+      
+      individual: List[bool] of length n_features
+        The parent individual.
+      
+      flips: 1d array-like of int
+        Indices of features to flip, one per child.
+    
+    
+    Returns
+    -------
+      
+      fitness: 1d np.array of float, of shape (len(flips),)
+        The fitness value of each child, equal to the first element of 
+        'cross_val_score' for LinearRegressionForLOOCV and LeaveOneOutForLLS.
+        NaN if the child should be evaluated by refitting.
+    """
+    flips = np.asarray(flips, dtype=int)
+    result = np.full(flips.shape, np.nan)
+    f = self._factor(individual)
+    if f is None or flips.size == 0:
+      return result
+    selected, Q, U, e, h = f
+    
+    on = np.asarray(individual, dtype=bool)[flips]
+    
+    # added features: u is the normalized component orthogonal to Q
+    add = np.where(~on)[0]
+    trace = np.sum(self.X[:,selected]**2)
+    for begin in range(0, add.size, self.chunksize):
+      i = add[begin:begin+self.chunksize]
+      Xa = self.X[:,flips[i]]
+      Z = Xa - Q.dot(Q.transpose().dot(Xa))
+      zz = np.sum(Z*Z, axis=0)
+      ok = zz > 1e-10*(trace + np.sum(Xa*Xa, axis=0))
+      u = Z[:,ok]/np.sqrt(zz[ok])
+      result[i[ok]] = self._score(e[:,np.newaxis] - u*u.transpose().dot(self.y), h[:,np.newaxis] + u*u, selected.size + 1)
+    
+    # removed features: u is the column of U for the feature
+    remove = np.where(on)[0]
+    column = dict((j, k) for k, j in enumerate(selected))
+    for begin in range(0, remove.size, self.chunksize):
+      i = remove[begin:begin+self.chunksize]
+      u = U[:,[column[j] for j in flips[i]]]
+      result[i] = self._score(e[:,np.newaxis] + u*u.transpose().dot(self.y), h[:,np.newaxis] - u*u, selected.size - 1)
+    
+    return result
+  
   
+  def _score(self, e, h, n_selected):
+    """Fitness given residuals and leverages, of shape (n_samples, n_children)"""
+    loocv = np.mean((e/(1.0 - h))**2, axis=0)
+    return np.sqrt(loocv) + self.penalty*n_selected
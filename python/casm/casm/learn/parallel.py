@@ -0,0 +1,257 @@
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+from builtins import *
+
+import multiprocessing
+import multiprocessing.pool
+import multiprocessing.sharedctypes
+
+import numpy as np
+import sklearn.model_selection
+
+import casm.learn.model_selection
+
+# data shared with a worker process, set by _init_worker
+_worker = None
+
+def _init_worker(X_raw, X_shape, y_raw, y_shape, estimator, scoring, cv, penalty):
+  """Set the data used by _evaluate_worker, viewing X and y in shared memory"""
+  global _worker
+  _worker = {
+    "X": np.frombuffer(X_raw, dtype=float).reshape(X_shape),
+    "y": np.frombuffer(y_raw, dtype=float).reshape(y_shape),
+    "estimator": estimator,
+    "scoring": scoring,
+    "cv": cv,
+    "penalty": penalty}
+
+
+def _evaluate_worker(individual):
+  """Evaluate fitness in a worker process"""
+  w = _worker
+  return casm.learn.model_selection.cross_val_score(
+    w["estimator"], w["X"], individual, y=w["y"],
+    scoring=w["scoring"], cv=w["cv"], penalty=w["penalty"])
+
+
+def shared_array(a):
+  """
+  Copy an array into shared memory, for reading by worker processes without
+  copying
+  
+  Arguments
+  ---------
+  
+    a: array-like
+      The array to copy. It is converted to float.
+  
+  Returns
+  -------
+  
+    (raw, shape): (multiprocessing.sharedctypes.RawArray, tuple)
+      The shared memory and the shape of a. Pass both to the worker process, 
+      i.e. as Pool 'initargs', and view them as an array with:
+        
+        np.frombuffer(raw, dtype=float).reshape(shape)
+  
+  """
+  a = np.asarray(a, dtype=float)
+  raw = multiprocessing.sharedctypes.RawArray('d', max(a.size, 1))
+  np.frombuffer(raw, dtype=float)[:a.size] = a.ravel()
+  return (raw, a.shape)
+
+
+def pool_context():
+  """
+  Returns the multiprocessing context used to start worker processes
+  
+  Worker processes are started with the "forkserver" method, if available, or
+  else "spawn", so that they do not inherit a copy of the state of other threads
+  in the parent process, such as locks held while libcasm is in use. The 
+  functions and arguments sent to the workers must be picklable.
+  
+  With Python 2, which only forks worker processes, the multiprocessing module
+  is returned, and worker processes should not be started while other threads
+  are using libcasm.
+  """
+  if not hasattr(multiprocessing, "get_context"):
+    return multiprocessing
+  methods = multiprocessing.get_all_start_methods()
+  for method in ["forkserver", "spawn"]:
+    if method in methods:
+      return multiprocessing.get_context(method)
+  return multiprocessing.get_context()
+
+
+def _unwrap(func):
+  """Returns the function wrapped by functools.partial, as by deap.base.Toolbox.register"""
+  while hasattr(func, "func"):
+    func = func.func
+  return func
+
+
+class ParallelEvaluator(object):
+  """
+  Evaluates the fitness of individuals in parallel, using a pool of worker
+  processes or threads.
+
+  Use by registering 'evaluate' and 'map' in a deap.base.Toolbox:
+
+    toolbox.register("evaluate", evaluator.evaluate)
+    toolbox.register("map", evaluator.map)
+
+  Then 'toolbox.map(toolbox.evaluate, individuals)' evaluates the individuals
+  in the pool, and other functions are mapped serially.
+
+  With the "process" backend, X and y are copied once into shared memory that
+  the worker processes read without copying, and only the selected features
+  of each individual are sent to the workers. With the "thread" backend, the
+  worker threads use X and y directly. Worker processes are started as 
+  described by 'pool_context'.
+
+  Results are returned in order and do not depend on the number of workers.
+  To ensure this, if 'cv' is not a list of train/test sets, the train/test
+  sets are generated once, when the ParallelEvaluator is constructed, and
+  used for all evaluations.
+
+  Attributes
+  ----------
+
+    estimator:  estimator object implementing 'fit'
+      The estimator specified by the input settings.
+
+    X: array-like of shape (n_samples, n_features)
+      The training input samples (correlations).
+
+    y: array-like of shape: (n_samples, 1)
+      The target values (property values).
+
+    scoring: string, callable or None
+      A string or a scorer callable object / function with signature
+      scorer(estimator, X, y). The parameter for sklearn.model_selection.cross_val_score,
+      default = None, uses estimator.score().
+
+    cv: List[(train, test)]
+      The train/test sets
+
+    penalty: float
+      The CV score is increased by 'penalty*(number of selected basis function)'
+
+    n_jobs: int
+      Number of worker processes or threads.
+
+    backend: str
+      One of "process" or "thread".
+
+  """
+
+  def __init__(self, estimator, X, y, scoring=None, cv=None, penalty=0.0, n_jobs=-1, backend="process"):
+    """
+    Arguments
+    ---------
+
+      estimator:  estimator object implementing 'fit'
+        The estimator specified by the input settings.
+
+      X: array-like of shape (n_samples, n_features)
+        The training input samples (correlations).
+
+      y: array-like of shape: (n_samples, 1)
+        The target values (property values).
+
+      scoring: string, callable or None, optional, default=None
+        A string or a scorer callable object / function with signature
+        scorer(estimator, X, y). The parameter for sklearn.model_selection.cross_val_score,
+        default = None, uses estimator.score().
+
+      cv: cross-validation generator or an iterable, optional, default=None
+        Provides train/test splits.
+
+      penalty: float, optional, default=0.0
+        The CV score is increased by 'penalty*(number of selected basis function)'
+
+      n_jobs: int, optional, default=-1
+        Number of worker processes or threads. If negative,
+        (number of CPUs + 1 + n_jobs) are used, so -1 uses all CPUs.
+
+      backend: str, optional, default="process"
+        One of "process" or "thread".
+
+    """
+    if backend not in ["process", "thread"]:
+      raise Exception("Error constructing ParallelEvaluator: backend must be 'process' or 'thread', not '" + str(backend) + "'")
+    if n_jobs is None or n_jobs == 0:
+      raise Exception("Error constructing ParallelEvaluator: n_jobs must be a non-zero integer")
+    if n_jobs < 0:
+      n_jobs = max(multiprocessing.cpu_count() + 1 + n_jobs, 1)
+
+    if not isinstance(cv, list):
+      cv = list(sklearn.model_selection.check_cv(cv).split(X, y))
+
+    self.estimator = estimator
+    self.X = X
+    self.y = y
+    self.scoring = scoring
+    self.cv = cv
+    self.penalty = penalty
+    self.n_jobs = n_jobs
+    self.backend = backend
+
+    if backend == "process":
+      X_raw, X_shape = shared_array(X)
+      y_raw, y_shape = shared_array(y)
+      self.pool = pool_context().Pool(n_jobs, initializer=_init_worker,
+        initargs=(X_raw, X_shape, y_raw, y_shape, estimator, scoring, cv, penalty))
+    else:
+      self.pool = multiprocessing.pool.ThreadPool(n_jobs)
+
+
+  def evaluate(self, individual):
+    """
+    Evaluate fitness in the current process
+
+    Arguments
+    ---------
+
+      individual: List[bool] of length n_features
+        This is a boolean list of shape [n_features], in which an element is True
+        iff its corresponding feature is selected for retention.
+
+    Returns
+    -------
+
+      fitness: tuple of float, as returned by casm.learn.model_selection.cross_val_score
+    """
+    return casm.learn.model_selection.cross_val_score(
+      self.estimator, self.X, individual, y=self.y,
+      scoring=self.scoring, cv=self.cv, penalty=self.penalty)
+
+
+  def map(self, func, iterable):
+    """
+    Returns list(map(func, iterable)), evaluated in the pool if func is
+    self.evaluate, else evaluated serially.
+    """
+    items = list(iterable)
+    if self.pool is None or _unwrap(func) != self.evaluate or len(items) < 2:
+      return [func(x) for x in items]
+    if self.backend == "process":
+      return self.pool.map(_evaluate_worker, [list(x) for x in items])
+    return self.pool.map(self.evaluate, items)
+
+
+  def close(self):
+    """
+    Stop the worker processes or threads
+    """
+    if self.pool is not None:
+      self.pool.close()
+      self.pool.join()
+      self.pool = None
+
+
+  def __enter__(self):
+    return self
+
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.close()
@@ -0,0 +1,265 @@
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+from builtins import *
+
+import numbers
+from os.path import join
+
+import numpy as np
+
+import casm.learn.store
+import casm.learn.tools
+from casm.project import Selection, iter_query
+
+
+def _is_number(x):
+  """True if x is a real number"""
+  return isinstance(x, numbers.Real)
+
+
+def _is_pair(x):
+  """True if x is an (int, float) tuple, an entry of 'indiv.eci'"""
+  return isinstance(x, tuple) and len(x) == 2 and isinstance(x[0], numbers.Integral) \
+    and _is_number(x[1])
+
+
+def _model_form(model):
+  """Returns "dense" or "sparse", the form of the ECI of one model in a list of models"""
+  if isinstance(model, casm.learn.tools.SparseECI):
+    return "sparse"
+  if isinstance(model, np.ndarray):
+    return "dense"
+  if isinstance(model, (list, tuple)):
+    if all(_is_pair(x) for x in model):
+      return "sparse"
+    if all(_is_number(x) for x in model):
+      return "dense"
+  raise Exception("Error in eci_matrix: could not interpret ECI: " + repr(model))
+
+
+def eci_matrix(eci, n_features):
+  """
+  Convert ECI to a matrix with one column per model
+
+  Arguments
+  ---------
+
+    eci: array-like or List
+      One of:
+        - numpy.ndarray of shape (n_features,) or (n_features, n_models): dense ECI
+        - casm.learn.tools.SparseECI or List[(int, float)]: the ECI of one
+          individual, as 'indiv.eci'
+        - List[float] of length n_features: the dense ECI of one model
+        - List of SparseECI, List[(int, float)], or dense ECI of length
+          n_features: the ECI of several models, i.e. [indiv.eci for indiv in hall].
+          Within it, an empty list is a model with no non-zero ECI. An empty
+          list has no models.
+
+      An (int, float) tuple is always read as an (index, value) pair.
+
+    n_features: int
+      The number of basis functions
+
+  Returns
+  -------
+
+    eci: numpy.ndarray of shape (n_features, n_models)
+      The ECI, with one column per model
+
+  """
+  if isinstance(eci, casm.learn.tools.SparseECI):
+    models = [eci]
+  elif isinstance(eci, np.ndarray):
+    eci = eci.astype(float, copy=False)
+    if eci.ndim == 1:
+      eci = eci[:, np.newaxis]
+    if eci.ndim != 2 or eci.shape[0] != n_features:
+      raise Exception("Error in eci_matrix: expected " + str(n_features) + " rows, found shape " + str(eci.shape))
+    return eci
+  else:
+    eci = list(eci)
+    if len(eci) and all(_is_pair(x) for x in eci):
+      models = [eci]
+    elif len(eci) and all(_is_number(x) for x in eci):
+      models = [np.asarray(eci, dtype=float)]
+    else:
+      models = eci
+
+  result = np.zeros((n_features, len(models)))
+  for j, model in enumerate(models):
+    if _model_form(model) == "dense":
+      model = np.asarray(model, dtype=float)
+      if model.shape != (n_features,):
+        raise Exception("Error in eci_matrix: expected dense ECI of length " + str(n_features) + ", found shape " + str(model.shape))
+      result[:, j] = model
+      continue
+    model = casm.learn.tools.SparseECI.from_pairs(model)
+    if len(model) and model.index.max() >= n_features:
+      print("basis set size:", n_features)
+      print("max eci index:", model.index.max())
+      raise Exception("Error in eci_matrix: bset and eci mismatch")
+    result[model.index, j] = model.value
+  return result
+
+
+class Predictor(object):
+  """
+  Evaluates cluster expansion predictions for a set of configurations and any
+  number of ECI sets
+
+  The correlations are held once, in memory or memory mapped from an array
+  store (see 'save_correlations'), and predictions for a stack of ECI sets
+  are evaluated as a single matrix product.
+
+  Attributes
+  ----------
+
+    corr: numpy.ndarray of shape (n_configs, n_features)
+      The correlations
+
+    configname: numpy.ndarray of str of shape (n_configs,), or None
+      The configuration names
+
+  """
+
+  def __init__(self, corr, configname=None):
+    """
+    Arguments
+    ---------
+
+      corr: array-like of shape (n_configs, n_features)
+        The correlations. numpy.memmap are used without copying.
+
+      configname: array-like of str of shape (n_configs,), optional, default=None
+        The configuration names
+
+    """
+    if not isinstance(corr, np.ndarray) or corr.dtype != np.float64:
+      corr = np.asarray(corr, dtype=float)
+    if corr.ndim != 2:
+      raise Exception("Error constructing Predictor: corr must be 2d")
+    if configname is not None and len(configname) != corr.shape[0]:
+      raise Exception("Error constructing Predictor: configname and corr sizes differ")
+    self.corr = corr
+    self.configname = configname
+
+  @property
+  def n_configs(self):
+    return self.corr.shape[0]
+
+  @property
+  def n_features(self):
+    return self.corr.shape[1]
+
+  def predict(self, eci, out=None):
+    """
+    Evaluate predictions
+
+    Arguments
+    ---------
+
+      eci: array-like or List
+        The ECI, in any form accepted by 'eci_matrix'. For a hall of fame,
+        use [indiv.eci for indiv in hall].
+
+      out: numpy.ndarray of shape (n_configs, n_models), optional, default=None
+        If given, the predictions are written to out, which may be a
+        numpy.memmap.
+
+    Returns
+    -------
+
+      values: numpy.ndarray of shape (n_configs, n_models)
+        The predicted values, corr.dot(eci)
+
+    """
+    return np.dot(self.corr, eci_matrix(eci, self.n_features), out=out)
+
+
+def save_correlations(proj, path, selection="MASTER", X_name="corr", chunksize=10000, verbose=False):
+  """
+  Query correlations for a selection and write them to an array store
+
+  Correlations are queried in chunks and written directly into a memory
+  mapped array, so the complete query results are never held in memory.
+
+  Arguments
+  ---------
+
+    proj: casm.project.Project
+      The CASM project
+
+    path: str
+      The array store directory to write
+
+    selection: casm.project.Selection or str, optional, default="MASTER"
+      The selection of configurations. Only selected configurations are
+      included.
+
+    X_name: str, optional, default="corr"
+      The 'casm query' property to query, as input["problem_specs"]["data"]["X"]
+
+    chunksize: int, optional, default=10000
+      Maximum number of configurations queried at once
+
+    verbose: boolean, optional, default=False
+      Print information to stdout.
+
+  """
+  if not isinstance(selection, Selection):
+    selection = Selection(proj, selection, all=False)
+  n_configs = int(np.count_nonzero(selection.data.loc[:, "selected"].values))
+
+  tmp = casm.learn.store.begin_store(path)
+  configname = []
+  corr = None
+  begin = 0
+  for df in iter_query(proj, ["configname", X_name], selection, chunksize=chunksize):
+    X = df.iloc[:, casm.learn.tools.X_columns(df.columns, X_name)].values
+    if corr is None:
+      corr = np.lib.format.open_memmap(join(tmp, "corr.npy"), mode='w+', dtype=float,
+                                       shape=(n_configs, X.shape[1]))
+    corr[begin:begin + X.shape[0], :] = X
+    configname += list(df.loc[:, "configname"].values)
+    begin += X.shape[0]
+    if verbose:
+      print("# Queried", X_name, "for", begin, "of", n_configs, "configurations")
+
+  if corr is None:
+    np.save(join(tmp, "corr.npy"), np.zeros((0, 0)))
+  else:
+    corr.flush()
+    del corr
+  np.save(join(tmp, "configname.npy"), np.array(configname, dtype=str))
+
+  metadata = {"type": "Correlations", "X_name": X_name, "selection": selection.path}
+  casm.learn.store.commit_store(path, tmp, metadata, ["corr", "configname"])
+
+  if verbose:
+    print("# Wrote correlations:", path)
+
+
+def open_predictor(path, mmap_mode='r'):
+  """
+  Construct a Predictor from correlations saved by 'save_correlations'
+
+  Arguments
+  ---------
+
+    path: str
+      The array store directory
+
+    mmap_mode: str or None, optional, default='r'
+      The numpy.load 'mmap_mode' used to read the correlations. Use None to read
+      the correlations into memory.
+
+  Returns
+  -------
+
+    predictor: casm.learn.predict.Predictor
+      The Predictor, with correlations memory mapped
+
+  """
+  store = casm.learn.store.Store(path, mmap_mode=mmap_mode)
+  if store.metadata.get("type") != "Correlations":
+    raise Exception("Error opening Predictor: '" + path + "' does not contain correlations")
+  return Predictor(store.array("corr"), configname=store.array("configname"))
@@ -0,0 +1,582 @@
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+from builtins import *
+
+import json
+import os
+import pickle
+import shutil
+import uuid
+from os.path import join, splitext
+
+import numpy as np
+import pandas
+import six
+from deap.tools import HallOfFame
+
+import casm.learn
+
+# An array store is a directory holding:
+#   metadata.json: JSON metadata, including the names of the stored arrays
+#   <name>.npy: one file per array, memory-mapped when read
+#   objects.pkl: optional, small python objects that are not arrays or JSON
+#   data.pkl: optional, a pickled pandas.DataFrame, read when first accessed
+
+STORE_EXTENSION = ".arrays"
+
+
+def is_pickle_filename(filename):
+  """Returns True if filename ends in '.pkl', the legacy pickle file format"""
+  return filename[-4:].lower() == ".pkl"
+
+
+def store_filename(filename):
+  """Returns the array store filename corresponding to a '.pkl' filename"""
+  return splitext(filename)[0] + STORE_EXTENSION
+
+
+def is_store(path):
+  """Returns True if path is an array store directory"""
+  return os.path.isdir(path) and os.path.exists(join(path, "metadata.json"))
+
+
+def write_store(path, metadata, arrays, objects=None, data=None):
+  """
+  Write an array store
+
+  The store is written to a temporary directory which then replaces any
+  existing store at path, so an interrupted write does not leave a partially
+  written store.
+
+  Arguments
+  ---------
+
+    path: str
+      The array store directory
+
+    metadata: dict
+      JSON serializable metadata
+
+    arrays: dict of str:array-like
+      The arrays to store
+
+    objects: dict, optional, default=None
+      Other python objects to store, pickled
+
+    data: pandas.DataFrame, optional, default=None
+      A DataFrame to store, pickled
+  """
+  tmp = begin_store(path)
+
+  for name, value in six.iteritems(arrays):
+    np.save(join(tmp, name + ".npy"), np.ascontiguousarray(value))
+  if objects:
+    with open(join(tmp, "objects.pkl"), 'wb') as f:
+      pickle.dump(objects, f, protocol=2)
+  if data is not None:
+    data.to_pickle(join(tmp, "data.pkl"), protocol=2)
+
+  commit_store(path, tmp, metadata, arrays.keys())
+
+
+def begin_store(path):
+  """
+  Begin writing an array store
+
+  Arrays are written to the returned temporary directory, as '<name>.npy',
+  and then 'commit_store' replaces any existing store at path.
+
+  Arguments
+  ---------
+
+    path: str
+      The array store directory
+
+  Returns
+  -------
+
+    tmp: str
+      The temporary directory to write arrays to
+
+  """
+  if os.path.exists(path) and not is_store(path):
+    raise Exception("Error writing array store: '" + path + "' exists and is not an array store")
+
+  tmp = path + ".tmp"
+  if os.path.exists(tmp):
+    shutil.rmtree(tmp)
+  os.makedirs(tmp)
+  return tmp
+
+
+def commit_store(path, tmp, metadata, names):
+  """
+  Finish writing an array store begun with 'begin_store'
+
+  Writes metadata, listing the array names, and replaces any existing store at
+  path with tmp.
+
+  Arguments
+  ---------
+
+    path: str
+      The array store directory
+
+    tmp: str
+      The temporary directory returned by 'begin_store'
+
+    metadata: dict
+      JSON serializable metadata
+
+    names: List[str]
+      The names of the arrays written to tmp
+
+  """
+  metadata = dict(metadata)
+  metadata["arrays"] = sorted(names)
+  with open(join(tmp, "metadata.json"), 'wb') as f:
+    f.write(six.u(json.dumps(metadata, indent=2)).encode('utf-8'))
+
+  if os.path.exists(path):
+    old = path + ".old"
+    if os.path.exists(old):
+      shutil.rmtree(old)
+    os.rename(path, old)
+    os.rename(tmp, path)
+    shutil.rmtree(old)
+  else:
+    os.rename(tmp, path)
+
+
+class Store(object):
+  """
+  Read access to an array store
+
+  Attributes
+  ----------
+
+    path: str
+      The array store directory
+
+    metadata: dict
+      The stored metadata
+
+    mmap_mode: str or None
+      The numpy.load 'mmap_mode' used to read arrays. The default, 'c', memory
+      maps arrays copy-on-write, so they are only read from disk as accessed
+      and may be modified in memory without changing the stored data.
+
+  """
+
+  def __init__(self, path, mmap_mode='c'):
+    if not is_store(path):
+      raise Exception("Error reading array store: '" + path + "' is not an array store")
+    self.path = path
+    self.mmap_mode = mmap_mode
+    with open(join(path, "metadata.json"), 'rb') as f:
+      self.metadata = json.loads(f.read().decode('utf-8'))
+
+
+  def has_array(self, name):
+    return name in self.metadata["arrays"]
+
+
+  def array(self, name):
+    """Returns a stored array, memory mapped if it is not empty"""
+    filename = join(self.path, name + ".npy")
+    try:
+      return np.load(filename, mmap_mode=self.mmap_mode, allow_pickle=False)
+    except ValueError:
+      # empty arrays can not be memory mapped
+      return np.load(filename, allow_pickle=False)
+
+
+  def objects(self):
+    """Returns the dict of stored python objects"""
+    filename = join(self.path, "objects.pkl")
+    if not os.path.exists(filename):
+      return dict()
+    with open(filename, 'rb') as f:
+      return pickle.load(f)
+
+
+  def has_data(self):
+    return os.path.exists(join(self.path, "data.pkl"))
+
+
+  def data(self):
+    """Returns the stored pandas.DataFrame"""
+    return pandas.read_pickle(join(self.path, "data.pkl"))
+
+
+class _DataLoader(object):
+  """Reads the DataFrame in an array store when called, for lazy loading"""
+
+  def __init__(self, path):
+    self.path = path
+
+  def __call__(self):
+    return Store(self.path).data()
+
+
+def _split_arrays(cv):
+  """
+  Returns (train, train_offsets, test, test_offsets), the concatenated
+  train/test index arrays and the offsets where each set begins, or None if cv
+  is not a list of (train, test) index arrays.
+  """
+  if not isinstance(cv, list):
+    return None
+  train, test = [], []
+  for split in cv:
+    if len(split) != 2:
+      return None
+    split = [np.asarray(indices) for indices in split]
+    if any(indices.ndim != 1 or indices.dtype.kind not in "iu" for indices in split):
+      return None
+    train.append(split[0])
+    test.append(split[1])
+
+  def pack(sets):
+    values = np.concatenate(sets) if len(sets) else np.zeros(0, dtype=int)
+    return (values, np.cumsum([0] + [indices.size for indices in sets]))
+  return pack(train) + pack(test)
+
+
+def write_fitting_data(fdata, path):
+  """
+  Write a casm.learn.FittingData to an array store
+
+  Arguments
+  ---------
+
+    fdata: casm.learn.FittingData
+      The problem data
+
+    path: str
+      The array store directory
+  """
+  state = dict(fdata.__getstate__())
+  metadata = {
+    "type": "FittingData",
+    "version": 1,
+    "n_samples": state.pop("n_samples"),
+    "n_features": state.pop("n_features")}
+  if "input" in state:
+    metadata["input"] = state.pop("input")
+
+  arrays = dict()
+  for name in ["X", "y", "weight_factor", "weighted_X", "weighted_y"]:
+    arrays[name] = np.asarray(state.pop(name))
+
+  if state.get("sample_weight") is not None and len(state["sample_weight"]):
+    arrays["sample_weight"] = np.asarray(state.pop("sample_weight"))
+
+  splits = _split_arrays(state.get("cv"))
+  if splits is not None:
+    state.pop("cv")
+    for name, value in zip(["cv_train", "cv_train_offsets", "cv_test", "cv_test_offsets"], splits):
+      arrays[name] = value
+
+  data = state.pop("_data", None)
+
+  # remaining attributes, i.e. 'scoring', 'penalty', and a 'cv' generator
+  write_store(path, metadata, arrays, objects=state, data=data)
+
+
+def read_fitting_data(path):
+  """
+  Read a casm.learn.FittingData from an array store
+
+  Arrays are memory mapped, and FittingData.data is read when first accessed.
+
+  Arguments
+  ---------
+
+    path: str
+      The array store directory
+
+  Returns
+  -------
+
+    fdata: casm.learn.FittingData
+      The problem data
+  """
+  store = Store(path)
+  if store.metadata.get("type") != "FittingData":
+    raise Exception("Error reading FittingData: '" + path + "' does not store FittingData")
+
+  state = store.objects()
+  state["n_samples"] = store.metadata["n_samples"]
+  state["n_features"] = store.metadata["n_features"]
+  if "input" in store.metadata:
+    state["input"] = store.metadata["input"]
+
+  for name in ["X", "y", "weight_factor", "weighted_X", "weighted_y"]:
+    state[name] = store.array(name)
+  if store.has_array("sample_weight"):
+    state["sample_weight"] = store.array("sample_weight")
+  elif "sample_weight" not in state:
+    state["sample_weight"] = None
+
+  if store.has_array("cv_train"):
+    train, train_offsets, test, test_offsets = [np.asarray(store.array(name)) for name in
+      ["cv_train", "cv_train_offsets", "cv_test", "cv_test_offsets"]]
+    state["cv"] = [(train[train_offsets[i]:train_offsets[i+1]], test[test_offsets[i]:test_offsets[i+1]])
+      for i in range(len(train_offsets) - 1)]
+
+  state["_data"] = _DataLoader(path) if store.has_data() else None
+
+  fdata = casm.learn.FittingData.__new__(casm.learn.FittingData)
+  fdata.__setstate__(state)
+  return fdata
+
+
+def write_training_data(path, X, y, data=None):
+  """
+  Write training data to an array store, for use with the "arrays" training
+  data filetype
+
+  Arguments
+  ---------
+
+    path: str
+      The array store directory
+
+    X: array-like of shape (n_samples, n_features)
+      The training input samples (correlations)
+
+    y: array-like of shape (n_samples,)
+      The target values (property values)
+
+    data: pandas.DataFrame, optional, default=None
+      Other columns, such as 'configname' or 'hull_dist', with one row per
+      sample
+  """
+  X = np.asarray(X)
+  y = np.asarray(y)
+  if X.ndim != 2 or y.shape != (X.shape[0],):
+    raise Exception("Error writing training data: X and y shapes differ")
+  if data is not None and data.shape[0] != X.shape[0]:
+    raise Exception("Error writing training data: X and data shapes differ")
+  metadata = {
+    "type": "TrainingData",
+    "version": 1,
+    "n_samples": X.shape[0],
+    "n_features": X.shape[1]}
+  write_store(path, metadata, {"X": X, "y": y}, data=data)
+
+
+def read_training_data(path, y_name="y", mmap_mode='r'):
+  """
+  Read training data written by 'write_training_data'
+
+  Arguments
+  ---------
+
+    path: str
+      The array store directory
+
+    y_name: str, optional, default="y"
+      The name of the data column holding y, as
+      input["problem_specs"]["data"]["y"]
+
+    mmap_mode: str or None, optional, default='r'
+      The numpy.load 'mmap_mode' used to read X. Use None to read X into
+      memory.
+
+  Returns
+  -------
+
+    (X, data): (numpy.ndarray of shape (n_samples, n_features), pandas.DataFrame)
+      X, memory mapped, and a DataFrame with the stored 'data' columns and a
+      column 'y_name' holding y
+  """
+  store = Store(path, mmap_mode=mmap_mode)
+  if store.metadata.get("type") != "TrainingData":
+    raise Exception("Error reading TrainingData: '" + path + "' does not store training data")
+  X = store.array("X")
+  data = store.data() if store.has_data() else pandas.DataFrame(index=range(X.shape[0]))
+  data.loc[:,y_name] = np.asarray(store.array("y"))
+  return (X, data)
+
+
+def _json_default(obj):
+  if isinstance(obj, np.generic):
+    return obj.item()
+  raise TypeError(repr(obj) + " is not JSON serializable")
+
+
+def _as_json(value):
+  """Returns value as JSON text if it is restored exactly by json.loads, else None"""
+  try:
+    s = json.dumps(value, default=_json_default)
+    if json.loads(s) == value:
+      return s
+  except (TypeError, ValueError):
+    pass
+  return None
+
+
+def write_halloffame(hall, path):
+  """
+  Write a deap.tools.HallOfFame of individuals to an array store
+
+  The selected features, fitness, and ECI of each individual are stored as
+  arrays, and the individual's other attributes as JSON, except for attributes
+  that are not restored exactly from JSON (i.e. the pandas.DataFrame added by
+  --checkhull), which are pickled.
+
+  Arguments
+  ---------
+
+    hall: deap.tools.HallOfFame
+      A Hall Of Fame of individuals
+
+    path: str
+      The array store directory
+  """
+  n_features = len(hall[0]) if len(hall) else 0
+  selected = np.zeros((len(hall), n_features), dtype=bool)
+  fitness = np.zeros((len(hall), len(hall[0].fitness.values) if len(hall) else 0))
+
+  attributes = []
+  pickled = []
+  eci = []
+  has_eci = np.zeros(len(hall), dtype=bool)
+  for i, indiv in enumerate(hall):
+    selected[i] = casm.learn.tools.to_array(indiv)
+    fitness[i] = indiv.fitness.values
+    attr = dict()
+    obj = dict()
+    for key, value in six.iteritems(indiv.__dict__):
+      if key == "fitness":
+        continue
+      elif key == "id" and isinstance(value, uuid.UUID):
+        attr["id"] = str(value)
+      elif key == "eci":
+        has_eci[i] = True
+        eci.append(casm.learn.tools.SparseECI.from_pairs(value))
+      else:
+        s = _as_json(value)
+        if s is None:
+          obj[key] = value
+        else:
+          attr[key] = json.loads(s)
+    attributes.append(attr)
+    pickled.append(obj)
+
+  metadata = {
+    "type": "HallOfFame",
+    "version": 1,
+    "maxsize": hall.maxsize,
+    "individuals": attributes}
+  objects = dict()
+  if any(len(obj) for obj in pickled):
+    objects["individuals"] = pickled
+  if isinstance(hall.similar, casm.learn.EqualIndividual):
+    metadata["rel_tol"] = hall.similar.rel_tol
+  else:
+    objects["similar"] = hall.similar
+
+  arrays = {
+    "selected": selected,
+    "fitness": fitness,
+    "has_eci": has_eci,
+    "eci_index": np.concatenate([x.index for x in eci] + [np.zeros(0, dtype=int)]),
+    "eci_value": np.concatenate([x.value for x in eci] + [np.zeros(0)]),
+    "eci_offsets": np.cumsum([0] + [len(x) for x in eci])}
+
+  write_store(path, metadata, arrays, objects=objects)
+
+
+def read_halloffame(path):
+  """
+  Read a deap.tools.HallOfFame of individuals from an array store
+
+  Arguments
+  ---------
+
+    path: str
+      The array store directory
+
+  Returns
+  -------
+
+    hall: deap.tools.HallOfFame
+      A Hall Of Fame of individuals, in the stored order
+  """
+  store = Store(path, mmap_mode=None)
+  if store.metadata.get("type") != "HallOfFame":
+    raise Exception("Error reading HallOfFame: '" + path + "' does not store a HallOfFame")
+
+  objects = store.objects()
+  if "similar" in objects:
+    hall = HallOfFame(store.metadata["maxsize"], similar=objects["similar"])
+  else:
+    hall = casm.learn.create_halloffame(store.metadata["maxsize"], rel_tol=store.metadata["rel_tol"])
+
+  selected = store.array("selected").tolist()
+  fitness = store.array("fitness").tolist()
+  pickled = objects.get("individuals", [dict()]*len(selected))
+
+  has_eci = store.array("has_eci")
+  eci_index = store.array("eci_index")
+  eci_value = store.array("eci_value")
+  offsets = store.array("eci_offsets")
+  eci = iter([casm.learn.tools.SparseECI(eci_index[b:e], eci_value[b:e])
+              for b, e in zip(offsets[:-1], offsets[1:])])
+
+  for i, attr in enumerate(store.metadata["individuals"]):
+    indiv = casm.learn.creator.Individual(selected[i])
+    indiv.fitness.values = tuple(fitness[i])
+    for key, value in six.iteritems(attr):
+      if key == "id":
+        value = uuid.UUID(value)
+      setattr(indiv, key, value)
+    if has_eci[i]:
+      indiv.eci = next(eci)
+    for key, value in six.iteritems(pickled[i]):
+      setattr(indiv, key, value)
+    hall.items.append(indiv)
+
+  # keys are ordered least to most fit, as by HallOfFame.insert
+  hall.keys = [indiv.fitness for indiv in reversed(hall.items)]
+  return hall
+
+
+def convert(filename, path=None, verbose=False):
+  """
+  Convert a pickled casm.learn.FittingData or deap.tools.HallOfFame to an
+  array store
+
+  Arguments
+  ---------
+
+    filename: str
+      The pickle file
+
+    path: str, optional, default=store_filename(filename)
+      The array store directory to write
+
+    verbose: boolean, optional, default=False
+      Print information to stdout.
+
+  Returns
+  -------
+
+    path: str
+      The array store directory written
+  """
+  if path is None:
+    path = store_filename(filename)
+  with open(filename, 'rb') as f:
+    obj = pickle.load(f)
+  if isinstance(obj, casm.learn.FittingData):
+    write_fitting_data(obj, path)
+  elif isinstance(obj, HallOfFame):
+    write_halloffame(obj, path)
+  else:
+    raise Exception("Error converting '" + filename + "': it contains neither FittingData nor a HallOfFame")
+  if verbose:
+    print("Converted", filename, "to", path)
+  return path
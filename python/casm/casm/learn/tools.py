@@ -3,10 +3,86 @@ from builtins import *
 
 import numpy as np
 import random
+import re
+
+class SparseECI(object):
+  """
+  Sparse ECI, as arrays of basis function indices and values
+
+  Iterating yields (index, value) tuples, and indexing returns an (index,
+  value) tuple, so SparseECI may be used where a list of tuple is expected.
+
+  Attributes
+  ----------
+
+    index: numpy.ndarray of int of shape (n_eci,)
+      Linear indices of basis functions with non-zero coefficients
+
+    value: numpy.ndarray of float of shape (n_eci,)
+      The ECI values
+
+  """
+
+  def __init__(self, index=(), value=()):
+    """
+    Arguments
+    ---------
+
+      index: array-like of int of shape (n_eci,), optional, default=()
+        Linear indices of basis functions with non-zero coefficients
+
+      value: array-like of float of shape (n_eci,), optional, default=()
+        The ECI values
+
+    """
+    self.index = np.array(index, dtype=int).ravel()
+    self.value = np.array(value, dtype=float).ravel()
+    if self.index.shape != self.value.shape:
+      raise Exception("Error constructing SparseECI: index and value sizes differ")
+
+  @staticmethod
+  def from_pairs(eci):
+    """Construct SparseECI from List[(index, value)]"""
+    if isinstance(eci, SparseECI):
+      return eci
+    eci = list(eci)
+    return SparseECI([x[0] for x in eci], [x[1] for x in eci])
+
+  def to_dense(self, n_features):
+    """Returns the ECI as a numpy.ndarray of shape (n_features,)"""
+    dense = np.zeros(n_features)
+    dense[self.index] = self.value
+    return dense
+
+  def __len__(self):
+    return self.index.size
+
+  def __iter__(self):
+    return iter(zip(self.index.tolist(), self.value.tolist()))
+
+  def __getitem__(self, i):
+    if isinstance(i, slice):
+      return SparseECI(self.index[i], self.value[i])
+    return (int(self.index[i]), float(self.value[i]))
+
+  def __eq__(self, other):
+    if isinstance(other, SparseECI):
+      return np.array_equal(self.index, other.index) and np.array_equal(self.value, other.value)
+    try:
+      return list(self) == [tuple(x) for x in other]
+    except TypeError:
+      return False
+
+  def __ne__(self, other):
+    return not self.__eq__(other)
+
+  def __repr__(self):
+    return "SparseECI(index=" + repr(self.index.tolist()) + ", value=" + repr(self.value.tolist()) + ")"
+
 
 def eci(individual, coef):
   """ 
-  Return ECI as list of tuple containing (index, coef).
+  Return ECI as SparseECI.
   
   Arguments
   ---------
@@ -22,14 +98,40 @@ def eci(individual, coef):
   Returns
   -------
     
-    eci: List[(int, float)]
-      A list of tuple containing the basis function index and coefficient value
-      for basis functions with non-zero coefficients: [(index, coef), ...]
+    eci: SparseECI
+      The basis function indices and coefficient values for basis functions
+      with non-zero coefficients. Iterating yields (index, coef) tuples.
+  
+  """
+  return SparseECI(indices(individual), coef)
+  
   
+def X_columns(columns, X_name):
   """
-  return list(zip(indices(individual), list(coef)))
+  Returns the positions of the 'X_name(i)' columns, i.e. the "corr(i)" columns
+  of 'casm query' output, matching each column name against one compiled pattern
   
+  Arguments
+  ---------
+    
+    columns: List[str]
+      Column names, i.e. 'data.columns' for a pandas.DataFrame
+    
+    X_name: str
+      The name of the X columns
+  
+  
+  Returns
+  -------
+    
+    index: List[int]
+      The positions of the 'X_name(i)' columns, in order
   
+  """
+  pattern = re.compile(X_name + "\([0-9]*\)")
+  return [i for i, col in enumerate(columns) if pattern.match(col)]
+
+
 def indices(individual):
   """ 
   Convert list of bool to list of indices of True values.
@@ -49,7 +151,50 @@ def indices(individual):
       List of indices of True values.
   
   """
-  return [i for i in range(len(individual)) if individual[i] ]
+  return np.flatnonzero(to_array(individual)).tolist()
+
+
+def to_array(individual):
+  """ 
+  Convert an individual to a numpy array of bool.
+  
+  Arguments
+  ---------
+    
+    individual: List[bool] of length n_features
+      This is a boolean list of shape [n_features], in which an element is True 
+      iff its corresponding feature is selected for retention.
+    
+  
+  Returns
+  -------
+    
+    bits: np.array of bool of shape (n_features,)
+      A new array, which may be modified without modifying individual.
+  
+  """
+  return np.array(individual, dtype=bool)
+
+
+def population_array(pop):
+  """ 
+  Convert a population to a 2d numpy array of bool.
+  
+  Arguments
+  ---------
+    
+    pop: List-like of List[bool] of length n_features
+      A population, a list-like container of individuals.
+    
+  
+  Returns
+  -------
+    
+    bits: np.array of bool of shape (len(pop), n_features)
+      Row i holds the features selected by pop[i].
+  
+  """
+  return np.array([list(indiv) for indiv in pop], dtype=bool)
 
 
 def wHullDist(hull_dist, A=1.0, B=1.0, kT=1.0, **kwargs):
@@ -75,7 +220,111 @@ def wEref(y, A=1.0, B=1.0, kT=1.0, E0=0.0):
   w[list(np.where(y < E0)[0])] = 1.0
   return w
 
-def set_sample_weight(sample_weight, y=None, X=None):
+def sample_weight_factor(sample_weight, n_samples):
+  """
+  Calculate the compact weight factor used to weight data.
+
+  The weight matrix, W, is factored as W = L.transpose() * L, but only the
+  non-zero part of L is stored:
+
+    if W is diagonal (sample_weight is None or 1-dimensional):
+      L = np.sqrt(w), the 1d array of the square roots of the normalized weights,
+      so that weighting data is a scaling of its rows.
+    if sample_weight is 2-dimensional:
+      L = np.linalg.cholesky(W).transpose(), an upper triangular matrix, if W
+      is positive-definite. Otherwise, if W is only positive semi-definite,
+      U, S, V = np.linalg.svd(W) and L = (U * np.sqrt(S)).transpose().
+
+  Arguments
+  ---------
+
+    sample_weight: None, 1d array-like of shape (n_samples,1), or 2d array-like of shape (n_samples, n_samples)
+      Sample weights, as for 'set_sample_weight'.
+
+    n_samples: int
+      The number of samples, used if sample_weight is None.
+
+  Returns
+  -------
+
+    L: array-like of shape (n_samples,) or (n_samples, n_samples)
+      The compact weight factor.
+
+  """
+  if sample_weight is None or len(sample_weight) == 0:
+    return np.ones(n_samples)
+
+  sample_weight = np.asarray(sample_weight, dtype=float)
+  n_samples = sample_weight.shape[0]
+  if len(sample_weight.shape) == 1:
+    return np.sqrt(sample_weight*n_samples/np.sum(sample_weight))
+  elif len(sample_weight.shape) == 2:
+    W = sample_weight*n_samples/np.sum(sample_weight)
+    try:
+      return np.linalg.cholesky(W).transpose()
+    except np.linalg.LinAlgError:
+      U, S, V = np.linalg.svd(W)
+      return U.dot(np.diag(np.sqrt(S))).transpose()
+  else:
+    raise Exception("Error in sample_weight_factor: sample_weight dimension > 2")
+
+
+def apply_sample_weight(L, A):
+  """
+  Returns weighted data, L*A, using the compact weight factor L.
+
+  Arguments
+  ---------
+
+    L: array-like of shape (n_samples,) or (n_samples, n_samples)
+      The compact weight factor, as returned by 'sample_weight_factor'.
+
+    A: array-like of shape (n_samples,) or (n_samples, n_features)
+      The data to be weighted.
+
+  Returns
+  -------
+
+    weighted_A: array-like of the same shape as A
+      The weighted data, L*A.
+
+  """
+  A = np.asarray(A)
+  if len(L.shape) == 1:
+    if len(A.shape) == 1:
+      return L*A
+    return A*L[:,np.newaxis]
+  return np.dot(L, A)
+
+
+def weight_matrices(L):
+  """
+  Returns the full (n_samples, n_samples) matrices (W, L) for a compact weight
+  factor, W = L.transpose() * L.
+
+  Arguments
+  ---------
+
+    L: array-like of shape (n_samples,) or (n_samples, n_samples)
+      The compact weight factor, as returned by 'sample_weight_factor'.
+
+  Returns
+  -------
+
+    (W, L)
+
+    W: array-like of shape: (n_samples, n_samples)
+      Contains sample weights.
+
+    L: array-like of shape: (n_samples, n_samples)
+      Used to generate weighted data, W = L.transpose() * L.
+  """
+  if len(L.shape) == 1:
+    return (np.diag(L*L), np.diag(L))
+  return (np.dot(L.transpose(), L), L)
+
+
+def set_sample_weight(sample_weight, y=None, X=None, return_matrices=False):
   """ 
   Calculate weighted data and weighted target values.
   
@@ -89,11 +338,8 @@ def set_sample_weight(sample_weight, y=None, X=None):
   Weighted least squares minimizes
     (y-X*b).transpose() * W * (y-X*b)
   
-  Using the SVD, and given that W is Hermitian:
-    U * S * U.transpose() == W
-  
-  Define L such that:
-    L.transpose() = U * sqrt(S)
+  Given that W is Hermitian, positive-definite, define L such that:
+    L.transpose() * L == W
   
   Then we can write the weighted least squares problem using:
     (y-X*b).transpose() * L.transpose() * L * (y-X*b)
@@ -103,6 +349,10 @@ def set_sample_weight(sample_weight, y=None, X=None):
     
   So, if weights are included, then the linear model is changed from
     X*b = y  ->  L*X*b = L*y
+  
+  If W is diagonal, L = diag(sqrt(w)) and weighting is a scaling of rows, so 
+  the (n_samples, n_samples) matrices W and L are not constructed. Otherwise,
+  L is obtained from the Cholesky decomposition of W.
     
     
   Arguments
@@ -124,6 +374,9 @@ def set_sample_weight(sample_weight, y=None, X=None):
     y: array-like of shape: (n_samples, 1), optional
       The target values (property values).
     
+    return_matrices: bool, optional, default=False
+      If True, also return the full matrices W and L.
+    
   Returns
   -------
     
@@ -135,11 +388,12 @@ def set_sample_weight(sample_weight, y=None, X=None):
     weighted_X: None, or array-like of shape: (n_samples, n_features)
       If X given as input, the weighted training input data, weighted_X = L*x.
     
-    W: array-like of shape: (n_samples, n_samples)
-      Contains sample weights. 
+    W: None, or array-like of shape: (n_samples, n_samples)
+      If return_matrices, contains sample weights. 
     
-    L: array-like of shape: (n_samples, n_samples)
-      Used to generate weighted_X and weighted_y, W = L * L.transpose(). 
+    L: None, or array-like of shape: (n_samples, n_samples)
+      If return_matrices, used to generate weighted_X and weighted_y, 
+      W = L.transpose() * L. 
     
       
   Notes
@@ -147,31 +401,21 @@ def set_sample_weight(sample_weight, y=None, X=None):
     
   Returns (weighted_y, weighted_X, W, L) 
   """
-  # check sample_weight and convert to square matrix
   W = None
   L = None
   weighted_y = None
   weighted_X = None
   
-  if sample_weight is None:
-    W = np.identity(y.shape[0])
-  elif len(sample_weight.shape) == 1:
-    n_samples = len(sample_weight)
-    W = np.diag(sample_weight)*n_samples/np.sum(sample_weight)
-  elif len(sample_weight.shape) == 2:
-    n_samples = len(sample_weight)
-    W = sample_weight*n_samples/np.sum(sample_weight)
-  else:
-    raise Exception("Error in set_sample_weight: sample_weight dimension > 2")
-  
-  # weighted data
-  U, S, V = np.linalg.svd(W)
-  L = U.dot(np.diag(np.sqrt(S))).transpose()
+  n_samples = y.shape[0] if y is not None else (X.shape[0] if X is not None else None)
+  factor = sample_weight_factor(sample_weight, n_samples)
   
   if X is not None:
-    weighted_X = np.dot(L, X)
+    weighted_X = apply_sample_weight(factor, X)
   
   if y is not None:
-    weighted_y = np.dot(L, y)
+    weighted_y = apply_sample_weight(factor, y)
+  
+  if return_matrices:
+    W, L = weight_matrices(factor)
   
   return (weighted_y, weighted_X, W, L)
@@ -1,5 +1,5 @@
 import json
-import six
+import re
 import uuid
 
 # ---------------------------------------------------
@@ -30,7 +30,6 @@ class NoIndentEncoder(json.JSONEncoder):
 
     def encode(self, o):
         result = super(NoIndentEncoder, self).encode(o)
-        for k, v in six.iteritems(self._replacement_map):
-            result = result.replace('"@@%s@@"' % (k,), v)
-        return result
+        # replace all placeholders in one pass
+        return re.sub('"@@([0-9a-f]{32})@@"', lambda m: self._replacement_map[m.group(1)], result)
 # ---------------------------------------------------
@@ -1,8 +1,9 @@
 """An interface to CASM projects via Python"""
 from casm.project.project import project_path, ClexDescription, ProjectSettings, \
     DirectoryStructure, Project, Prim
-from casm.project.selection import Selection
-from casm.project.query import query
+from casm.project.selection import Selection, read_selection, write_selection
+from casm.project.query import query, iter_query
+from casm.project.cache import QueryCache
 from casm.project.io import write_eci
 __all__ = [
   'project_path',
@@ -12,6 +13,10 @@ __all__ = [
   'Project',
   'Prim',
   'Selection',
+  'read_selection',
+  'write_selection',
   'query',
+  'iter_query',
+  'QueryCache',
   'write_eci'
 ]
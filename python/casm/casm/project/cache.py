@@ -0,0 +1,190 @@
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+from builtins import *
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+
+import six
+
+class QueryCache(object):
+    """
+    A persistent on-disk cache of 'casm query' results
+
+    Query results are stored in the '.casm/query_cache' directory, one pickled
+    pandas.DataFrame per queried property, keyed by the property, the selection,
+    and the 'all' option. The MASTER, ALL, and CALCULATED selections are keyed by
+    name, and selection files by their contents. Entries are stored in a
+    subdirectory named by a fingerprint of the project files that query results
+    depend on, so they are invalidated automatically when any of those files
+    change.
+
+    Calculated properties are read from 'config_list.json', so changes to
+    'properties.calc.json' files are picked up after 'casm update'.
+
+    Attributes
+    ----------
+
+      proj: casm.project.Project
+        the CASM project the cache belongs to
+
+      path: str
+        path to the query cache directory
+
+    """
+    def __init__(self, proj):
+        """
+        Construct a QueryCache
+
+        Arguments
+        ---------
+
+          proj: casm.project.Project
+            the CASM project the cache belongs to
+
+        """
+        self.proj = proj
+        self.path = os.path.join(proj.dir.casm_dir(), "query_cache")
+
+
+    def project_files(self):
+        """
+        Returns a list of paths to the project files that query results depend on
+        """
+        dir = self.proj.dir
+        files = [dir.project_settings(), dir.config_list(), dir.composition_axes()]
+        for clex in self.proj.settings.cluster_expansions:
+          files += [dir.basis(clex), dir.eci(clex), dir.chemical_reference(clex)]
+        return files
+
+
+    def fingerprint(self):
+        """
+        Returns a hash of the path, modification time, and size of each of
+        self.project_files()
+        """
+        return _hash([_file_state(f) for f in self.project_files()])
+
+
+    def get(self, fingerprint, column, selection, all):
+        """
+        Get cached query results
+
+        Arguments
+        ---------
+
+          fingerprint: str
+            the value of self.fingerprint()
+
+          column: str
+            a 'casm query -k' arg
+
+          selection: casm.project.Selection
+            the queried selection
+
+          all: bool
+            the 'casm query --all' option
+
+        Returns
+        -------
+
+          data: pandas.DataFrame or None
+            the cached query results, or None if not found
+        """
+        filepath = self._entry_path(fingerprint, column, selection, all)
+        if not os.path.exists(filepath):
+          return None
+        try:
+          with open(filepath, 'rb') as f:
+            return pickle.load(f)
+        except Exception:
+          # treat unreadable entries, i.e. from an interrupted write, as missing
+          return None
+
+
+    def set(self, fingerprint, column, selection, all, data):
+        """
+        Store query results, and remove entries for any other fingerprint
+
+        Arguments
+        ---------
+
+          fingerprint: str
+            the value of self.fingerprint() before the query was performed
+
+          column: str
+            a 'casm query -k' arg
+
+          selection: casm.project.Selection
+            the queried selection
+
+          all: bool
+            the 'casm query --all' option
+
+          data: pandas.DataFrame
+            the query results
+        """
+        if os.path.exists(self.path):
+          for item in os.listdir(self.path):
+            if item != fingerprint:
+              shutil.rmtree(os.path.join(self.path, item), ignore_errors=True)
+
+        filepath = self._entry_path(fingerprint, column, selection, all)
+        if not os.path.exists(os.path.dirname(filepath)):
+          os.makedirs(os.path.dirname(filepath))
+
+        backup = filepath + ".tmp." + str(os.getpid()) + "." + str(threading.current_thread().ident)
+        with open(backup, 'wb') as f:
+          pickle.dump(data, f, protocol=2)
+        os.rename(backup, filepath)
+
+
+    def clear(self):
+        """
+        Remove all cached query results
+        """
+        if os.path.exists(self.path):
+          shutil.rmtree(self.path)
+
+
+    def _entry_path(self, fingerprint, column, selection, all):
+        if selection.path in ["MASTER", "ALL", "CALCULATED"]:
+          # selection state is stored in config_list.json
+          sel_state = [selection.path]
+        else:
+          # file selections are keyed by contents, not modification time, which
+          # may not change when a file is rewritten within the timestamp
+          # resolution (i.e. the temporary selection files used by 'iter_query')
+          sel_state = _file_digest(selection.path)
+        key = _hash([column, sel_state, bool(all)])
+        return os.path.join(self.path, fingerprint, key + ".pkl")
+
+
+def _file_state(path):
+    """Returns [path, mtime, size], or [path, None, None] if path does not exist"""
+    try:
+      st = os.stat(path)
+      return [path, st.st_mtime, st.st_size]
+    except OSError:
+      return [path, None, None]
+
+
+def _file_digest(path):
+    """Returns the sha1 hexdigest of the contents of path, or None if path does not exist"""
+    h = hashlib.sha1()
+    try:
+      with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(2**20), b''):
+          h.update(block)
+    except (OSError, IOError):
+      return None
+    return h.hexdigest()
+
+
+def _hash(obj):
+    """Returns the sha1 hexdigest of a JSON serializable object"""
+    s = six.u(json.dumps(obj, sort_keys=True))
+    return hashlib.sha1(s.encode('utf-8')).hexdigest()
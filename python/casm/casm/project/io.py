@@ -3,67 +3,129 @@ from __future__ import (absolute_import, division, print_function, unicode_liter
 from builtins import *
 
 import json
+import os
 import six
 from casm.misc import compat, noindent
 
+def _eci_dict(eci):
+    """
+    Returns a dict of basis function index: ECI value
+
+    Accepts an object with 'index' and 'value' arrays (i.e.
+    casm.learn.tools.SparseECI), or an iterable of (index, value).
+    """
+    if hasattr(eci, "index") and hasattr(eci, "value"):
+      return dict(zip(eci.index.tolist(), eci.value.tolist()))
+    return dict((index, value) for index, value in eci)
+
+
+def _site_function(entry):
+    """Returns a copy of a 'site_functions' entry, decorated for pretty printing"""
+    entry = dict(entry)
+    if entry["basis"] != None:
+      entry["basis"] = dict((key, noindent.NoIndent(val)) for key, val in entry["basis"].items())
+    return entry
+
+
+def _cluster_function(entry, value):
+    """Returns a copy of a 'cluster_functions' entry, with 'eci' if value is
+    not None, decorated for pretty printing"""
+    entry = dict(entry)
+    if value is not None:
+      entry["eci"] = value
+    entry["orbit"] = noindent.NoIndent(entry["orbit"])
+    entry["prototype"] = dict(entry["prototype"])
+    entry["prototype"]["sites"] = [noindent.NoIndent(site) for site in entry["prototype"]["sites"]]
+    return entry
+
+
+def _dumps(value, indent):
+    """json.dumps(value, indent=2), with NoIndent values on one line, and
+    subsequent lines indented by 'indent' spaces"""
+    s = json.dumps(value, indent=2, cls=noindent.NoIndentEncoder)
+    return s.replace("\n", "\n" + " "*indent)
+
+
+def _write(f, s):
+    f.write(six.u(s).encode('utf-8'))
+
+
+def _write_list(f, entries, size):
+    """Write a list value of a top-level object as json.dumps(indent=2) would,
+    one entry at a time, given an iterable of the 'size' entries"""
+    if size == 0:
+      _write(f, "[]")
+      return
+    _write(f, "[\n")
+    for i, entry in enumerate(entries):
+      _write(f, "    " + _dumps(entry, 4) + (",\n" if i + 1 < size else "\n"))
+    _write(f, "  ]")
+
+
 def write_eci(proj, eci, fit_details=None, clex=None, verbose=False):
     """
     Write eci.json
-    
+
+    The output is identical to writing basis.json, with "eci" added to each
+    cluster function with a non-zero ECI and "fit" added, using json.dumps
+    with indent=2 and lists of orbits, sites and site basis function values on
+    one line. It is streamed one entry at a time, rather than serializing a
+    decorated copy of the entire basis.json, and written to a temporary file
+    which then replaces eci.json.
+
     Arguments
     ---------
-    
+
       proj: casm.project.Project instance
         The CASM project
-      
-      eci: List[(index, value)]
+
+      eci: casm.learn.tools.SparseECI, or List[(index, value)]
         index (int): linear index of basis function
         value (float): ECI value
 
       fit_details: Dict
         Description of the fitting method used to generate the ECI,
         usually as output by casm.learn.to_json
-      
+
       clex: ClexDescription instance, optional, default=proj.settings.default_clex
         Specifies where to write the ECI
-    
+
     """
     dir = proj.dir
     if clex is None:
       clex = proj.settings.default_clex
-    
+
     # read basis.json
     filename = dir.basis(clex)
     with open(filename, 'rb') as f:
         j = json.loads(f.read().decode('utf-8'))
-    #print(json.dumps(j, indent=2))
-    
+
     # edit to add fitting settings
     j["fit"] = fit_details
-    
-    # edit to add eci
-    for index, value in eci:
-      j["cluster_functions"][index]["eci"] = value
-    
-    # pretty printing
-    for entry in j["site_functions"]:
-      if entry["basis"] != None:
-        basis = entry["basis"]
-        for key, val in basis.items():
-          basis[key] = noindent.NoIndent(val)
-    for entry in j["cluster_functions"]:
-      entry["orbit"] = noindent.NoIndent(entry["orbit"])
-      sites = entry["prototype"]["sites"]
-      for i in range(len(sites)):
-        sites[i] = noindent.NoIndent(sites[i])
-    
+
+    # ECI values by basis function index
+    values = _eci_dict(eci)
+    if len(values) and max(values) >= len(j["cluster_functions"]):
+      raise Exception("Error writing eci.json: ECI index out of range of basis.json")
+
     # write eci.json
     filename = dir.eci(clex)
-    
+
     if verbose:
       print("Writing:", filename, "\n")
-    with open(filename, 'wb') as f:
-      f.write(six.u(json.dumps(j, indent=2, cls=noindent.NoIndentEncoder)).encode('utf-8'))
-    
+    tmp = filename + ".tmp"
+    with open(tmp, 'wb') as f:
+      _write(f, "{")
+      for i, (key, value) in enumerate(j.items()):
+        _write(f, ("," if i else "") + "\n  " + json.dumps(key) + ": ")
+        if key == "site_functions":
+          _write_list(f, (_site_function(entry) for entry in value), len(value))
+        elif key == "cluster_functions":
+          _write_list(f, (_cluster_function(entry, values.get(index)) for index, entry in enumerate(value)), len(value))
+        else:
+          _write(f, _dumps(value, 2))
+      _write(f, "\n}")
+    os.rename(tmp, filename)
+
     # refresh proj to reflect new eci
     proj.refresh(clear_clex=True)
@@ -4,6 +4,8 @@ from builtins import *
 import json
 import os
 import math
+import threading
+import time
 import warnings
 from os.path import join
 from string import ascii_lowercase
@@ -12,6 +14,7 @@ import numpy as np
 import six
 
 from casm.project import syminfo
+from casm.project.cache import QueryCache
 from casm.api import API, casm_command, casm_capture
 
 def project_path(dir=None):
@@ -129,8 +132,15 @@ class ProjectSettings(object):
         return self._formation_energy_clex
 
 
+# when the settings index is refreshed, a directory listing is repeated if the
+# directory was modified less than this long (in s) before it was listed, so
+# that files created within the filesystem's modification time resolution are
+# not missed
+SETTINGS_INDEX_MTIME_RESOLUTION = 2.0
+
 class DirectoryStructure(object):
     """Standard file and directory locations for a CASM project"""
+
     def __init__(self, path=None):
         """
         Construct a CASM Project DirectoryStructure representation.
@@ -152,6 +162,10 @@ class DirectoryStructure(object):
         self.__sym_dir = "symmetry"
         self.__clex_dir = "cluster_expansions"
 
+        # settings directory path -> (time listed, frozenset of file names, or
+        # None if the directory does not exist), see settings_files
+        self.__settings_index = dict()
+
 
     # ** Query filesystem **
 
@@ -212,7 +226,7 @@ class DirectoryStructure(object):
 
     def symmetry_dir(self):
       """Return symmetry directory path"""
-      return join(self.path, self.sym_dir)
+      return join(self.path, self.__sym_dir)
 
     def lattice_point_group(self):
       """Return lattice_point_group.json path"""
@@ -297,21 +311,74 @@ class DirectoryStructure(object):
             directories, or None if not found.
 
         """
-        filepath = join(self.configuration_calc_settings_dir(configname, clex), filename)
-        if os.path.exists(filepath):
-          return filepath
-
         scelname = configname.split('/')[0]
-        filepath = join(self.supercell_calc_settings_dir(scelname, clex), filename)
-        if os.path.exists(filepath):
-          return filepath
-
-        filepath = join(self.calc_settings_dir(clex), filename)
-        if os.path.exists(filepath):
-          return filepath
+        for dirpath in [
+            self.configuration_calc_settings_dir(configname, clex),
+            self.supercell_calc_settings_dir(scelname, clex),
+            self.calc_settings_dir(clex)]:
+          if os.sep in filename:
+            if os.path.exists(join(dirpath, filename)):
+              return join(dirpath, filename)
+          elif filename in self.settings_files(dirpath):
+            return join(dirpath, filename)
 
         return None
 
+    def settings_files(self, dirpath):
+        """
+        Returns the names of the files in a settings directory
+
+        The calctype settings directories are indexed as settings_path_crawl
+        reaches them: each directory is listed, or found not to exist, once, and
+        then lookups of any file for any configuration only use the index. Use
+        'refresh_settings_index', or construct a new DirectoryStructure, to see
+        settings files added or removed after a directory was indexed.
+
+        Arguments
+        ---------
+          dirpath: str
+            Path to a settings directory
+
+        Returns
+        ---------
+          names: frozenset of str
+            The names of the files in 'dirpath', empty if it does not exist
+
+        """
+        entry = self.__settings_index.get(dirpath)
+        if entry is None:
+          entry = self.__list_settings(dirpath)
+        return entry[1] or frozenset()
+
+    def refresh_settings_index(self):
+        """
+        Revalidate the settings directory index used by settings_path_crawl
+
+        Each indexed directory is checked once, and listed again only if it was
+        created, removed, or modified since it was listed, or was modified
+        within SETTINGS_INDEX_MTIME_RESOLUTION before it was listed.
+        """
+        for dirpath, (listed, names) in list(self.__settings_index.items()):
+          try:
+            mtime = os.stat(dirpath).st_mtime
+          except OSError:
+            mtime = None
+          if mtime is None and names is None:
+            continue
+          if mtime is None or names is None or mtime > listed - SETTINGS_INDEX_MTIME_RESOLUTION:
+            self.__list_settings(dirpath)
+
+    def __list_settings(self, dirpath):
+        """List a settings directory and store the result in the settings index"""
+        listed = time.time()
+        try:
+          names = frozenset(os.listdir(dirpath))
+        except OSError:
+          names = None
+        entry = (listed, names)
+        self.__settings_index[dirpath] = entry
+        return entry
+
     def supercell_dir(self, scelname):
       """Return supercell directory path (scelname has format SCELV_A_B_C_D_E_F)"""
       return join(self.path, self.__calc_dir, scelname)
@@ -347,7 +414,7 @@ class DirectoryStructure(object):
 
     def ref_dir(self, clex):
       """Return calculation reference settings directory path, for global settings"""
-      return join(self.calc_settings_dir(clex.calctype), self.__ref(clex.ref))
+      return join(self.calc_settings_dir(clex), self.__ref(clex.ref))
 
     def composition_axes(self):
       """Return composition axes file path"""
@@ -466,8 +533,19 @@ class Project(object):
       verbose: bool
         How much to print to stdout
 
+      query_cache: casm.project.QueryCache or None
+        If not None, used by casm.project.query to store and re-use query results
+
+      thread_local: bool
+        If True, each thread uses its own CASM::PrimClex
+
+      lock: threading.RLock
+        Guards the CASM::PrimClex returned by 'data()' for the current thread.
+        Must be held while using it directly via casm.api. Project methods
+        acquire it as necessary.
+
     """
-    def __init__(self, path=None, verbose=True):
+    def __init__(self, path=None, verbose=True, query_cache=None, thread_local=False):
       """
       Construct a CASM Project representation.
 
@@ -481,10 +559,28 @@ class Project(object):
         verbose: bool, optional, default=True
           How much to print to stdout
 
+        query_cache: bool, optional, default=None
+          If True, store query results in '.casm/query_cache' and re-use them
+          until the project files they depend on change. Default=None uses
+          the 'CASM_QUERY_CACHE' environment variable, enabled if set to "1".
+
+        thread_local: bool, optional, default=False
+          If False, all threads share one CASM::PrimClex and calls using it are
+          executed one at a time. If True, each thread loads its own
+          CASM::PrimClex, so that calls from different threads, such as
+          independent queries, run concurrently. Because a CASM::PrimClex
+          holds the configuration list in memory, use 'refresh' after
+          modifying the project from another thread.
+
       """
 
-      # will hold a ctypes.c_void_p when loading CASM project into memory
-      self._ptr = None
+      # will hold {"ptr": ctypes.c_void_p, "lock": threading.RLock} for each
+      # CASM::PrimClex loaded into memory, either one shared or one per thread
+      self.thread_local = thread_local
+      self._sessions = []
+      self._shared_session = None
+      self._local = threading.local()
+      self._sessions_lock = threading.RLock()
 
       # will keep a casm.API instance
       self._api = None
@@ -498,8 +594,15 @@ class Project(object):
 
       self.path = project_path(path)
       self.__refresh()
+      self._prim = None
       self.verbose = verbose
 
+      if query_cache is None:
+        query_cache = (os.environ.get('CASM_QUERY_CACHE', '0') == '1')
+      self.query_cache = None
+      if query_cache:
+        self.query_cache = QueryCache(self)
+
       self.all_composition_axes = {}
       if os.path.exists(self.dir.composition_axes()):
           with open(self.dir.composition_axes(), 'r') as f:
@@ -521,9 +624,25 @@ class Project(object):
 
     def __load(self):
       """
-      Explicitly load CASM project into memory.
+      Explicitly load CASM project into memory, for the current thread if
+      self.thread_local.
+
+      Returns
+      -------
+        session: dict
+          {"ptr": ctypes.c_void_p, "lock": threading.RLock}
       """
-      if self._ptr is None:
+      if self.thread_local:
+        session = getattr(self._local, 'session', None)
+      else:
+        session = self._shared_session
+      if session is not None:
+        return session
+
+      with self._sessions_lock:
+        if not self.thread_local and self._shared_session is not None:
+          return self._shared_session
+
         self._api = API()
         if self.verbose:
           streamptr = self._api.stdout()
@@ -535,16 +654,29 @@ class Project(object):
         else:
           errstreamptr = self._api.nullstream()
 
-        self._ptr = self._api.primclex_new(self.path, streamptr, streamptr, errstreamptr)
+        session = {
+          "ptr": self._api.primclex_new(self.path, streamptr, streamptr, errstreamptr),
+          "lock": threading.RLock()}
+        self._sessions.append(session)
+        if self.thread_local:
+          self._local.session = session
+          self._local.release = _ThreadSession(self._api, session, self._sessions, self._sessions_lock)
+        else:
+          self._shared_session = session
+        return session
 
 
     def __unload(self):
       """
-      Explicitly unload CASM project from memory.
+      Explicitly unload CASM project from memory, for all threads.
       """
-      if self._ptr is not None:
-        self._api.primclex_delete(self._ptr)
-        self._ptr = None
+      with self._sessions_lock:
+        for session in self._sessions:
+          with session["lock"]:
+            self._api.primclex_delete(session["ptr"])
+        del self._sessions[:]
+        self._shared_session = None
+        self._local = threading.local()
 
 
     def __refresh(self):
@@ -556,7 +688,6 @@ class Project(object):
       """
       self.dir = DirectoryStructure(self.path)
       self.settings = ProjectSettings(self.path)
-      self._prim = None
 
     @property
     def prim(self):
@@ -568,28 +699,40 @@ class Project(object):
     def name(self):
         return self.settings.data['name']
 
+    @property
+    def lock(self):
+        return self.__load()["lock"]
+
     def refresh(self, read_settings=False, read_composition=False, read_chem_ref=False, read_configs=False, clear_clex=False):
       """
       Refresh PrimClex properties to reflect changes to CASM project files.
+
+      The Prim is also reconstructed, if read_settings or read_composition.
       """
       if read_settings:
         self.__refresh()
-      if self._ptr is not None:
-        self._api.primclex_refresh(
-          self.data(),
-          read_settings,
-          read_composition,
-          read_chem_ref,
-          read_configs,
-          clear_clex)
+      if read_settings or read_composition:
+        self._prim = None
+      with self._sessions_lock:
+        sessions = list(self._sessions)
+      for session in sessions:
+        with session["lock"]:
+          self._api.primclex_refresh(
+            session["ptr"],
+            read_settings,
+            read_composition,
+            read_chem_ref,
+            read_configs,
+            clear_clex)
 
 
     def data(self):
       """
       Returns a 'ctypes.c_void_p' that points to a CASM project. (PrimClex)
+
+      Hold 'self.lock' while using it.
       """
-      self.__load()
-      return self._ptr
+      return self.__load()["ptr"]
 
 
     def command(self, args):
@@ -606,8 +749,9 @@ class Project(object):
 
       """
       # this also ensures self._api is not None
-      data = self.data()
-      returncode = self._api.capi_call(args, self.data())
+      session = self.__load()
+      with session["lock"]:
+        returncode = self._api.capi_call(args, session["ptr"])
       self.__refresh()
       return returncode
 
@@ -627,34 +771,66 @@ class Project(object):
 
       """
       # this also ensures self._api is not None
-      data = self.data()
+      session = self.__load()
 
-      # construct stringstream objects to capture stdout, debug, stderr
-      ss = self._api.ostringstream_new()
-      if combine_output:
-          ss_debug = ss
-          ss_err = ss
-      else:
-          ss_debug = self._api.ostringstream_new()
-          ss_err = self._api.ostringstream_new()
+      # output is captured with per-call log streams, which the PrimClex logs
+      # to while the lock is held, so other threads' calls are not affected
+      with session["lock"]:
+        res = self._api.capi_capture(args, session["ptr"], self.path, combine_output)
+
+      self.__refresh()
+      return res
 
-      self._api.primclex_set_logging(self.data(), ss, ss_debug, ss_err)
-      returncode = self._api.capi_call(args, self.data())
+    def batch(self, stop_on_error=False):
+      """
+      Returns a context manager that queues commands and executes them together
 
-      # copy strings and delete stringstreams
-      stdout = self._api.ostringstream_to_str(ss)
-      self._api.ostringstream_delete(ss)
+      The commands are executed via the c api with one call, when the 'with'
+      block is exited without an exception, and the project settings are
+      refreshed once at the end.
 
-      if combine_output:
-          res = (stdout.decode('utf-8'), returncode)
-      else:
-          stderr = self._api.ostringstream_to_str(ss_err)
-          self._api.ostringstream_delete(ss_err)
+      Example:
+
+        with proj.batch() as b:
+          b.add("select --set-on -o /abspath/to/my_selection")
+          b.add("query -k comp -c /abspath/to/my_selection -o STDOUT")
+        for stdout, stderr, returncode in b.results:
+          ...
+
+      Args:
+        stop_on_error: If True, commands after the first that returns a non-zero
+          returncode are not executed.
+
+      Returns
+      -------
+        batch: a casm.project.project.CommandBatch instance
+
+      """
+      return CommandBatch(self, stop_on_error=stop_on_error)
+
+    def run_batch(self, args_list, stop_on_error=False):
+      """
+      Execute a list of commands via the c api with one call and store each
+      stdout/stderr result as str.
+
+      Args:
+        args_list: A list of strings containing the commands to be executed.
+        stop_on_error: If True, commands after the first that returns a non-zero
+          returncode are not executed.
 
-          res = (stdout.decode('utf-8'), stderr.decode('utf-8'), returncode)
+      Returns
+      -------
+        results: A list of (stdout, stderr, returncode), one for each command
+            executed. 'stdout' and 'stderr' are in text type ('unicode'/'str').
+
+      """
+      if len(args_list) == 0:
+        return []
 
-      # reset logging to write to stdout/stderr
-      self._api.primclex_set_logging(self.data(), self._api.stdout(), self._api.stdout(), self._api.stderr())
+      # this also ensures self._api is not None
+      session = self.__load()
+      with session["lock"]:
+        res = self._api.capi_batch(args_list, session["ptr"], stop_on_error)
 
       self.__refresh()
       return res
@@ -690,6 +866,80 @@ class Project(object):
         return Project(root, verbose=verbose)
 
 
+class _ThreadSession(object):
+    """
+    Frees a thread's CASM::PrimClex when the thread ends
+
+    An instance is held in the thread's Project._local data, which is released
+    when the thread ends or the project is unloaded. It does not reference the
+    Project, so that it does not keep it alive.
+    """
+    def __init__(self, api, session, sessions, sessions_lock):
+        self.api = api
+        self.session = session
+        self.sessions = sessions
+        self.sessions_lock = sessions_lock
+
+    def __del__(self):
+        with self.sessions_lock:
+          index = [i for i, s in enumerate(self.sessions) if s is self.session]
+          if not len(index):
+            # already freed by Project.__unload
+            return
+          del self.sessions[index[0]]
+          with self.session["lock"]:
+            self.api.primclex_delete(self.session["ptr"])
+
+
+class CommandBatch(object):
+    """Commands queued using Project.batch
+
+    Attributes
+    ----------
+
+      proj: casm.project.Project
+        The CASM project the commands are executed for
+
+      args_list: List[str]
+        The queued commands
+
+      stop_on_error: bool
+        If True, commands after the first that returns a non-zero returncode are
+        not executed
+
+      results: List[(stdout, stderr, returncode)] or None
+        The result of each command executed, set when the 'with' block is exited
+
+    """
+    def __init__(self, proj, stop_on_error=False):
+        self.proj = proj
+        self.args_list = []
+        self.stop_on_error = stop_on_error
+        self.results = None
+
+    def add(self, args):
+        """
+        Queue a command
+
+        Args:
+          args: A string containing the command to be executed.
+
+        Returns
+        -------
+          index: The index of the command's result in self.results
+        """
+        self.args_list.append(args)
+        return len(self.args_list) - 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+          self.results = self.proj.run_batch(self.args_list, stop_on_error=self.stop_on_error)
+        return False
+
+
 class Prim(object):
     """The Primitive Crystal Structure
 
@@ -756,6 +1006,9 @@ class Prim(object):
         """
         Construct a CASM Prim
 
+        Attributes are read from prim.json, the symmetry/*.json files, and
+        composition_axes.json when first accessed, and then stored.
+
         Arguments
         ---------
 
@@ -768,14 +1021,37 @@ class Prim(object):
         elif not isinstance(proj, Project):
             raise Exception("Error constructing Prim: proj argument is not a CASM Project")
         self.proj = proj
+        self._cache = dict()
+
+    def _memoize(self, key, f):
+        if key not in self._cache:
+            self._cache[key] = f()
+        return self._cache[key]
 
+    # -- prim.json --
+
+    def _raw_prim(self):
         # raw prim.json (for some properties not yet supported in the API)
-        with open(self.proj.dir.prim()) as f:
-            raw_prim = json.load(f)
-        self.lattice_matrix = np.array(raw_prim['lattice_vectors']).transpose()
-        self.basis = raw_prim['basis']
-        self.coordinate_mode = raw_prim['coordinate_mode']
+        def f():
+            with open(self.proj.dir.prim()) as fin:
+                return json.load(fin)
+        return self._memoize('raw_prim', f)
+
+    @property
+    def lattice_matrix(self):
+        return self._memoize('lattice_matrix',
+            lambda: np.array(self._raw_prim()['lattice_vectors']).transpose())
+
+    @property
+    def basis(self):
+        return self._raw_prim()['basis']
+
+    @property
+    def coordinate_mode(self):
+        return self._raw_prim()['coordinate_mode']
 
+    @property
+    def lattice_parameters(self):
         def _angle(a, b):
             return math.degrees(math.acos(
                 np.dot(a,b) / (np.linalg.norm(a) * np.linalg.norm(b))
@@ -789,30 +1065,88 @@ class Prim(object):
             beta = _angle(L[:,0], L[:,2])
             gamma = _angle(L[:,0], L[:,1])
             return {'a':a, 'b':b, 'c':c, 'alpha':alpha, 'beta':beta, 'gamma':gamma}
-        self.lattice_parameters = _lattice_parameters(self.lattice_matrix)
+        return self._memoize('lattice_parameters',
+            lambda: _lattice_parameters(self.lattice_matrix))
+
+    # -- symmetry --
+
+    def _point_group_names(self):
+        """
+        Returns (lattice point group, crystal point group) in Schoenflies notation
+
+        Read from symmetry/lattice_point_group.json and
+        symmetry/crystal_point_group.json if they exist, otherwise parsed from
+        'casm sym' output, which also writes them.
+        """
+        def f():
+            names = []
+            for path in [self.proj.dir.lattice_point_group(), self.proj.dir.crystal_point_group()]:
+                if not os.path.exists(path):
+                    break
+                with open(path, 'rb') as fin:
+                    names.append(json.loads(fin.read().decode('utf-8')).get('name', None))
+            if len(names) == 2 and None not in names:
+                return tuple(names)
+            (stdout, stderr, returncode) = self.proj.capture("sym")
+            return (syminfo.lattice_symmetry(stdout), syminfo.crystal_symmetry(stdout))
+        return self._memoize('point_group_names', f)
+
+    @property
+    def lattice_symmetry_s(self):
+        return self._point_group_names()[0]
+
+    @property
+    def lattice_symmetry_hm(self):
+        return syminfo.hm_symmetry(self.lattice_symmetry_s)
+
+    @property
+    def lattice_system(self):
+        return syminfo.lattice_system(self.lattice_symmetry_s)
+
+    @property
+    def crystal_symmetry_s(self):
+        return self._point_group_names()[1]
+
+    @property
+    def crystal_symmetry_hm(self):
+        return syminfo.hm_symmetry(self.crystal_symmetry_s)
+
+    @property
+    def crystal_system(self):
+        return syminfo.crystal_system(self.crystal_symmetry_s)
 
-        (stdout, stderr, returncode) = proj.capture("sym")
+    @property
+    def crystal_family(self):
+        return syminfo.crystal_family(self.crystal_symmetry_s)
 
-        # lattice symmetry
-        self.lattice_symmetry_s = syminfo.lattice_symmetry(stdout)
-        self.lattice_symmetry_hm = syminfo.hm_symmetry(self.lattice_symmetry_s)
-        self.lattice_system = syminfo.lattice_system(self.lattice_symmetry_s)
+    @property
+    def space_group_number(self):
+        return syminfo.space_group_number_map[self.crystal_symmetry_s]
 
-        # crystal symmetry
-        self.crystal_symmetry_s = syminfo.crystal_symmetry(stdout)
-        self.crystal_symmetry_hm = syminfo.hm_symmetry(self.crystal_symmetry_s)
-        self.crystal_system = syminfo.crystal_system(self.crystal_symmetry_s)
-        self.crystal_family = syminfo.crystal_family(self.crystal_symmetry_s)
-        self.space_group_number = syminfo.space_group_number_map[self.crystal_symmetry_s]
+    # -- composition --
 
+    def _standard_axes(self):
         # composition (v0.2.X: elements and components are identical, only 'occupation' allowed)
-        with open(self.proj.dir.composition_axes()) as f:
-            raw_composition_axes = json.load(f)
+        def f():
+            with open(self.proj.dir.composition_axes()) as fin:
+                return json.load(fin)['standard_axes']['0']
+        return self._memoize('standard_axes', f)
+
+    @property
+    def components(self):
+        return self._standard_axes()['components']
+
+    @property
+    def elements(self):
+        return self.components
 
-        self.components = raw_composition_axes['standard_axes']['0']['components']
-        self.elements = self.components
-        self.n_independent_compositions = raw_composition_axes['standard_axes']['0']['independent_compositions']
-        self.degrees_of_freedom = ['occupation']
+    @property
+    def n_independent_compositions(self):
+        return self._standard_axes()['independent_compositions']
+
+    @property
+    def degrees_of_freedom(self):
+        return ['occupation']
 
 
 class CompositionAxes(object):
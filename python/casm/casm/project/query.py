@@ -8,6 +8,9 @@ warnings.filterwarnings("ignore", message="numpy.dtype size changed")
 warnings.filterwarnings("ignore", message="numpy.ufunc size changed")
 
 from io import StringIO
+import os
+import tempfile
+import numpy as np
 import pandas
 import six
 import casm
@@ -26,16 +29,44 @@ def query(proj, columns, selection=None, verbatim=True, all=False):
 
      Returns:
        data: a pandas DataFrame containing the query results
+
+     Notes:
+       If all requested properties, other than 'configname', are numeric the
+       results are transferred from libcasm as an array of numbers and no text
+       parsing is necessary. Otherwise, 'casm query' output is parsed.
+
+       If 'proj.query_cache' is not None, each requested property is read from
+       the query cache if possible. Properties that are not cached are queried
+       together, and then stored in the query cache individually.
+  """
+  if proj.query_cache is not None:
+    return _query_cached(proj, columns, selection, verbatim, all)
+  return _query(proj, columns, selection, verbatim, all)
+
+
+def _query(proj, columns, selection=None, verbatim=True, all=False):
+  """
+  Query without using the query cache
+
+  Args:
+       columns: iterable of strings corresponding to 'casm query -k' args
+       selection: a Selection to query (default is "MASTER" selection)
+       verbatim: if True, use 'casm query --verbatim' option (default is True)
+       all: if True, use 'casm query --all' option (default is False)
+
+  Returns:
+       data: a pandas DataFrame containing the query results
   """
+  data = _query_array(proj, columns, selection, verbatim, all)
+  if data is not None:
+    return data
+
   args = _query_args(proj, columns, selection, verbatim, all, api=True)
 
   stdout, stderr, returncode = proj.capture(args)
 
   try:
-    sout = StringIO(stdout)
-    if compat.peek(sout) == '#':
-        sout.read(1)
-    return pandas.read_csv(sout, sep=compat.str(' +'), engine='python')
+    return casm.project.selection.read_selection_text(StringIO(stdout))
   except:
     print("Error in casm.query")
     print("  proj:", proj.path)
@@ -48,6 +79,191 @@ def query(proj, columns, selection=None, verbatim=True, all=False):
     raise
 
 
+def iter_query(proj, columns, selection=None, verbatim=True, all=False, chunksize=10000):
+  """Generate pandas DataFrame objects containing the output of a 'casm query'
+     command for successive chunks of configurations.
+
+     Args:
+       proj: Project to query (default is CASM project containing the current working directory)
+       columns: iterable of strings corresponding to 'casm query -k' args
+       selection: a Selection to query (default is "MASTER" selection)
+       verbatim: if True, use 'casm query --verbatim' option (default is True)
+       all: if True, use 'casm query --all' option (default is False)
+       chunksize: maximum number of configurations queried at once (default is 10000)
+
+     Yields:
+       data: a pandas DataFrame containing the query results for at most
+         'chunksize' configurations, in selection order
+
+     Notes:
+       Each chunk is queried using a temporary selection file written to the
+       '.casm/tmp' directory, so only one chunk of query results is held in
+       memory at a time.
+  """
+  if selection == None:
+    selection = casm.project.Selection(proj)
+  elif not isinstance(selection, casm.project.Selection):
+    raise Exception("Error, argument 'selection' must be None or a Selection")
+  if chunksize < 1:
+    raise Exception("Error, argument 'chunksize' must be >= 1")
+
+  sel_data = selection.data.loc[:,["configname", "selected"]]
+  if not all:
+    sel_data = sel_data[sel_data["selected"] == True]
+
+  tmp_dir = os.path.join(proj.dir.casm_dir(), "tmp")
+  if not os.path.exists(tmp_dir):
+    os.mkdir(tmp_dir)
+  fd, tmp_path = tempfile.mkstemp(prefix="iter_query_", dir=tmp_dir)
+  os.close(fd)
+
+  try:
+    for begin in range(0, sel_data.shape[0], chunksize):
+      chunk_sel = casm.project.Selection(proj, tmp_path, all=all)
+      chunk_sel.save(data=sel_data.iloc[begin:begin+chunksize], force=True)
+      yield query(proj, columns, chunk_sel, verbatim=verbatim, all=all)
+  finally:
+    if os.path.exists(tmp_path):
+      os.remove(tmp_path)
+
+
+def _query_cached(proj, columns, selection=None, verbatim=True, all=False):
+  """
+  Query using proj.query_cache, querying all missing columns together and
+  storing each individually
+
+  Args:
+       columns: iterable of strings corresponding to 'casm query -k' args
+       selection: a Selection to query (default is "MASTER" selection)
+       verbatim: if True, use 'casm query --verbatim' option (default is True)
+       all: if True, use 'casm query --all' option (default is False)
+
+  Returns:
+       data: a pandas DataFrame containing the query results
+  """
+  if selection == None:
+    selection = casm.project.Selection(proj)
+  elif not isinstance(selection, casm.project.Selection):
+    raise Exception("Error, argument 'selection' must be None or a Selection")
+
+  columns = list(columns)
+  if not verbatim:
+    columns = ["configname", "selected"] + columns
+
+  cache = proj.query_cache
+  fingerprint = cache.fingerprint()
+  frames = dict()
+  missing = []
+  for k in columns:
+    if k in frames or k in missing:
+      continue
+    data = cache.get(fingerprint, k, selection, all)
+    if data is None:
+      missing.append(k)
+    else:
+      frames[k] = data
+
+  if len(missing):
+    split = _split_columns(_query(proj, missing, selection, True, all), missing)
+    if split is None:
+      # the output columns could not be attributed to properties
+      split = dict((k, _query(proj, [k], selection, True, all)) for k in missing)
+    for k in missing:
+      cache.set(fingerprint, k, selection, all, split[k])
+    frames.update(split)
+
+  return pandas.concat([frames[k] for k in columns], axis=1)
+
+
+def _split_columns(data, columns):
+  """
+  Split the results of a query into the columns output for each property
+
+  Output columns are named as the property (i.e. "configname",
+  "clex(formation_energy)") or, for vector valued properties, as the property
+  followed by an index (i.e. "comp(a)", "corr(0)"), in the order the
+  properties were queried.
+
+  Args:
+       data: a pandas DataFrame containing the query results
+       columns: list of strings corresponding to 'casm query -k' args, as queried
+
+  Returns:
+       split: a dict of property:pandas DataFrame, or None if the output
+         columns could not be attributed to properties
+  """
+  split = dict()
+  names = list(data.columns)
+  begin = 0
+  for k in columns:
+    end = begin
+    if end < len(names) and names[end] == k:
+      end += 1
+    else:
+      while end < len(names) and names[end].startswith(k + "("):
+        end += 1
+    if end == begin:
+      return None
+    split[k] = data.iloc[:, begin:end]
+    begin = end
+  if begin != len(names):
+    return None
+  return split
+
+
+def _query_array(proj, columns, selection=None, verbatim=True, all=False):
+  """
+  Query numeric properties via API.query_array
+
+  Args:
+       columns: iterable of strings corresponding to 'casm query -k' args
+       selection: a Selection to query (default is "MASTER" selection)
+       verbatim: if True, use 'casm query --verbatim' option (default is True)
+       all: if True, use 'casm query --all' option (default is False)
+
+  Returns:
+       data: a pandas DataFrame containing the query results, or None if the
+         query could not be evaluated as an array of numbers
+  """
+  if selection == None:
+    selection = casm.project.Selection(proj)
+  elif not isinstance(selection, casm.project.Selection):
+    raise Exception("Error, argument 'selection' must be None or a Selection")
+
+  columns = list(columns)
+  if not verbatim:
+    columns = ["configname", "selected"] + columns
+
+  # 'configname' is the only non-numeric column handled, and only in front
+  with_configname = "configname" in columns
+  numeric = [x for x in columns if x != "configname"]
+  if with_configname and (columns[0] != "configname" or len(numeric) != len(columns) - 1):
+    return None
+
+  # this also ensures proj._api is not None
+  with proj.lock:
+    res = proj._api.query_array(proj.data(), numeric, selection.path, all)
+  if res is None:
+    return None
+  configname, header, types, values = res
+  if values.shape[0] == 0:
+    # no template configuration to get column headers from
+    return None
+
+  data = pandas.DataFrame(values, columns=header)
+
+  # match the integer type obtained from parsing 'casm query' text output
+  int_types = dict()
+  for i, t in enumerate(types):
+    if t in ['l', 'b'] and not np.isnan(values[:,i]).any():
+      int_types[header[i]] = np.int64
+  if len(int_types):
+    data = data.astype(int_types)
+  if with_configname:
+    data.insert(0, "configname", configname)
+  return data
+
+
 def _query_args(proj, columns, selection=None, verbatim=True, all=False, api=False):
   """
   Args:
@@ -11,6 +11,7 @@ import copy
 from io import StringIO
 import json
 import os
+import pickle
 import subprocess
 
 import numpy as np
@@ -42,8 +43,12 @@ class Selection(object):
         A pandas.DataFrame describing the selected configurations. Has at least
         'configname' and 'selected' (as bool) columns.
 
+      sidecar: bool, optional, default=False
+        if True, selection files are also saved in a binary sidecar file, and
+        read from it when it is up to date. See 'read_selection'.
+
     """
-    def __init__(self, proj=None, path="MASTER", all=True):
+    def __init__(self, proj=None, path="MASTER", all=True, sidecar=False):
         """
         Construct a CASM Project representation.
 
@@ -60,6 +65,9 @@ class Selection(object):
             if True, self.data will include all configurations, whether selected or
             not. If False, only selected configurations will be included.
 
+          sidecar: bool, optional, default=False
+            if True, selection files are also saved in a binary sidecar file, and
+            read from it when it is up to date. See 'read_selection'.
 
         """
         if proj == None:
@@ -73,6 +81,7 @@ class Selection(object):
           self.path = os.path.abspath(path)
 
         self.all = all
+        self.sidecar = sidecar
 
         self._data = None
 
@@ -90,13 +99,8 @@ class Selection(object):
         if self._data is None:
           if self.path in ["MASTER", "ALL", "CALCULATED"]:
             self._data = query(self.proj, ['configname', 'selected'], self, all=self.all)
-          elif self._is_json():
-            self._data = pandas.read_json(self.path, 'r', orient='records')
           else:
-            with open(self.path, compat.pandas_rmode()) as f:
-                if compat.peek(f) == '#':
-                    f.read(1)
-                self._data = pandas.read_csv(f, sep=compat.str(' +'), engine='python')
+            self._data = read_selection(self.path, sidecar=self.sidecar)
 
           self._clean_data()
 
@@ -131,26 +135,29 @@ class Selection(object):
           if os.path.exists(backup):
             raise Exception("File: " + backup + " already exists")
 
-          # read
-          with open(clist, 'rb') as f:
-              j = json.loads(f.read().decode('utf-8'))
-
-          for sk, sv in six.iteritems(j["supercells"]):
-            for ck, cv in six.iteritems(sv):
-              sv[ck]["selected"] = False
-
-          # set selection
-          for index, row in self._data.iterrows():
-            scelname, configid = row["configname"].split('/')
-            j["supercells"][scelname][configid]["selected"] = row["selected"]
-
-          # write
-          with open(backup, 'wb') as f:
-              f.write(six.u(json.dumps(j, indent=2)).encode('utf-8'))
-          os.rename(backup, clist)
-
-          # refresh proj config list
-          self.proj.refresh(read_configs=True)
+          with self.proj.lock:
+            # new MASTER selection: configurations not in self._data are not selected
+            curr = query(self.proj, ['configname', 'selected'], self, all=True)
+            names = curr['configname'].values
+            index = pandas.Index(names).get_indexer(self._data['configname'].values)
+            if (index == -1).any():
+              missing = self._data['configname'].values[index == -1]
+              raise Exception("Error saving MASTER selection: configuration not found: " + missing[0])
+            selected = np.zeros(names.shape, dtype=bool)
+            selected[index] = self._data['selected'].values
+
+            # only the changed flags are sent to libcasm, which re-reads
+            # config_list.json and modifies only those entries, so other
+            # contents written since it was read are kept
+            changed = np.nonzero(selected != curr['selected'].values.astype(bool))[0]
+            returncode, err = self.proj._api.primclex_set_selected(
+              self.proj.data(), list(names[changed]), list(selected[changed]))
+            if returncode:
+              raise Exception(err)
+
+          # other threads' CASM::PrimClex hold the previous MASTER selection
+          if self.proj.thread_local:
+            self.proj.refresh(read_configs=True)
 
         elif self.path in ["ALL", "CALCULATED"]:
           raise Exception("Cannot save the '" + self.path + "' Selection")
@@ -164,18 +171,7 @@ class Selection(object):
           if os.path.exists(self.path) and not force:
             raise Exception("File: " + self.path + " already exists")
 
-          backup = self.path + ".tmp"
-          if os.path.exists(backup):
-            raise Exception("File: " + backup + " already exists")
-
-          if self._is_json():
-            self._data.to_json(backup, orient='records')
-          else:
-            self.data.loc[:,"selected"] = self.data.loc[:,"selected"].astype(np.int_)
-            with open(backup, compat.pandas_wmode()) as f:
-                f.write('# ')  # will make this optional in a future version
-                self._data.to_csv(f, sep=compat.str(' '), index=False)
-          os.rename(backup, self.path)
+          write_selection(self.path, self.data, sidecar=self.sidecar)
 
 
     def saveas(self, path, force=False):
@@ -189,18 +185,14 @@ class Selection(object):
         Returns:
           sel: the new Selection created from this one
         """
-        sel = Selection(self.proj, path, all=self.all)
+        sel = Selection(self.proj, path, all=self.all, sidecar=self.sidecar)
         sel._data = self.data.copy()
         sel.save(force=force)
         return sel
 
 
-    def _is_json(self):
-        return self.path[-5:].lower() == ".json"
-
-
     def _clean_data(self):
-        self._data.loc[:,'selected'] = self._data.loc[:,'selected'].astype(bool)
+        self._data['selected'] = self._data['selected'].astype(bool)
 
 
     def query(self, columns, force=False, verbose=False):
@@ -273,3 +265,159 @@ class Selection(object):
             self.query([name], force)
           else:
             self.data.loc[:,name] = data
+
+
+def read_selection_text(f):
+    """
+    Read a selection from a text stream in the 'casm query' output format
+
+    The first line is a header of whitespace separated column names, optionally
+    preceded by '#' (i.e. "# configname selected comp(a)"), followed by one
+    line of whitespace separated values per configuration.
+
+    Arguments
+    ---------
+
+      f: file-like object
+        text stream positioned at the header line
+
+    Returns
+    -------
+
+      data: pandas.DataFrame
+        the selection data, one column per header name
+    """
+    names = f.readline().strip().lstrip('#').split()
+    return pandas.read_csv(f, sep=compat.str(r'\s+'), header=None, names=names)
+
+
+def write_selection_text(f, data):
+    """
+    Write a selection to a text stream in the 'casm query' output format
+
+    Arguments
+    ---------
+
+      f: file-like object
+        text stream opened with mode compat.pandas_wmode()
+
+      data: pandas.DataFrame
+        the selection data. The 'selected' column, if present, is written as 0/1.
+    """
+    if 'selected' in data.columns:
+      data = data.assign(selected=data['selected'].astype(np.int_))
+    f.write('# ')  # will make this optional in a future version
+    data.to_csv(f, sep=compat.str(' '), index=False)
+
+
+def sidecar_path(path):
+    """Returns the path to the binary sidecar file for a selection file"""
+    return path + ".pkl"
+
+
+def read_selection(path, sidecar=False):
+    """
+    Read a selection file
+
+    Arguments
+    ---------
+
+      path: str
+        path to a selection file. If it ends in '.json' it is read as a JSON
+        array of records, otherwise it is read with 'read_selection_text'.
+
+      sidecar: bool, optional, default=False
+        if True, read from the binary sidecar file, sidecar_path(path), if it
+        was written from the current version of the selection file. Otherwise,
+        read the selection file and (re)write the sidecar file.
+
+    Returns
+    -------
+
+      data: pandas.DataFrame
+        the selection data
+    """
+    if sidecar:
+      data = _read_sidecar(path)
+      if data is not None:
+        return data
+
+    if _is_json(path):
+      data = pandas.read_json(path, 'r', orient='records')
+    else:
+      with open(path, compat.pandas_rmode()) as f:
+        data = read_selection_text(f)
+
+    if sidecar:
+      # the sidecar only caches the selection file, so a read does not fail if
+      # it can not be written, i.e. in a read-only directory
+      try:
+        _write_sidecar(path, data)
+      except (OSError, IOError):
+        pass
+    return data
+
+
+def write_selection(path, data, sidecar=False):
+    """
+    Write a selection file
+
+    Arguments
+    ---------
+
+      path: str
+        path to a selection file. If it ends in '.json' it is written as a JSON
+        array of records, otherwise it is written with 'write_selection_text'.
+
+      data: pandas.DataFrame
+        the selection data
+
+      sidecar: bool, optional, default=False
+        if True, also write the binary sidecar file, sidecar_path(path)
+    """
+    backup = path + ".tmp"
+    if os.path.exists(backup):
+      raise Exception("File: " + backup + " already exists")
+
+    if _is_json(path):
+      data.to_json(backup, orient='records')
+    else:
+      with open(backup, compat.pandas_wmode()) as f:
+        write_selection_text(f, data)
+    os.rename(backup, path)
+
+    if sidecar:
+      _write_sidecar(path, data)
+    elif os.path.exists(sidecar_path(path)):
+      # do not leave a sidecar file that no longer matches the selection file
+      os.remove(sidecar_path(path))
+
+
+def _is_json(path):
+    return path[-5:].lower() == ".json"
+
+
+def _file_state(path):
+    st = os.stat(path)
+    return [st.st_mtime, st.st_size]
+
+
+def _read_sidecar(path):
+    """Returns the sidecar data if it matches the selection file, else None"""
+    if not os.path.exists(sidecar_path(path)):
+      return None
+    try:
+      with open(sidecar_path(path), 'rb') as f:
+        d = pickle.load(f)
+    except Exception:
+      return None
+    if d["source"] != _file_state(path):
+      return None
+    return d["data"]
+
+
+def _write_sidecar(path, data):
+    backup = sidecar_path(path) + ".tmp"
+    with open(backup, 'wb') as f:
+      pickle.dump({"source": _file_state(path), "data": data}, f, protocol=2)
+    os.rename(backup, sidecar_path(path))
@@ -16,6 +16,7 @@ import sys
 import casm.scripts.casm_calc
 import casm.scripts.casm_learn
 import casm.scripts.casm_plot
+import casm.scripts.casm_session
 from casm.api import command_list, casm_command
 
 def _exec(argv=None):
@@ -41,6 +42,7 @@ def main(argv=None):
         'calc': casm.scripts.casm_calc.main,
         'learn': casm.scripts.casm_learn.main,
         'plot': casm.scripts.casm_plot.main,
+        'session': casm.scripts.casm_session.main,
         'shell': _shell,
         'exec': _exec}
 
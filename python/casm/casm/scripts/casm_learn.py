@@ -9,6 +9,7 @@ import six
 import sys
 
 import casm.learn
+import casm.learn.store
 from casm.project import Project, Selection, write_eci
   
 
@@ -33,6 +34,8 @@ def main(argv = None):
   parser.add_argument('--select', nargs=1, help='Select individual to use', type=int)
   parser.add_argument('--checkhull', help='Check convex hull properties using the provided selection', action="store_true", default=False)
   parser.add_argument('--checkspecs', help='Output data and cv files containing the current problem specs', action="store_true", default=False)
+  parser.add_argument('--convert', help='Convert problem specs and hall of fame .pkl files to array stores', action="store_true", default=False)
+  parser.add_argument('--resume', help='Resume an interrupted evolutionary feature selection from its last checkpoint', action="store_true", default=False)
   parser.add_argument('-q','--quiet', help='Quiet output', action="store_true", default=False)
   args = parser.parse_args(argv)
   
@@ -107,6 +110,14 @@ def main(argv = None):
       
       write_eci(proj, indiv.eci, casm.learn.to_json(index, indiv), verbose=args.verbose)
       
+    elif args.convert:
+      
+      for filename in [input["problem_specs"]["specs_filename"], input["halloffame_filename"]]:
+        if casm.learn.store.is_pickle_filename(filename) and os.path.exists(filename):
+          path = casm.learn.store.convert(filename, verbose=args.verbose)
+          if args.verbose:
+            print("  If '" + filename + "' is specified in the input file, change it to '" + path + "'")
+      
     elif args.checkspecs:
       
       casm.learn.checkspecs(input, verbose=args.verbose)
@@ -129,7 +140,7 @@ def main(argv = None):
       if input["feature_selection"]["method"] == "DirectSelection":
         casm.learn.direct_fit(input, verbose=args.verbose, hall=hall)
       else:
-        casm.learn.fit_and_select(input, verbose=args.verbose, hall=hall)
+        casm.learn.fit_and_select(input, verbose=args.verbose, hall=hall, resume=args.resume)
       
       # pickle hall of fame
       casm.learn.save_halloffame(hall, halloffame_filename, args.verbose)
@@ -191,7 +202,7 @@ def main(argv = None):
       
         X*b = y  ->  L*X*b = L*y, 
   
-      where, W = L*L.tranpose(): 
+      where, W = L.tranpose()*L: 
         
         W: 2d matrix of shape (n_samples, n_samples)
           The weight matrix is specified in the casm-learn input file. If the 
@@ -234,9 +245,14 @@ def main(argv = None):
       prevent you from re-running with a different problem specification so that
       solutions can be compared via their cv score in an "apples-to-apples" 
       manner. The default name for the "specs" file is determined from the input
-      filename. For example, 'my_input_specs.pkl' is used if the input file is 
+      filename. For example, 'my_input_specs.arrays' is used if the input file is 
       named 'my_input.json'. See 'casm-learn --settings-format' for more help.
       
+      The problem specs and hall of fame are stored as '.arrays' directories,
+      holding arrays that are memory mapped when read, which makes them fast to
+      load. Files written by earlier versions in the '.pkl' format are still
+      read, and can be converted with the '--convert' option.
+      
       
       The '--checkspecs' option can be used to write output files with the 
       generated problem specs data. Amont other things, this can be used to 
@@ -275,9 +291,15 @@ def main(argv = None):
         
         casm-learn -s fit_1_ga.json --hall
       
-      For more details, or to output the results for further analysis in JSON or 
-      CSV format, there is a '--format' option. To view only particular 
+      For more details, or to output the results for further analysis in JSON or
+      CSV format, there is a '--format' option. To view only particular
       individuals in the hall of fame, there is a '--indiv' option.
+
+      The evolutionary feature selection methods periodically save a checkpoint
+      file. If a run is interrupted, for instance by a job walltime limit, it
+      can be continued from the last checkpoint with:
+
+        casm-learn -s fit_1_ga.json --resume
     
     
     3) Analyze results
@@ -0,0 +1,60 @@
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+from builtins import *
+
+import argparse
+import sys
+
+from casm.api import SessionServer, session_stop
+from casm.api.session import session_socket
+
+socket_help = """
+Path to the Unix socket to listen on. Default uses the 'CASM_SESSION_SOCKET'
+environment variable.
+"""
+
+stop_help = """
+Stop the session server listening on the socket.
+"""
+
+verbose_help = """
+Print each command executed by the session server.
+"""
+
+description = """
+Run a local CASM session server, which keeps CASM projects loaded between
+commands. When 'CASM_SESSION_SOCKET' is set to the path of the socket the server
+is listening on, 'casm' commands are executed by the session server instead of
+loading the project each time.
+"""
+
+def main(argv = None):
+  if argv is None:
+    argv = sys.argv[1:]
+
+  parser = argparse.ArgumentParser(description = description)
+  parser.add_argument('--socket', help=socket_help, type=str, default=None)
+  parser.add_argument('--stop', help=stop_help, action="store_true", default=False)
+  parser.add_argument('--verbose', help=verbose_help, action="store_true", default=False)
+  args = parser.parse_args(argv)
+
+  socket_path = args.socket
+  if socket_path is None:
+    socket_path = session_socket()
+  if socket_path is None:
+    print("Error: use --socket or set 'CASM_SESSION_SOCKET'")
+    return 1
+
+  if args.stop:
+    if not session_stop(socket_path):
+      print("No casm session listening on " + socket_path)
+      return 1
+    return 0
+
+  server = SessionServer(socket_path, verbose=args.verbose)
+  print("casm session listening on " + socket_path)
+  sys.stdout.flush()
+  server.run()
+  return 0
+
+if __name__ == "__main__":
+  main()
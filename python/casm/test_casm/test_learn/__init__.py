@@ -1,7 +1,8 @@
 """test_casm/test_learn/__init__.py"""
 
-from test_casm.test_learn.misc import CasmLearnTestCase, casm_learn_setup
+from test_casm.test_learn.misc import CasmLearnTestCase, CasmLearnTmpDirTestCase, casm_learn_setup
 
 __all__ = [
     'CasmLearnTestCase',
+    'CasmLearnTmpDirTestCase',
     'casm_learn_setup']
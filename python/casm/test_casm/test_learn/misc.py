@@ -3,6 +3,8 @@ from __future__ import (absolute_import, division, print_function, unicode_liter
 from builtins import *
 
 import os
+import shutil
+import tempfile
 import unittest
 import warnings
 
@@ -53,3 +55,21 @@ class CasmLearnTestCase(unittest.TestCase):
           - check for 'CASM_TEST_PROJECTS_DIR' and set 'self.has_projects'
         """
         casm_learn_setup(self)
+
+
+class CasmLearnTmpDirTestCase(CasmLearnTestCase):
+    """test_casm.test_learn base unittest class for tests that write files
+
+    Attributes:
+        tmp_dir (str): A temporary directory, created before each test and
+            removed, with its contents, after each test.
+
+    """
+
+    def setUp(self):
+        """Create 'self.tmp_dir'"""
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove 'self.tmp_dir'"""
+        shutil.rmtree(self.tmp_dir)
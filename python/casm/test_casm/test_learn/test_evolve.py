@@ -0,0 +1,118 @@
+"""test_casm/test_learn/test_evolve.py"""
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+from builtins import *
+
+import unittest
+import os
+import numpy as np
+from os.path import join
+
+from casm import learn
+import casm.learn.evolve
+from casm.misc import contexts
+
+import test_casm
+from test_casm.test_learn import CasmLearnTmpDirTestCase
+
+class TestCasmLearnEvolve(CasmLearnTmpDirTestCase):
+    """Test casm.learn.evolve"""
+
+    def test_individual_operators(self):
+        """Test vectorized operators in casm.learn.evolve"""
+        parent = learn.creator.Individual([True, False, True, False, False])
+        parent.fitness.values = (1.0,)
+        self.assertEqual(learn.tools.indices(parent), [0, 2])
+        self.assertEqual(learn.fit.bitstr(parent, 3), '101...')
+
+        children = learn.evolve.single_flip_children(parent)
+        self.assertEqual([learn.fit.bitstr(c) for c in children],
+                         ['00100', '11100', '10000', '10110', '10101'])
+        self.assertFalse(children[0].fitness.valid)
+        self.assertTrue(parent.fitness.valid)
+
+        constraints = learn.evolve.Constraints(n_features_min=2, n_features_max=3, fix_on=[4], fix_off=[0])
+        self.assertFalse(constraints.check(parent))
+        @learn.evolve.enforce_constraints(constraints)
+        def make():
+            return [learn.creator.Individual([True]*5), learn.creator.Individual([False]*5)]
+        for indiv in make():
+            self.assertTrue(constraints.check(indiv))
+
+        a = learn.creator.Individual([True]*5)
+        b = learn.creator.Individual([False]*5)
+        learn.evolve.cxUniform(a, b, 0.5)
+        self.assertEqual([x != y for x, y in zip(a, b)], [True]*5)
+
+    def test_fitness_cache(self):
+        """Test casm.learn.evolve.FitnessCache"""
+        calls = []
+        def evaluate(indiv):
+            calls.append(list(indiv))
+            return (float(sum(indiv)),)
+
+        cache = learn.evolve.FitnessCache("a", maxsize=2)
+        cached_map = cache.map_func(map, evaluate)
+        pop = [[True, False], [False, True], [True, False]]
+        self.assertEqual(list(cached_map(evaluate, pop)), [(1.0,), (1.0,), (1.0,)])
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(len(cache), 2)
+
+        # least recently used entry is discarded
+        self.assertEqual(cache.get([True, False]), (1.0,))
+        cache.set([True, True], (2.0,))
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get([False, True]))
+        self.assertEqual(cache.get([True, False]), (1.0,))
+
+        # only load entries with matching fingerprint
+        filename = join(self.tmp_dir, 'fitness_cache_test.pkl')
+        cache.save(filename)
+        loaded = learn.evolve.FitnessCache("a")
+        loaded.load(filename)
+        self.assertEqual(loaded.get([True, True]), (2.0,))
+        other = learn.evolve.FitnessCache("b")
+        other.load(filename)
+        self.assertEqual(len(other), 0)
+
+    def test_checkpoint_resume(self):
+        """Test resuming casm.learn.evolve.GeneticAlgorithm from a checkpoint"""
+        import sklearn.linear_model
+        import sklearn.metrics
+        import sklearn.model_selection
+        rng = np.random.RandomState(0)
+        X = rng.rand(40, 12)
+        y = X[:, :4].dot([1., 2., 3., 4.]) + 0.01*rng.rand(40)
+        scoring = sklearn.metrics.make_scorer(sklearn.metrics.mean_squared_error, greater_is_better=True)
+
+        def run(resume=False):
+            ga = learn.evolve.GeneticAlgorithm(
+                sklearn.linear_model.LinearRegression(fit_intercept=False),
+                scoring=scoring, cv=sklearn.model_selection.KFold(5),
+                evolve_params_kwargs={
+                    "n_population": 8, "n_generation": 4, "n_repetition": 2,
+                    "n_features_init": 3, "checkpoint_n_generation": 1},
+                verbose=False, random_state=3, resume=resume)
+            ga.fit(X, y)
+            return [(list(indiv), indiv.fitness.values) for indiv in ga.halloffame]
+
+        class Interrupt(Exception):
+            pass
+
+        save = learn.evolve.Checkpoint.save
+        def interrupting_save(self, state, gen, verbose=False):
+            save(self, state, gen, verbose=verbose)
+            if gen == 6:
+                raise Interrupt()
+
+        with contexts.working_dir(wd=self.tmp_dir):
+            expected = run()
+            self.assertFalse(os.path.exists('checkpoint.pkl'))
+            for f in os.listdir(self.tmp_dir):
+                os.remove(f)
+
+            with contexts.patch.object(learn.evolve.Checkpoint, 'save', interrupting_save):
+                with self.assertRaises(Interrupt):
+                    run()
+            self.assertTrue(os.path.exists('checkpoint.pkl'))
+            self.assertEqual(run(resume=True), expected)
+            self.assertFalse(os.path.exists('checkpoint.pkl'))
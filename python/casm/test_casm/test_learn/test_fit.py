@@ -12,10 +12,12 @@ import sys
 from os.path import join
 
 from casm import learn, project
+import casm.learn.store
 from casm.misc import contexts
 from casm.scripts import casm_learn
 
 import test_casm
+from test_casm.test_learn import CasmLearnTmpDirTestCase
 from test_casm.test_scripts import CasmScriptsTestCase
 
 class TestCasmLearnFit(CasmScriptsTestCase):
@@ -96,8 +98,8 @@ class TestCasmLearnFit(CasmScriptsTestCase):
             with contexts.captured_output(wd=fit_dir) as (sout, serr):
                 with contexts.patch.object(sys, 'argv', testargs):
                     casm_learn.main()
-            self.assertTrue(os.path.exists(join(fit_dir, 'fit_RFE_halloffame.pkl')))
-            self.assertTrue(os.path.exists(join(fit_dir, 'fit_RFE_specs.pkl')))
+            self.assertTrue(os.path.exists(join(fit_dir, 'fit_RFE_halloffame.arrays')))
+            self.assertTrue(os.path.exists(join(fit_dir, 'fit_RFE_specs.arrays')))
             #print("OK 3")
 
             # view hall of fame
@@ -119,7 +121,7 @@ class TestCasmLearnFit(CasmScriptsTestCase):
             #print("OK 4")
 
             # check data in pickle file
-            hall = learn.open_halloffame(join(fit_dir, 'fit_RFE_halloffame.pkl'))
+            hall = learn.open_halloffame(join(fit_dir, 'fit_RFE_halloffame.arrays'))
             self.assertEqual(len(hall), 1)
 
             # open input file and set default values
@@ -135,3 +137,75 @@ class TestCasmLearnFit(CasmScriptsTestCase):
             # clean up
             #proj.command('settings --set-bset default')
             #_clean()
+
+    def test_fitting_data_frame(self):
+        """Test the weighted columns of casm.learn.FittingData.data"""
+        import pandas
+        rng = np.random.RandomState(0)
+        X = rng.rand(6, 3)
+        y = rng.rand(6)
+        data = pandas.DataFrame(X, columns=["corr(" + str(i) + ")" for i in range(3)])
+        data["formation_energy"] = y
+        data["weighted_corr(0)"] = 0.0
+
+        class TData(object):
+            pass
+        tdata = TData()
+        tdata.data = data
+        tdata.X_name = "corr"
+        tdata.y_name = "formation_energy"
+
+        fdata = learn.FittingData(X, y, None, sample_weight=rng.rand(6) + 0.5, tdata=tdata)
+        self.assertEqual(list(fdata.data.columns),
+            ["corr(0)", "corr(1)", "corr(2)", "formation_energy",
+             "weighted_corr(0)", "weighted_corr(1)", "weighted_corr(2)", "weighted_formation_energy"])
+        self.assertTrue(np.allclose(fdata.data.loc[:,"weighted_corr(0)"].values, fdata.weighted_X[:,0]))
+        self.assertTrue(np.allclose(fdata.data.loc[:,"weighted_formation_energy"].values, fdata.weighted_y))
+
+
+class TestCasmLearnTrainingData(CasmLearnTmpDirTestCase):
+    """Test casm.learn.fit.TrainingData"""
+
+    def test_training_data_chunked(self):
+        """Test reading TrainingData in chunks and from an array store"""
+        import pandas
+        X = np.random.RandomState(0).rand(7, 3)
+        df = pandas.DataFrame({"configname": ["c" + str(i) for i in range(7)], "Ef": X.sum(axis=1)})
+        for i in range(3):
+            df.loc[:, "corr(" + str(i) + ")"] = X[:, i]
+        df.loc[:, "comment"] = "not used"
+
+        def input(filename, filetype, **kwargs):
+            data = {"filename": filename, "filetype": filetype, "X": "corr", "y": "Ef", "kwargs": dict()}
+            data.update(kwargs)
+            return {"problem_specs": {"data": data, "weight": {"method": None}}}
+
+        filename = join(self.tmp_dir, "train.csv")
+        df.to_csv(filename, index=False)
+        full = learn.TrainingData(input(filename, "csv"), verbose=False)
+        chunked = learn.TrainingData(input(filename, "csv", chunksize=3), verbose=False)
+        self.assertTrue(np.array_equal(chunked.X, full.X))
+        self.assertTrue(np.array_equal(chunked.y, full.y))
+        self.assertEqual(list(chunked.data.columns), ["configname", "Ef"])
+        self.assertEqual(list(chunked.data["configname"]), list(full.data["configname"]))
+
+        # json lines, read in chunks of different sizes
+        json_filename = join(self.tmp_dir, "train.json")
+        df.to_json(json_filename, orient="records", lines=True)
+        for chunksize in [1, 3, 10]:
+            lines = learn.TrainingData(
+                input(json_filename, "json", chunksize=chunksize, kwargs={"lines": True}), verbose=False)
+            self.assertTrue(np.allclose(lines.X, X))
+            self.assertEqual(list(lines.data.columns), ["configname", "Ef"])
+
+        single = learn.TrainingData(input(filename, "csv", chunksize=3, dtype="float32"), verbose=False)
+        self.assertEqual(single.X.dtype, np.float32)
+        self.assertTrue(np.allclose(single.X, X))
+
+        path = join(self.tmp_dir, "train.arrays")
+        casm.learn.store.write_training_data(path, X, df["Ef"].values, df.loc[:, ["configname"]])
+        arrays = learn.TrainingData(input(path, "arrays"), verbose=False)
+        self.assertIsInstance(arrays.X, np.memmap)
+        self.assertTrue(np.array_equal(arrays.X, X))
+        self.assertTrue(np.array_equal(arrays.y, df["Ef"].values))
+        self.assertEqual(list(arrays.data["configname"]), list(full.data["configname"]))
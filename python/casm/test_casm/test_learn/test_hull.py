@@ -0,0 +1,53 @@
+"""test_casm/test_learn/test_hull.py"""
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+from builtins import *
+
+import unittest
+import numpy as np
+
+from casm import learn
+import casm.learn.hull
+
+import test_casm
+from test_casm.test_learn import CasmLearnTestCase
+
+class TestCasmLearnHull(CasmLearnTestCase):
+    """Test casm.learn.hull"""
+
+    def test_hull(self):
+        """Test casm.learn.hull"""
+        # binary, with atom_frac composition (rank 1 in 2d composition space)
+        comp = np.array([[1.0, 0.0], [0.75, 0.25], [0.5, 0.5], [0.25, 0.75], [0.0, 1.0]])
+        energy = np.array([0.0, -0.1, -0.3, -0.1, 0.0])
+        hull = learn.hull.Hull(comp, energy)
+        self.assertEqual(hull.reduce.shape, (1, 2))
+        self.assertEqual(sorted(hull.vertices.tolist()), [0, 2, 4])
+        self.assertTrue(np.allclose(hull.dist_to_hull(comp, energy), [0.0, 0.05, 0.0, 0.05, 0.0]))
+
+        # one hull per column of energy, and hull of a subset of the points
+        energies = np.column_stack([energy, -energy])
+        dist = learn.hull.hull_dist(comp, energies)
+        self.assertTrue(np.allclose(dist[:, 1], [0.0, 0.1, 0.3, 0.1, 0.0]))
+        dist = learn.hull.hull_dist(comp, energies, hull_points=[True, False, False, False, True])
+        self.assertTrue(np.allclose(dist[:, 0], energy))
+
+        # single composition
+        self.assertTrue(np.allclose(learn.hull.hull_dist(comp[:2, :1]*0.0, energy[:2]), [0.1, 0.0]))
+
+        self.assertTrue(np.allclose(
+            learn.hull.atoms_per_unitcell([[1.0, 2.0, 1.0]], ["A", "B", "Va"]), [3.0]))
+
+    def test_hull_dists_parallel(self):
+        """Test casm.learn.hull.hull_dists with a pool of worker processes"""
+        rng = np.random.RandomState(0)
+        x = np.r_[0.0, 1.0, rng.rand(20)]
+        comp = np.column_stack([1.0 - x, x])
+        energy = -x[:, np.newaxis]*(1.0 - x[:, np.newaxis]) + 0.05*rng.rand(x.size, 4)
+        hull_points = [None, x < 0.5]
+        serial = learn.hull.hull_dists(comp, energy, hull_points, n_jobs=1)
+        parallel = learn.hull.hull_dists(comp, energy, hull_points, n_jobs=2)
+        self.assertEqual(len(parallel), 2)
+        for a, b in zip(serial, parallel):
+            self.assertEqual(a.shape, (x.size, 4))
+            self.assertTrue(np.array_equal(a, b))
+        self.assertTrue(np.array_equal(serial[0][:, 2], learn.hull.hull_dist(comp, energy[:, 2])))
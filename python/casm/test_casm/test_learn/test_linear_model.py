@@ -0,0 +1,31 @@
+"""test_casm/test_learn/test_linear_model.py"""
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+from builtins import *
+
+import unittest
+import numpy as np
+
+from casm import learn
+
+import test_casm
+from test_casm.test_learn import CasmLearnTestCase
+
+class TestCasmLearnLinearModel(CasmLearnTestCase):
+    """Test casm.learn.linear_model"""
+
+    def test_linear_regression_for_loocv(self):
+        """Test casm.learn.linear_model.LinearRegressionForLOOCV"""
+        rng = np.random.RandomState(0)
+        X = rng.rand(20, 4)
+        X = np.hstack([X, X[:,:1]])  # rank deficient
+        y = rng.rand(20)
+
+        S = np.linalg.pinv(X.transpose().dot(X)).dot(X.transpose())
+        H = X.dot(S)
+        expected = np.mean(((y - H.dot(y))/(1.0 - np.diag(H)))**2)
+
+        est = learn.linear_model.LinearRegressionForLOOCV()
+        est.fit(X, y)
+        self.assertTrue(np.allclose(est.coef_, S.dot(y)))
+        self.assertTrue(np.allclose(est.leverage_, np.diag(H)))
+        self.assertAlmostEqual(est.score(X, y), expected)
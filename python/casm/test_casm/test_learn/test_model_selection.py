@@ -0,0 +1,70 @@
+"""test_casm/test_learn/test_model_selection.py"""
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+from builtins import *
+
+import unittest
+import numpy as np
+
+from casm import learn
+
+import test_casm
+from test_casm.test_learn import CasmLearnTestCase
+
+class TestCasmLearnModelSelection(CasmLearnTestCase):
+    """Test casm.learn.model_selection"""
+
+    def test_incremental_loocv(self):
+        """Test casm.learn.model_selection.IncrementalLOOCV"""
+        rng = np.random.RandomState(1)
+        X = rng.rand(40, 12)
+        y = rng.rand(40)
+        penalty = 0.01
+
+        cv = learn.model_selection.LeaveOneOutForLLS(40)
+        est = learn.linear_model.LinearRegressionForLOOCV()
+        engine = learn.model_selection.incremental_loocv(est, X, y, cv=cv, penalty=penalty)
+        self.assertIsNotNone(engine)
+
+        parent = [bool(x) for x in rng.rand(12) < 0.4]
+        scores = engine.flip_scores(parent, range(12))
+        for j in range(12):
+            child = list(parent)
+            child[j] = not child[j]
+            if sum(child):
+                expected = learn.model_selection.cross_val_score(
+                    est, X, child, y=y, cv=cv, penalty=penalty)[0]
+                self.assertAlmostEqual(scores[j], expected)
+
+    def test_gram_cv(self):
+        """Test casm.learn.model_selection.GramCV"""
+        import sklearn.linear_model
+        import sklearn.metrics
+        import sklearn.model_selection
+        rng = np.random.RandomState(3)
+        X = rng.rand(50, 10)
+        y = rng.rand(50)
+        scoring = learn.model_selection.MeanSquaredErrorScorer()
+        mse = sklearn.metrics.make_scorer(sklearn.metrics.mean_squared_error, greater_is_better=True)
+        indiv = [bool(x) for x in rng.rand(10) < 0.6]
+        sel = learn.tools.indices(indiv)
+
+        cases = [
+            (learn.linear_model.LinearRegressionForLOOCV(),
+             sklearn.model_selection.KFold(n_splits=5, shuffle=True, random_state=0)),
+            (sklearn.linear_model.Ridge(alpha=0.1, fit_intercept=False),
+             sklearn.model_selection.ShuffleSplit(n_splits=4, test_size=0.2, random_state=1))]
+        for est, cv in cases:
+            engine = learn.model_selection.gram_cv(est, X, y=y, scoring=scoring, cv=cv)
+            self.assertIsNotNone(engine)
+            expected = sklearn.model_selection.cross_val_score(
+                est, X[:,sel], y=y, scoring=mse, cv=cv)
+            self.assertTrue(np.allclose(engine.scores(est, sel), expected))
+            self.assertTrue(np.allclose(sklearn.model_selection.cross_val_score(
+                est, X[:,sel], y=y, scoring=scoring, cv=cv), expected))
+
+        # other scorers must opt in explicitly
+        self.assertIsNone(learn.model_selection.gram_cv(cases[0][0], X, y=y, scoring=mse, cv=cases[0][1]))
+
+        # random train/test sets can not be re-used
+        cv = sklearn.model_selection.KFold(n_splits=5, shuffle=True)
+        self.assertIsNone(learn.model_selection.gram_cv(cases[0][0], X, y=y, scoring=scoring, cv=cv))
@@ -0,0 +1,37 @@
+"""test_casm/test_learn/test_parallel.py"""
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+from builtins import *
+
+import unittest
+import numpy as np
+import six
+
+from casm import learn
+import casm.learn.parallel
+
+import test_casm
+from test_casm.test_learn import CasmLearnTestCase
+
+class TestCasmLearnParallel(CasmLearnTestCase):
+    """Test casm.learn.parallel"""
+
+    def test_parallel_evaluator(self):
+        """Test casm.learn.parallel.ParallelEvaluator"""
+        rng = np.random.RandomState(2)
+        X = rng.rand(30, 8)
+        y = rng.rand(30)
+        est = learn.linear_model.LinearRegressionForLOOCV()
+        cv = learn.model_selection.LeaveOneOutForLLS(30)
+        pop = [[bool(x) for x in rng.rand(8) < 0.5] for i in range(10)]
+        pop = [indiv for indiv in pop if sum(indiv)]
+
+        expected = [learn.model_selection.cross_val_score(est, X, indiv, y=y, cv=cv)
+                    for indiv in pop]
+        for backend in ["process", "thread"]:
+            with learn.parallel.ParallelEvaluator(
+                    est, X, y, cv=cv, n_jobs=2, backend=backend) as evaluator:
+                self.assertEqual(evaluator.map(evaluator.evaluate, pop), expected)
+
+        # worker processes are not forked from a process that may be using libcasm
+        if six.PY3:
+            self.assertNotEqual(learn.parallel.pool_context().get_start_method(), "fork")
@@ -0,0 +1,53 @@
+"""test_casm/test_learn/test_predict.py"""
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+from builtins import *
+
+import unittest
+import numpy as np
+from os.path import join
+
+from casm import learn
+import casm.learn.predict
+import casm.learn.store
+
+import test_casm
+from test_casm.test_learn import CasmLearnTmpDirTestCase
+
+class TestCasmLearnPredict(CasmLearnTmpDirTestCase):
+    """Test casm.learn.predict"""
+
+    def test_predictor(self):
+        """Test casm.learn.predict"""
+        rng = np.random.RandomState(0)
+        corr = rng.rand(20, 5)
+        eci = [[(0, 1.0), (3, -0.5)], [(1, 2.0)], []]
+        dense = learn.predict.eci_matrix(eci, 5)
+        self.assertEqual(dense.shape, (5, 3))
+        self.assertTrue(np.array_equal(learn.predict.eci_matrix(eci[0], 5)[:, 0], dense[:, 0]))
+        self.assertTrue(np.array_equal(learn.predict.eci_matrix(list(dense[:, 1]), 5)[:, 0], dense[:, 1]))
+        with self.assertRaises(Exception):
+            learn.predict.eci_matrix([(5, 1.0)], 5)
+
+        # nested lists of dense ECI, one per model, and no models
+        nested = [list(dense[:, 0]), list(dense[:, 1])]
+        self.assertTrue(np.array_equal(learn.predict.eci_matrix(nested, 5), dense[:, :2]))
+        self.assertTrue(np.array_equal(learn.predict.eci_matrix([eci[0], nested[1]], 5), dense[:, :2]))
+        self.assertEqual(learn.predict.eci_matrix([], 5).shape, (5, 0))
+        with self.assertRaises(Exception):
+            learn.predict.eci_matrix([[1.0, 2.0]], 5)
+
+        path = join(self.tmp_dir, "corr.arrays")
+        configname = np.array(["c" + str(i) for i in range(20)])
+        casm.learn.store.write_store(path, {"type": "Correlations"},
+                                     {"corr": corr, "configname": configname})
+        predictor = learn.open_predictor(path)
+        self.assertIsInstance(predictor.corr, np.memmap)
+        self.assertEqual(list(predictor.configname), list(configname))
+
+        values = predictor.predict(eci)
+        self.assertEqual(values.shape, (20, 3))
+        self.assertTrue(np.allclose(values, corr.dot(dense)))
+        self.assertTrue(np.allclose(values[:, 2], 0.0))
+        self.assertTrue(np.allclose(predictor.predict(dense[:, 0])[:, 0], values[:, 0]))
+        self.assertEqual(predictor.predict([]).shape, (20, 0))
+        del predictor, values
@@ -0,0 +1,70 @@
+"""test_casm/test_learn/test_store.py"""
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+from builtins import *
+
+import unittest
+import numpy as np
+from os.path import join
+
+from casm import learn
+import casm.learn.store
+
+import test_casm
+from test_casm.test_learn import CasmLearnTmpDirTestCase
+
+class TestCasmLearnStore(CasmLearnTmpDirTestCase):
+    """Test casm.learn.store"""
+
+    def test_array_store(self):
+        """Test casm.learn.store"""
+        import pandas
+        import pickle
+        import uuid
+        rng = np.random.RandomState(0)
+        X = rng.rand(10, 4)
+        y = rng.rand(10)
+        cv = [(np.arange(0, 5), np.arange(5, 10)), (np.arange(5, 10), np.arange(0, 5))]
+        fdata = learn.FittingData(X, y, cv, sample_weight=rng.rand(10), penalty=0.1)
+        fdata.input = {"problem_specs": {"cv": {"method": "KFold"}}}
+        fdata.data = pandas.DataFrame({"configname": ["c" + str(i) for i in range(10)], "y": y})
+
+        hall = learn.create_halloffame(3)
+        for bits, cv_score in [([1, 0, 1, 1], 0.2), ([0, 1, 1, 0], 0.1)]:
+            indiv = learn.creator.Individual([bool(b) for b in bits])
+            indiv.fitness.values = (cv_score,)
+            indiv.id = uuid.uuid4()
+            indiv.eci = [(0, 1.5), (2, -0.5)]
+            indiv.rms = np.float64(0.01)
+            indiv.clex_gs = pandas.DataFrame({"configname": ["c0"]})
+            hall.update([indiv])
+
+        filename = join(self.tmp_dir, 'specs.arrays')
+        learn.save_fitting_data(fdata, filename)
+        loaded = learn.open_fitting_data(filename)
+        self.assertTrue(isinstance(loaded.X, np.memmap))
+        for name in ["X", "y", "weighted_X", "weighted_y", "weight_factor"]:
+            self.assertTrue(np.array_equal(getattr(loaded, name), getattr(fdata, name)))
+        self.assertEqual([[list(s) for s in split] for split in loaded.cv],
+                         [[list(s) for s in split] for split in cv])
+        self.assertEqual(loaded.penalty, 0.1)
+        self.assertEqual(loaded.input, fdata.input)
+        self.assertTrue(loaded.data.equals(fdata.data))
+
+        filename = join(self.tmp_dir, 'halloffame.arrays')
+        learn.save_halloffame(hall, filename)
+        loaded = learn.open_halloffame(filename)
+        self.assertEqual([list(indiv) for indiv in loaded], [list(indiv) for indiv in hall])
+        self.assertEqual([indiv.fitness.values for indiv in loaded], [(0.1,), (0.2,)])
+        self.assertEqual(loaded[0].eci, hall[0].eci)
+        self.assertEqual(loaded[0].id, hall[0].id)
+        self.assertTrue(loaded[0].clex_gs.equals(hall[0].clex_gs))
+        loaded.update(hall)
+        self.assertEqual(len(loaded), 2)
+
+        # convert existing pickle files
+        filename = join(self.tmp_dir, 'halloffame.pkl')
+        with open(filename, 'wb') as f:
+            pickle.dump(hall, f, protocol=2)
+        path = casm.learn.store.convert(filename)
+        self.assertEqual(path, join(self.tmp_dir, 'halloffame.arrays'))
+        self.assertEqual(len(learn.open_halloffame(path)), 2)
@@ -0,0 +1,100 @@
+"""test_casm/test_learn/test_tools.py"""
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+from builtins import *
+
+import unittest
+import json
+import numpy as np
+from os.path import join
+
+from casm import learn, project
+import casm.learn.store
+
+import test_casm
+from test_casm.test_learn import CasmLearnTmpDirTestCase
+
+class TestCasmLearnTools(CasmLearnTmpDirTestCase):
+    """Test casm.learn.tools"""
+
+    def test_set_sample_weight(self):
+        """Test casm.learn.tools.set_sample_weight"""
+        rng = np.random.RandomState(0)
+        X = rng.rand(6, 3)
+        y = rng.rand(6)
+
+        # 1d weights: rows scaled by sqrt of normalized weights
+        w = rng.rand(6) + 0.5
+        wy, wX, W, L = learn.tools.set_sample_weight(w, X=X, y=y)
+        self.assertIsNone(W)
+        self.assertIsNone(L)
+        s = np.sqrt(w*6/np.sum(w))
+        self.assertTrue(np.allclose(wX, X*s[:,np.newaxis]))
+        self.assertTrue(np.allclose(wy, y*s))
+
+        # 2d weights: W = L.transpose()*L
+        A = rng.rand(6, 6)
+        w2d = A.dot(A.transpose()) + 6*np.identity(6)
+        wy, wX, W, L = learn.tools.set_sample_weight(w2d, X=X, y=y, return_matrices=True)
+        self.assertTrue(np.allclose(W, w2d*6/np.sum(w2d)))
+        self.assertTrue(np.allclose(L.transpose().dot(L), W))
+        self.assertTrue(np.allclose(wX, L.dot(X)))
+
+        # singular, positive semi-definite 2d weights
+        B = rng.rand(6, 3)
+        w2d = B.dot(B.transpose())
+        L = learn.tools.sample_weight_factor(w2d, 6)
+        self.assertTrue(np.allclose(L.transpose().dot(L), w2d*6/np.sum(w2d)))
+
+    def test_sparse_eci(self):
+        """Test casm.learn.tools.SparseECI and project.write_eci"""
+        indiv = learn.creator.Individual([False, True, False, True])
+        eci = learn.tools.eci(indiv, np.array([0.5, -1.5]))
+        self.assertIsInstance(eci, learn.tools.SparseECI)
+        self.assertEqual(list(eci), [(1, 0.5), (3, -1.5)])
+        self.assertEqual(eci, [(1, 0.5), (3, -1.5)])
+        self.assertEqual(eci[1], (3, -1.5))
+        self.assertEqual(len(eci), 2)
+        self.assertTrue(np.array_equal(eci.to_dense(4), [0.0, 0.5, 0.0, -1.5]))
+        self.assertEqual(learn.tools.SparseECI.from_pairs([(1, 0.5), (3, -1.5)]), eci)
+
+        # hall of fame array stores hold ECI as arrays
+        hall = learn.create_halloffame(3)
+        indiv.fitness.values = (0.1,)
+        indiv.eci = eci
+        hall.insert(indiv)
+        path = join(self.tmp_dir, "hall.arrays")
+        casm.learn.store.write_halloffame(hall, path)
+        self.assertEqual(casm.learn.store.read_halloffame(path)[0].eci, eci)
+
+        # write eci.json, one entry at a time
+        basis = {
+            "site_functions": [{"sublat": 0, "basis": {"\\phi_0_0": {"A": -1.0, "B": 1.0}}}],
+            "cluster_functions": [
+                {"orbit": [i, 0, 0], "prototype": {"sites": [[0, 0, 0, i]]}} for i in range(4)]}
+        tmp_dir = self.tmp_dir
+        class Dir(object):
+            def basis(self, clex):
+                return join(tmp_dir, "basis.json")
+            def eci(self, clex):
+                return join(tmp_dir, "eci.json")
+        class Proj(object):
+            dir = Dir()
+            def refresh(self, clear_clex=False):
+                pass
+        with open(join(self.tmp_dir, "basis.json"), 'w') as f:
+            json.dump(basis, f)
+        project.write_eci(Proj(), eci, fit_details={"eci": list(eci)}, clex=object())
+        with open(join(self.tmp_dir, "eci.json"), 'r') as f:
+            text = f.read()
+        result = json.loads(text)
+        self.assertEqual([x.get("eci") for x in result["cluster_functions"]], [None, 0.5, None, -1.5])
+        self.assertEqual(result["fit"], {"eci": [[1, 0.5], [3, -1.5]]})
+        self.assertIn('"orbit": [1, 0, 0]', text)
+        self.assertIn('"sites": [\n          [0, 0, 0, 3]\n        ]', text)
+
+    def test_X_columns(self):
+        """Test casm.learn.tools.X_columns"""
+        columns = ["configname", "corr(0)", "formation_energy", "corr(1)", "corr_extra", "comp(a)"]
+        self.assertEqual(learn.tools.X_columns(columns, "corr"), [1, 3])
+        self.assertEqual(learn.tools.X_columns(columns, "comp"), [])
+        self.assertEqual(learn.tools.X_columns(columns, "weight"), [])
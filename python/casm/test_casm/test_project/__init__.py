@@ -1,7 +1,8 @@
 """test_casm/test_project/__init__.py"""
 
-from test_casm.test_project.misc import CasmProjectTestCase, casm_project_setup
+from test_casm.test_project.misc import CasmProjectTestCase, casm_project_setup, mock_project
 
 __all__ = [
     'CasmProjectTestCase',
-    'casm_project_setup']
+    'casm_project_setup',
+    'mock_project']
@@ -3,6 +3,7 @@ from __future__ import (absolute_import, division, print_function, unicode_liter
 from builtins import *
 
 import os
+import threading
 import unittest
 import warnings
 
@@ -10,6 +11,7 @@ from distutils.spawn import find_executable
 from os.path import join
 
 import test_casm
+from casm import project
 
 def casm_project_setup(self):
     """Implements common setup for casm.project tests
@@ -64,3 +66,32 @@ class CasmProjectTestCase(unittest.TestCase):
           - check for 'CASM_TEST_PROJECTS_DIR' and set 'self.has_projects'
         """
         casm_project_setup(self)
+
+def mock_project(api=None, capture=None, path=None, thread_local=False):
+    """A casm.project.Project that does not load libcasm
+
+    Arguments:
+        api: used as the Project's casm.API instance
+        capture: if not None, replaces Project.capture
+        path: if not None, the project root directory used by 'proj.dir'
+        thread_local: if False, a null CASM::PrimClex is shared by all
+            threads. If True, each thread loads a CASM::PrimClex using 'api'.
+    """
+    proj = project.Project.__new__(project.Project)
+    proj.thread_local = thread_local
+    proj._sessions = []
+    proj._sessions_lock = threading.RLock()
+    proj._local = threading.local()
+    proj._shared_session = None
+    if not thread_local:
+        proj._shared_session = {"ptr": None, "lock": threading.RLock()}
+    proj._api = api
+    proj.query_cache = None
+    proj._prim = None
+    proj.verbose = False
+    if capture is not None:
+        proj.capture = capture
+    proj.path = path
+    if path is not None:
+        proj.dir = project.DirectoryStructure(path)
+    return proj
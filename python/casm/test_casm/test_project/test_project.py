@@ -3,15 +3,21 @@ from __future__ import (absolute_import, division, print_function, unicode_liter
 from builtins import *
 
 import unittest
+import gc
 import os
+import shutil
+import tempfile
+import threading
 from os.path import join
 import json
 
 import numpy as np
+import six
 from casm import project
+from casm.misc import contexts
 
 import test_casm
-from test_casm.test_project import CasmProjectTestCase
+from test_casm.test_project import CasmProjectTestCase, mock_project
 
 class TestCasmProject(CasmProjectTestCase):
   
@@ -75,3 +81,151 @@ class TestCasmProject(CasmProjectTestCase):
             self.assertTrue(np.allclose(comp_axes.end_members['a'],
                             np.array([ 2.,  0.,  2.])))
             
+
+    def test_batch(self):
+        """Test Project.batch"""
+        if self.has_projects:
+            proj = project.Project(self.ZrO_dir, verbose=False)
+            with proj.batch() as b:
+                b.add("select --set-on")
+                i = b.add("query -k scel_size -o STDOUT")
+                b.add("notacommand")
+            self.assertEqual(len(b.results), 3)
+            self.assertEqual(b.results[0][2], 0)
+            stdout, stderr, returncode = b.results[i]
+            self.assertEqual(returncode, 0)
+            self.assertEqual(len(stdout.strip().split('\n')), 337)
+            self.assertNotEqual(b.results[2][2], 0)
+
+            with proj.batch(stop_on_error=True) as b:
+                b.add("notacommand")
+                b.add("select --set-on")
+            self.assertEqual(len(b.results), 1)
+
+    def test_settings_path_crawl(self):
+        """Test DirectoryStructure.settings_path_crawl"""
+        root = tempfile.mkdtemp()
+        try:
+            os.mkdir(join(root, ".casm"))
+            dir = project.DirectoryStructure(root)
+            clex = project.ClexDescription("formation_energy", "formation_energy",
+                "default", "default", "default", "default")
+            configname = "SCEL1_1_1_1_0_0_0/0"
+
+            calc_dir = dir.calc_settings_dir(clex)
+            os.makedirs(calc_dir)
+            open(join(calc_dir, "relax.json"), 'w').close()
+            self.assertEqual(dir.settings_path_crawl("relax.json", configname, clex),
+                             join(calc_dir, "relax.json"))
+            self.assertIsNone(dir.settings_path_crawl("INCAR", configname, clex))
+
+            # lookups use the index, and do not access the filesystem
+            config_dir = dir.configuration_calc_settings_dir(configname, clex)
+            os.makedirs(config_dir)
+            open(join(config_dir, "relax.json"), 'w').close()
+            open(join(calc_dir, "INCAR"), 'w').close()
+            with contexts.patch.object(os, 'listdir', None), \
+                    contexts.patch.object(os, 'stat', None):
+                self.assertEqual(dir.settings_path_crawl("relax.json", configname, clex),
+                                 join(calc_dir, "relax.json"))
+                self.assertIsNone(dir.settings_path_crawl("INCAR", configname, clex))
+                self.assertEqual(dir.settings_files(config_dir), frozenset())
+
+            # until the index is refreshed
+            dir.refresh_settings_index()
+            self.assertEqual(dir.settings_path_crawl("relax.json", configname, clex),
+                             join(config_dir, "relax.json"))
+            self.assertEqual(dir.settings_path_crawl("INCAR", configname, clex),
+                             join(calc_dir, "INCAR"))
+
+            # a file added without changing the directory modification time, as
+            # within its resolution, is found
+            mtime = os.stat(calc_dir).st_mtime
+            open(join(calc_dir, "KPOINTS"), 'w').close()
+            os.utime(calc_dir, (mtime, mtime))
+            dir.refresh_settings_index()
+            self.assertIn("KPOINTS", dir.settings_files(calc_dir))
+
+            # directories modified well before they were listed are not listed again
+            for d in [calc_dir, config_dir]:
+                os.utime(d, (mtime - 10.0, mtime - 10.0))
+            with contexts.patch.object(os, 'listdir', None):
+                dir.refresh_settings_index()
+            self.assertEqual(dir.settings_files(calc_dir), frozenset(["relax.json", "INCAR", "KPOINTS"]))
+
+            # a new DirectoryStructure lists directories again
+            os.remove(join(config_dir, "relax.json"))
+            self.assertEqual(project.DirectoryStructure(root).settings_path_crawl("relax.json", configname, clex),
+                             join(calc_dir, "relax.json"))
+        finally:
+            shutil.rmtree(root)
+
+    def test_thread_local_release(self):
+        """Test that a thread's CASM::PrimClex is freed when the thread ends"""
+        class API(object):
+            def __init__(self):
+                self.loaded = []
+                self.deleted = []
+            def nullstream(self):
+                return None
+            def primclex_new(self, path, log, debug_log, err_log):
+                self.loaded.append(object())
+                return self.loaded[-1]
+            def primclex_delete(self, ptr):
+                self.deleted.append(ptr)
+
+        api = API()
+        API_ = project.project.API
+        project.project.API = lambda: api
+        try:
+            proj = mock_project(thread_local=True)
+            ptr = proj.data()
+            thread = threading.Thread(target=proj.data)
+            thread.start()
+            thread.join()
+            gc.collect()
+            self.assertEqual(len(api.loaded), 2)
+            self.assertEqual(api.deleted, [api.loaded[1]])
+            self.assertEqual([s["ptr"] for s in proj._sessions], [ptr])
+        finally:
+            project.project.API = API_
+
+    def test_prim_symmetry_files(self):
+        """Test Prim point group names read from symmetry/*.json, and reset by refresh"""
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            for d in ['.casm', 'symmetry']:
+                os.mkdir(join(tmp_dir, d))
+            clex = {"name": "formation_energy", "property": "formation_energy", "calctype": "default",
+                    "ref": "default", "bset": "default", "eci": "default"}
+            files = {
+                join('.casm', 'project_settings.json'): {
+                    "name": "test", "default_clex": "formation_energy",
+                    "cluster_expansions": {"formation_energy": clex}},
+                'prim.json': {
+                    "lattice_vectors": [[3.0, 0.0, 0.0], [0.0, 3.0, 0.0], [0.0, 0.0, 4.0]],
+                    "coordinate_mode": "Fractional", "basis": []},
+                join('symmetry', 'lattice_point_group.json'): {"name": "D4h"},
+                join('symmetry', 'crystal_point_group.json'): {"name": "C4v"}}
+            for name, value in six.iteritems(files):
+                with open(join(tmp_dir, name), 'w') as f:
+                    json.dump(value, f)
+
+            def capture(args):
+                raise Exception("'casm sym' should not be necessary")
+            proj = mock_project(path=tmp_dir, capture=capture)
+            prim = proj.prim
+            self.assertEqual(prim.lattice_symmetry_s, 'D4h')
+            self.assertEqual(prim.lattice_symmetry_hm, '4/mmm')
+            self.assertEqual(prim.lattice_system, 'tetragonal')
+            self.assertEqual(prim.crystal_symmetry_s, 'C4v')
+            self.assertAlmostEqual(prim.lattice_parameters['c'], 4.0)
+
+            with open(join(tmp_dir, 'symmetry', 'crystal_point_group.json'), 'w') as f:
+                json.dump({"name": "D4h"}, f)
+            self.assertEqual(proj.prim.crystal_symmetry_s, 'C4v')
+            proj.refresh(read_settings=True)
+            self.assertIsNot(proj.prim, prim)
+            self.assertEqual(proj.prim.crystal_symmetry_s, 'D4h')
+        finally:
+            shutil.rmtree(tmp_dir)
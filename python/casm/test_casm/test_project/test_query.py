@@ -0,0 +1,223 @@
+"""test_casm/test_project/test_query.py"""
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+from builtins import *
+
+import unittest
+import os
+import shutil
+import tempfile
+from os.path import join
+import json
+
+import numpy as np
+import pandas
+from casm import project
+from casm.misc import contexts
+
+import test_casm
+from test_casm.test_project import CasmProjectTestCase, mock_project
+
+class TestCasmQuery(CasmProjectTestCase):
+
+    def setUp(self):
+        pass
+
+    def test_query(self):
+        """Test project.query"""
+        if self.has_projects:
+            # ZrO test project construction
+            proj = project.Project(self.ZrO_dir, verbose=False)
+            proj.capture("select --set-on")
+            sel = project.Selection(proj)
+
+            Nconfig = 336
+            df = project.query(proj, ['configname', 'selected', 'comp', 'scel_size'], sel)
+            self.assertEqual(df.shape, (Nconfig,4))
+            self.assertEqual(list(df.columns), ['configname', 'selected', 'comp(a)', 'scel_size'])
+            self.assertEqual(df.dtypes[0], 'object')
+            self.assertEqual(df.dtypes[1], 'int64')
+            self.assertEqual(df.dtypes[2], 'float64')
+            self.assertEqual(df.dtypes[3], 'int64')
+            self.assertEqual(list(df['selected']), [1]*Nconfig)
+
+    def test_iter_query(self):
+        """Test project.iter_query"""
+        if self.has_projects:
+            # ZrO test project construction
+            proj = project.Project(self.ZrO_dir, verbose=False)
+            proj.capture("select --set-on")
+            sel = project.Selection(proj)
+
+            chunks = list(project.iter_query(proj, ['configname', 'comp'], sel, chunksize=100))
+            self.assertEqual([x.shape[0] for x in chunks], [100, 100, 100, 36])
+
+            df = pandas.concat(chunks, ignore_index=True)
+            expected = project.query(proj, ['configname', 'comp'], sel)
+            self.assertEqual(list(df['configname']), list(expected['configname']))
+            self.assertTrue(np.allclose(df['comp(a)'].values, expected['comp(a)'].values))
+
+            # temporary selection files are removed
+            tmp_dir = join(proj.dir.casm_dir(), "tmp")
+            self.assertEqual([x for x in os.listdir(tmp_dir) if x.startswith("iter_query_")], [])
+
+    def test_query_cache(self):
+        """Test project.query with a QueryCache"""
+        if self.has_projects:
+            # ZrO test project construction
+            proj = project.Project(self.ZrO_dir, verbose=False, query_cache=True)
+            self.assertIsInstance(proj.query_cache, project.QueryCache)
+            proj.query_cache.clear()
+            proj.capture("select --set-on")
+            sel = project.Selection(proj)
+
+            df = project.query(proj, ['configname', 'comp'], sel)
+            fingerprint = proj.query_cache.fingerprint()
+            self.assertEqual(len(os.listdir(join(proj.query_cache.path, fingerprint))), 2)
+
+            cached = proj.query_cache.get(fingerprint, 'comp', sel, False)
+            self.assertEqual(list(cached.columns), ['comp(a)'])
+
+            df2 = project.query(proj, ['configname', 'comp'], sel)
+            self.assertEqual(list(df['configname']), list(df2['configname']))
+            self.assertTrue(np.allclose(df['comp(a)'].values, df2['comp(a)'].values))
+
+            # changing the selection invalidates cached results
+            proj.capture("select --set-off")
+            self.assertNotEqual(proj.query_cache.fingerprint(), fingerprint)
+            proj.query_cache.clear()
+
+    def test_query_threads(self):
+        """Test concurrent project.query"""
+        if self.has_projects:
+            from multiprocessing.pool import ThreadPool
+
+            # ZrO test project construction
+            proj = project.Project(self.ZrO_dir, verbose=False)
+            proj.capture("select --set-on")
+            expected = [project.query(proj, [k]) for k in ['comp', 'scel_size', 'formation_energy']]
+
+            for thread_local in [False, True]:
+                proj = project.Project(self.ZrO_dir, verbose=False, thread_local=thread_local)
+                pool = ThreadPool(3)
+                res = pool.map(lambda k: project.query(proj, [k]), ['comp', 'scel_size', 'formation_energy'])
+                pool.close()
+                pool.join()
+                for df, exp in zip(res, expected):
+                    self.assertEqual(list(df.columns), list(exp.columns))
+                    self.assertTrue(np.allclose(df.values, exp.values, equal_nan=True))
+
+    def test_query_array(self):
+        """Test project.query via API.query_array, with mocked libcasm"""
+        class API(object):
+            def __init__(self, res):
+                self.res = res
+                self.calls = []
+            def query_array(self, primclex, columns, selection, all):
+                self.calls.append((columns, selection, all))
+                return self.res
+
+        values = np.array([[1.0, 0.25], [1.0, 0.5], [0.0, np.nan]])
+        api = API((["SCEL1_1_1_1_0_0_0/0", "SCEL2_1_2_1_0_0_0/0", "SCEL2_1_2_1_0_0_0/1"],
+                   ["selected", "comp(a)"], "bd", values))
+        proj = mock_project(api=api)
+        sel = project.Selection(proj)
+        df = project.query(proj, ['configname', 'selected', 'comp'], sel)
+        self.assertEqual(api.calls, [(['selected', 'comp'], 'MASTER', False)])
+        self.assertEqual(list(df.columns), ['configname', 'selected', 'comp(a)'])
+        self.assertEqual(list(df['configname']), api.res[0])
+        self.assertEqual(df['selected'].dtype, 'int64')
+        self.assertEqual(df['comp(a)'].dtype, 'float64')
+        self.assertTrue(np.allclose(df['comp(a)'].values, values[:,1], equal_nan=True))
+
+        # non-numeric properties are parsed from 'casm query' text output
+        args = []
+        def capture(a):
+            args.append(a)
+            return ("# configname selected comp(a)\n"
+                    "SCEL1_1_1_1_0_0_0/0 1 0.25\n"
+                    "SCEL2_1_2_1_0_0_0/0 0 0.5\n", "", 0)
+        proj = mock_project(api=API(None), capture=capture)
+        df = project.query(proj, ['configname', 'selected', 'comp'], project.Selection(proj))
+        self.assertEqual(len(args), 1)
+        self.assertEqual(list(df.columns), ['configname', 'selected', 'comp(a)'])
+        self.assertEqual(list(df['selected']), [1, 0])
+        self.assertTrue(np.allclose(df['comp(a)'].values, [0.25, 0.5]))
+
+    def test_query_cached_one_call(self):
+        """Test that columns missing from the query cache are queried together"""
+        class API(object):
+            def __init__(self):
+                self.calls = []
+            def query_array(self, primclex, columns, selection, all):
+                self.calls.append(columns)
+                header = {"selected": ["selected"], "comp": ["comp(a)", "comp(b)"]}
+                names = sum([header[k] for k in columns], [])
+                return (["A", "B"], names, "d"*len(names), np.ones((2, len(names))))
+
+        class Cache(object):
+            def __init__(self):
+                self.data = dict()
+            def fingerprint(self):
+                return "f"
+            def get(self, fingerprint, column, selection, all):
+                return self.data.get(column)
+            def set(self, fingerprint, column, selection, all, data):
+                self.data[column] = data
+
+        api = API()
+        proj = mock_project(api=api)
+        proj.query_cache = Cache()
+        sel = project.Selection(proj)
+        df = project.query(proj, ['configname', 'selected', 'comp'], sel)
+        self.assertEqual(api.calls, [['selected', 'comp']])
+        self.assertEqual(list(df.columns), ['configname', 'selected', 'comp(a)', 'comp(b)'])
+        self.assertEqual(list(proj.query_cache.data['comp'].columns), ['comp(a)', 'comp(b)'])
+
+        df = project.query(proj, ['comp', 'selected'], sel)
+        self.assertEqual(len(api.calls), 1)
+        self.assertEqual(list(df.columns), ['comp(a)', 'comp(b)', 'selected'])
+
+    def test_iter_query_cached(self):
+        """Test project.iter_query with the query cache, with mocked libcasm"""
+        class API(object):
+            def query_array(self, primclex, columns, selection, all):
+                # the value of 'scel_size' is the index in the configname
+                data = project.read_selection(selection)
+                names = list(data.loc[data['selected'] == True, 'configname'])
+                values = np.array([[float(x.split('/')[1])] for x in names])
+                return (names, ['scel_size'], 'l', values.reshape((len(names), 1)))
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            os.mkdir(join(tmp_dir, '.casm'))
+            proj = mock_project(api=API(), path=tmp_dir)
+            names = ["A/" + str(i) for i in range(10)]
+            path = join(tmp_dir, 'sel')
+            with open(path, 'w') as f:
+                f.write("# configname selected\n")
+                for name in names:
+                    f.write(name + " 1\n")
+            sel = project.Selection(proj, path)
+
+            expected = pandas.concat(
+                project.iter_query(proj, ['configname', 'scel_size'], sel, chunksize=2),
+                ignore_index=True)
+
+            # each chunk selection file has the same path and size, and may be
+            # written within the timestamp resolution
+            save = project.Selection.save
+            def same_mtime_save(self, *args, **kwargs):
+                save(self, *args, **kwargs)
+                os.utime(self.path, (1.0, 1.0))
+
+            proj.query_cache = project.QueryCache(proj)
+            proj.query_cache.project_files = lambda: []
+            with contexts.patch.object(project.Selection, 'save', same_mtime_save):
+                for i in range(2):
+                    df = pandas.concat(
+                        project.iter_query(proj, ['configname', 'scel_size'], sel, chunksize=2),
+                        ignore_index=True)
+                    self.assertEqual(list(df['configname']), names)
+                    self.assertTrue(df.equals(expected))
+        finally:
+            shutil.rmtree(tmp_dir)
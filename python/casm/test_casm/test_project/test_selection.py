@@ -4,14 +4,17 @@ from builtins import *
 
 import unittest
 import os
+import shutil
+import tempfile
 from os.path import join
 import json
 
 import numpy as np
+import pandas
 from casm import project
 
 import test_casm
-from test_casm.test_project import CasmProjectTestCase
+from test_casm.test_project import CasmProjectTestCase, mock_project
 
 class TestCasmSelection(CasmProjectTestCase):
 
@@ -111,3 +114,95 @@ class TestCasmSelection(CasmProjectTestCase):
 
             if os.path.isfile(test_select):
                 os.remove(test_select)
+
+    def test_sidecar(self):
+        """Test Selection with a binary sidecar file"""
+        if self.has_projects:
+            # ZrO test project construction
+            proj = project.Project(self.ZrO_dir, verbose=False)
+            proj.capture("select --set-on")
+
+            sel = project.Selection(proj)
+            sel.query(['scel_size', 'comp'])
+
+            test_select = join(proj.path, 'test_select')
+            sidecar = test_select + ".pkl"
+            for f in [test_select, sidecar]:
+                if os.path.isfile(f):
+                    os.remove(f)
+
+            sel.sidecar = True
+            sel.saveas(test_select)
+            self.assertTrue(os.path.isfile(sidecar))
+
+            # reading from the sidecar gives the same data as the text file
+            text_data = project.read_selection(test_select)
+            sidecar_data = project.read_selection(test_select, sidecar=True)
+            self.assertEqual(list(text_data.columns), ['configname', 'selected', 'scel_size', 'comp(a)'])
+            self.assertEqual(list(text_data.columns), list(sidecar_data.columns))
+            self.assertEqual(list(text_data['configname']), list(sidecar_data['configname']))
+            self.assertTrue(np.allclose(text_data['comp(a)'].values, sidecar_data['comp(a)'].values))
+
+            # saving without the sidecar removes it
+            read_sel = project.Selection(proj, test_select)
+            read_sel.save(force=True)
+            self.assertFalse(os.path.isfile(sidecar))
+
+            if os.path.isfile(test_select):
+                os.remove(test_select)
+
+    def test_save_master(self):
+        """Test saving the MASTER Selection, with mocked libcasm"""
+        class API(object):
+            def __init__(self):
+                self.selected = np.array([True, False, False])
+                self.calls = []
+            def query_array(self, primclex, columns, selection, all):
+                values = self.selected.astype(float).reshape((3, 1))
+                return (["A/0", "A/1", "B/0"], ["selected"], "b", values)
+            def primclex_set_selected(self, primclex, confignames, selected):
+                self.calls.append((confignames, selected))
+                for name, value in zip(confignames, selected):
+                    self.selected[["A/0", "A/1", "B/0"].index(name)] = value
+                return (0, "")
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            os.mkdir(join(tmp_dir, '.casm'))
+            api = API()
+            proj = mock_project(api=api, path=tmp_dir)
+            sel = project.Selection(proj)
+
+            # only changed flags are sent, and missing configurations are not selected
+            sel.save(data=pandas.DataFrame({"configname": ["B/0", "A/0"], "selected": [True, False]}))
+            self.assertEqual(api.calls, [(["A/0", "B/0"], [False, True])])
+            self.assertEqual(list(api.selected), [False, False, True])
+            sel.save(data=pandas.DataFrame({"configname": ["B/0"], "selected": [True]}))
+            self.assertEqual(api.calls[-1], ([], []))
+
+            data = pandas.DataFrame({"configname": ["C/0"], "selected": [True]})
+            with self.assertRaises(Exception):
+                sel.save(data=data)
+
+            # another process is writing config_list.json
+            with open(proj.dir.config_list() + ".tmp", 'w') as f:
+                f.write("{}")
+            with self.assertRaises(Exception):
+                sel.save(data=data.replace("C/0", "A/1"))
+            self.assertEqual(list(api.selected), [False, False, True])
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_sidecar_not_writable(self):
+        """Test reading a selection when the sidecar can not be written"""
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = join(tmp_dir, "sel.txt")
+            with open(path, 'w') as f:
+                f.write("# configname selected\nA/0 1\nA/1 0\n")
+            os.mkdir(project.selection.sidecar_path(path) + ".tmp")
+            data = project.read_selection(path, sidecar=True)
+            self.assertEqual(list(data['configname']), ["A/0", "A/1"])
+            self.assertFalse(os.path.exists(project.selection.sidecar_path(path)))
+        finally:
+            shutil.rmtree(tmp_dir)
@@ -0,0 +1,78 @@
+"""test_casm/test_project/test_session.py"""
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+from builtins import *
+
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+from os.path import join
+
+import casm.project
+from casm import api, project
+
+import test_casm
+from test_casm.test_project import CasmProjectTestCase
+
+class MockProject(object):
+    """Replaces casm.project.Project in the session server, capturing the working directory"""
+    instances = []
+
+    class Settings(object):
+        cluster_expansions = []
+
+    def __init__(self, path, verbose=True):
+        self.path = path
+        self.dir = project.DirectoryStructure(path)
+        self.settings = MockProject.Settings()
+        MockProject.instances.append(self)
+
+    def capture(self, args):
+        return (os.getcwd(), args, 0)
+
+class TestCasmSession(CasmProjectTestCase):
+
+    def setUp(self):
+        self.tmp_dir = os.path.realpath(tempfile.mkdtemp())
+        self.Project = casm.project.Project
+        casm.project.Project = MockProject
+        MockProject.instances = []
+
+    def tearDown(self):
+        casm.project.Project = self.Project
+        shutil.rmtree(self.tmp_dir)
+
+    def test_session(self):
+        """Test session_call with a SessionServer listening on a socket"""
+        proj_dir = join(self.tmp_dir, "proj")
+        client_dir = join(proj_dir, "sub")
+        os.makedirs(join(proj_dir, ".casm"))
+        os.mkdir(client_dir)
+        socket_path = join(self.tmp_dir, "casm.sock")
+
+        server = api.SessionServer(socket_path)
+        thread = threading.Thread(target=server.run)
+        thread.start()
+        cwd = os.getcwd()
+        try:
+            os.chdir(client_dir)
+            stdout, stderr, returncode = api.session_call("select -c mysel -o out.json", socket_path=socket_path)
+            self.assertEqual(stdout, client_dir)
+            self.assertEqual(stderr, "select -c mysel -o out.json")
+            self.assertEqual(returncode, 0)
+
+            # the project is kept loaded, and commands run in the client's working directory
+            stdout, stderr, returncode = api.session_call("query -k comp", root=proj_dir, socket_path=socket_path)
+            self.assertEqual(stdout, client_dir)
+            self.assertEqual(len(MockProject.instances), 1)
+            self.assertEqual(list(server.projects.keys()), [proj_dir])
+        finally:
+            os.chdir(cwd)
+            self.assertTrue(api.session_stop(socket_path))
+            thread.join()
+
+        # the server working directory is restored, and the socket removed
+        self.assertEqual(os.getcwd(), cwd)
+        self.assertFalse(os.path.exists(socket_path))
+        self.assertIsNone(api.session_call("query -k comp", socket_path=socket_path))
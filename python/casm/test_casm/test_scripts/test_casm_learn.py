@@ -93,8 +93,8 @@ class TestCasmLearn(CasmScriptsTestCase):
             with contexts.captured_output(wd=fit_dir) as (sout, serr):
                 with contexts.patch.object(sys, 'argv', testargs):
                     casm_learn.main()
-            self.assertTrue(os.path.exists(join(fit_dir, 'fit_RFE_halloffame.pkl')))
-            self.assertTrue(os.path.exists(join(fit_dir, 'fit_RFE_specs.pkl')))
+            self.assertTrue(os.path.exists(join(fit_dir, 'fit_RFE_halloffame.arrays')))
+            self.assertTrue(os.path.exists(join(fit_dir, 'fit_RFE_specs.arrays')))
             #print("OK 3")
 
             # view hall of fame
@@ -1,14 +1,124 @@
 #include "ccasm/api.hh"
 #include <wordexp.h>
+#include <limits>
+#include <sstream>
 //#include "boost/iostreams/stream.hpp"
 //#include "boost/iostreams/device/null.hpp"
 #include "casm/casm_io/Log.hh"
+#include "casm/casm_io/SafeOfstream.hh"
 #include "casm/clex/PrimClex.hh"
 #include "casm/external/boost.hh"
 #include "casm/app/casm_functions.hh"
+#include "casm/casm_io/DataFormatter.hh"
+#include "casm/casm_io/DataStream.hh"
+#include "casm/clex/ConfigIO.hh"
+#include "casm/clex/ConfigSelection.hh"
 
 using namespace CASM;
 
+namespace CASM {
+
+  /// Numeric 'casm query' results, stored as a row-major array
+  struct QueryArray {
+    Index rows;
+    Index cols;
+    std::vector<double> values;
+  };
+
+  /// Collect the numeric values injected by one DataFormatter
+  ///
+  /// - Values of type double, long, or bool are collected, and the type of
+  ///   each value is recorded as 'd', 'l', or 'b'
+  /// - Strings are not collected, but 'non_numeric()' returns true if any are
+  ///   injected
+  /// - If the failbit is set when newline() is called, all values collected
+  ///   since the last call to newline() are replaced by NaN
+  class QueryArrayDataStream : public DataStream {
+  public:
+
+    QueryArrayDataStream() :
+      DataStream(none), m_non_numeric(false), m_begin(0) {}
+
+    DataStream &operator<<(const std::string &) override {
+      m_non_numeric = true;
+      return *this;
+    }
+
+    DataStream &operator<<(long _l) override {
+      return _push_back(_l, 'l');
+    }
+
+    DataStream &operator<<(double _d) override {
+      return _push_back(_d, 'd');
+    }
+
+    DataStream &operator<<(bool _b) override {
+      return _push_back(_b, 'b');
+    }
+
+    DataStream &newline() override {
+      if(fail()) {
+        std::fill(m_values.begin() + m_begin, m_values.end(), std::numeric_limits<double>::quiet_NaN());
+        clear_fail();
+      }
+      m_begin = m_values.size();
+      return *this;
+    }
+
+    bool non_numeric() const {
+      return m_non_numeric;
+    }
+
+    std::vector<double> &values() {
+      return m_values;
+    }
+
+    const std::string &types() const {
+      return m_types;
+    }
+
+  private:
+
+    DataStream &_push_back(double _d, char _type) {
+      m_values.push_back(_d);
+      m_types.push_back(_type);
+      return *this;
+    }
+
+    bool m_non_numeric;
+    Index m_begin;
+    std::vector<double> m_values;
+    std::string m_types;
+  };
+
+  /// Sets the logging of a PrimClex, if not null, and restores it when destroyed
+  class ScopedLogging {
+
+  public:
+
+    ScopedLogging(PrimClex *primclex, const Logging &logging) :
+      m_primclex(primclex) {
+      if(m_primclex) {
+        m_prev = static_cast<Logging &>(*m_primclex);
+        static_cast<Logging &>(*m_primclex) = logging;
+      }
+    }
+
+    ~ScopedLogging() {
+      if(m_primclex) {
+        static_cast<Logging &>(*m_primclex) = m_prev;
+      }
+    }
+
+  private:
+
+    PrimClex *m_primclex;
+    Logging m_prev;
+
+  };
+
+}
+
 extern "C" {
 
   costream *casm_STDOUT() {
@@ -81,6 +191,71 @@ extern "C" {
     static_cast<Logging &>(*_primclex) = logging;
   }
 
+  /// Change the MASTER selection
+  ///
+  /// - confignames: names of the configurations to change, one per line
+  /// - selected: the new 'selected' flag of each named configuration
+  /// - size: number of configurations to change
+  /// - The flags of other configurations are not changed
+  /// - The 'selected' flags are set in memory, and config_list.json is re-read
+  ///   and only the named entries are modified, so configurations and
+  ///   properties written by other processes since it was read are kept. If no
+  ///   flag changes, config_list.json is not written.
+  ///
+  /// Returns 0 on success, or 1 if the selection could not be set, with an
+  /// explanation written to err_log.
+  int casm_primclex_set_selected(cPrimClex *primclex, char *confignames, bool *selected, unsigned long size, costream *err_log) {
+    PrimClex *_primclex = reinterpret_cast<PrimClex *>(primclex);
+    Log &_err_log(*reinterpret_cast<Log *>(err_log));
+
+    try {
+      std::vector<std::string> names;
+      std::istringstream ss(confignames);
+      std::string configname;
+      for(unsigned long i = 0; i < size; ++i) {
+        std::getline(ss, configname);
+        names.push_back(configname);
+        _primclex->configuration(configname).set_selected(selected[i]);
+      }
+
+      fs::path config_list = _primclex->get_config_list_path();
+      if(size == 0 || !fs::exists(config_list)) {
+        return 0;
+      }
+
+      jsonParser json(config_list);
+      jsonParser &supercells = json["supercells"];
+      bool changed = false;
+      for(unsigned long i = 0; i < size; ++i) {
+        std::string::size_type pos = names[i].rfind('/');
+        std::string scelname = names[i].substr(0, pos);
+        std::string configid = names[i].substr(pos + 1);
+        if(pos == std::string::npos || !supercells.contains(scelname) || !supercells[scelname].contains(configid)) {
+          throw std::runtime_error("configuration not found in " + config_list.string() + ": " + names[i]);
+        }
+        jsonParser &config_json = supercells[scelname][configid];
+        bool curr = false;
+        config_json.get_else(curr, "selected", false);
+        if(curr != selected[i]) {
+          config_json["selected"] = selected[i];
+          changed = true;
+        }
+      }
+
+      if(changed) {
+        SafeOfstream file;
+        file.open(config_list);
+        json.print(file.ofstream());
+        file.close();
+      }
+      return 0;
+    }
+    catch(std::exception &e) {
+      _err_log << "Error in casm_primclex_set_selected: " << e.what() << std::endl;
+      return 1;
+    }
+  }
+
   /// Print to log the recognized casm commands as a JSON array
   void casm_command_list(costream *ostringstream_log) {
     Log &_log(*reinterpret_cast<OStringStreamLog *>(ostringstream_log));
@@ -96,13 +271,17 @@ extern "C" {
   /// Construct a CommandArgs instance and call casm_api
   ///
   /// - Will construct temporary PrimClex if necessary
-  /// - If primclex is not null, then root and log arguments should be ignored.
+  /// - If primclex is not null, then root is ignored, and the PrimClex logging
+  ///   is set to the log arguments during the call, so that output written via
+  ///   PrimClex::log() is also captured. The caller must ensure the PrimClex is
+  ///   not used concurrently.
   int casm_capi(char *args, cPrimClex *primclex, char *root, costream *log, costream *debug_log, costream *err_log) {
     PrimClex *_primclex = reinterpret_cast<PrimClex *>(primclex);
     Log &_log(*reinterpret_cast<Log *>(log));
     Log &_debug_log(*reinterpret_cast<Log *>(debug_log));
     Log &_err_log(*reinterpret_cast<Log *>(err_log));
     Logging logging(_log, _debug_log, _err_log);
+    ScopedLogging scoped_logging(_primclex, logging);
 
     std::string s("casm ");
     s += std::string(args);
@@ -134,4 +313,172 @@ extern "C" {
     return casm_api(command_args);
   }
 
+  /// Execute a list of commands using an existing PrimClex, capturing the
+  /// output of each command separately
+  ///
+  /// - args: JSON array of strings, each containing the arguments for one
+  ///   casm command, as for casm_capi_call
+  /// - stop_on_error: if true, commands after the first that returns a
+  ///   non-zero return code are not executed
+  /// - info_log: a JSON array is written, with one object per executed command:
+  ///   {"stdout": str, "stderr": str, "returncode": int}
+  ///
+  /// Returns 0 on success, or 1 if 'args' could not be parsed or a command
+  /// threw an exception, with an explanation written to err_log.
+  int casm_capi_batch(char *args,
+                      cPrimClex *primclex,
+                      bool stop_on_error,
+                      costream *info_log,
+                      costream *err_log) {
+    PrimClex *_primclex = reinterpret_cast<PrimClex *>(primclex);
+    Log &_info_log(*reinterpret_cast<OStringStreamLog *>(info_log));
+    Log &_err_log(*reinterpret_cast<Log *>(err_log));
+
+    try {
+      jsonParser results = jsonParser::array();
+      for(const auto &arg : jsonParser::parse(std::string(args))) {
+        OStringStreamLog ss;
+        OStringStreamLog ss_err;
+        Logging logging(ss, null_log(), ss_err);
+
+        std::string s("casm ");
+        s += arg.get<std::string>();
+
+        int returncode;
+        {
+          // also capture output written via PrimClex::log()
+          ScopedLogging scoped_logging(_primclex, logging);
+          CommandArgs command_args(s, _primclex, _primclex->get_path(), logging);
+          returncode = command_args.parse_result;
+          if(!returncode) {
+            returncode = casm_api(command_args);
+          }
+        }
+
+        jsonParser res = jsonParser::object();
+        res["stdout"] = ss.ss().str();
+        res["stderr"] = ss_err.ss().str();
+        res["returncode"] = returncode;
+        results.push_back(res);
+
+        if(returncode && stop_on_error) {
+          break;
+        }
+      }
+      _info_log << results;
+      return 0;
+    }
+    catch(std::exception &e) {
+      _err_log << "Error in casm_capi_batch: " << e.what() << std::endl;
+      return 1;
+    }
+  }
+
+
+  /// Evaluate numeric 'casm query' properties and store them in a QueryArray
+  ///
+  /// - columns: JSON array of 'casm query -k' arguments
+  /// - selection: path to a selection file, or "MASTER", "ALL", "CALCULATED"
+  /// - all: if true, include all configurations in the selection, else only
+  ///   the selected configurations
+  /// - info_log: a JSON object is written with "configname" (the name of the
+  ///   configuration in each row), "header" (the name of each column), and
+  ///   "types" (one character per column, 'd' (double), 'l' (long), or 'b' (bool))
+  ///
+  /// Returns nullptr if the query can not be evaluated as an array of numbers
+  /// (for instance, a property is a string), with an explanation written to
+  /// err_log.
+  cQueryArray *casm_query_array_new(cPrimClex *primclex,
+                                    char *columns,
+                                    char *selection,
+                                    bool all,
+                                    costream *info_log,
+                                    costream *err_log) {
+    PrimClex *_primclex = reinterpret_cast<PrimClex *>(primclex);
+    Log &_info_log(*reinterpret_cast<OStringStreamLog *>(info_log));
+    Log &_err_log(*reinterpret_cast<Log *>(err_log));
+
+    try {
+
+      auto &handler = _primclex->settings().query_handler<Configuration>();
+      ConstConfigSelection _selection(*_primclex, fs::path(selection));
+      handler.set_selected(_selection);
+
+      // one formatter per column, so that failed values are NaN for just that column
+      std::vector<DataFormatter<Configuration> > formatters;
+      for(const auto &col : jsonParser::parse(std::string(columns))) {
+        formatters.push_back(handler.dict().parse(std::vector<std::string>(1, col.get<std::string>())));
+      }
+
+      auto begin = all ? _selection.config_begin() : _selection.selected_config_begin();
+      auto end = all ? _selection.config_end() : _selection.selected_config_end();
+
+      std::unique_ptr<QueryArray> res(new QueryArray());
+      res->rows = 0;
+      res->cols = 0;
+
+      QueryArrayDataStream stream;
+      std::vector<std::string> configname;
+      for(auto it = begin; it != end; ++it) {
+        for(const auto &formatter : formatters) {
+          formatter.inject(*it, stream);
+        }
+        if(stream.non_numeric()) {
+          _err_log << "Error in casm_query_array_new: query includes non-numeric properties" << std::endl;
+          return nullptr;
+        }
+        if(res->rows == 0) {
+          res->cols = stream.values().size();
+        }
+        else if(stream.values().size() != (res->rows + 1) * res->cols) {
+          _err_log << "Error in casm_query_array_new: query is not rectangular at "
+                   << it->name() << std::endl;
+          return nullptr;
+        }
+        configname.push_back(it->name());
+        res->rows++;
+      }
+
+      jsonParser json = jsonParser::object();
+      json["configname"] = configname;
+      json["header"] = jsonParser::array();
+      if(res->rows) {
+        std::vector<std::string> header;
+        for(const auto &formatter : formatters) {
+          auto _col = formatter.col_header(*begin);
+          header.insert(header.end(), _col.begin(), _col.end());
+        }
+        json["header"] = header;
+      }
+      json["types"] = stream.types().substr(0, res->cols);
+      _info_log << json;
+
+      res->values = std::move(stream.values());
+      return reinterpret_cast<cQueryArray *>(res.release());
+    }
+    catch(std::exception &e) {
+      _err_log << "Error in casm_query_array_new: " << e.what() << std::endl;
+      return nullptr;
+    }
+  }
+
+  void casm_query_array_delete(cQueryArray *ptr) {
+    delete reinterpret_cast<QueryArray *>(ptr);
+  }
+
+  unsigned long casm_query_array_rows(cQueryArray *ptr) {
+    return reinterpret_cast<QueryArray *>(ptr)->rows;
+  }
+
+  unsigned long casm_query_array_cols(cQueryArray *ptr) {
+    return reinterpret_cast<QueryArray *>(ptr)->cols;
+  }
+
+  /// Copy QueryArray values into 'dest', which must have space for rows*cols doubles
+  double *casm_query_array_copy(cQueryArray *ptr, double *dest) {
+    const auto &values = reinterpret_cast<QueryArray *>(ptr)->values;
+    std::copy(values.begin(), values.end(), dest);
+    return dest;
+  }
+
 }